@@ -0,0 +1,153 @@
+"""
+app/assets.py
+-------------
+Fingerprinted, precompressed static assets.
+
+At startup every script and stylesheet in app/static is read once, named by
+content hash (app.js -> app.3f9c2a1b7e04.js), and compressed with gzip and
+brotli. The HTML pages are rewritten to point at the hashed names and
+compressed the same way.
+
+- Hashed assets are served with `Cache-Control: public, max-age=31536000,
+  immutable`: a browser never asks for them again, and a changed file gets a
+  new name.
+- HTML pages are served with an ETag and `Cache-Control: no-cache`, so every
+  navigation revalidates with a body-less 304 and picks up new asset names
+  right after a deploy.
+- Each response uses the best encoding the client accepts (br, gzip,
+  identity) and carries `Vary: Accept-Encoding`.
+
+Anything else under /static (unhashed names, other files) is served from
+disk as before, revalidated like the HTML.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import brotli
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL = "/static/"
+
+FINGERPRINTED = (".js", ".css")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+@dataclass(frozen=True)
+class Asset:
+    content_type: str
+    etag: str
+    # encoding ("identity", "gzip", "br") -> body
+    bodies: dict[str, bytes]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+def _compress(data: bytes) -> dict[str, bytes]:
+    bodies = {"identity": data}
+    # mtime=0 keeps the gzip bytes identical across workers and restarts
+    bodies["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+    bodies["br"] = brotli.compress(data, quality=11)
+    # Tiny files can grow when compressed
+    return {k: v for k, v in bodies.items() if k == "identity" or len(v) < len(data)}
+
+
+def _asset(name: str, data: bytes) -> Asset:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    # Weak: the gzip and brotli bodies are the same resource
+    return Asset(content_type, f'W/"{_digest(data)}"', _compress(data))
+
+
+class Manifest:
+    """Built assets: hashed name -> Asset, original name -> hashed name, page -> Asset."""
+
+    def __init__(self, directory: Path = STATIC_DIR):
+        self.assets: dict[str, Asset] = {}
+        self.names: dict[str, str] = {}
+        self.pages: dict[str, Asset] = {}
+
+        for path in sorted(directory.iterdir()):
+            if path.suffix in FINGERPRINTED:
+                data = path.read_bytes()
+                hashed = f"{path.stem}.{_digest(data)}{path.suffix}"
+                self.names[path.name] = hashed
+                self.assets[hashed] = _asset(hashed, data)
+
+        refs = re.compile(re.escape(STATIC_URL) + r"([\w.-]+)")
+        for path in sorted(directory.glob("*.html")):
+            html = refs.sub(lambda m: STATIC_URL + self.names.get(m[1], m[1]), path.read_text("utf-8"))
+            self.pages[path.name] = _asset(path.name, html.encode("utf-8"))
+
+
+def _encoding(asset: Asset, accept_encoding: str | None) -> str:
+    offered = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.partition(";")
+        try:
+            if params and float(params.strip().removeprefix("q=")) == 0:
+                continue  # explicitly refused
+        except ValueError:
+            pass
+        offered.add(token.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in asset.bodies and (encoding in offered or "*" in offered):
+            return encoding
+    return "identity"
+
+
+def _not_modified(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison; proxies that compress may add an encoding suffix
+    opaque = etag.removeprefix("W/").strip('"')
+    return any(
+        t.strip().removeprefix("W/").strip('"').split("-")[0] == opaque
+        for t in if_none_match.split(",")
+    )
+
+
+def respond(asset: Asset, headers: Headers, cache_control: str, method: str = "GET") -> Response:
+    common = {"ETag": asset.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _not_modified(headers.get("if-none-match"), asset.etag):
+        return Response(status_code=304, headers=common)
+
+    encoding = _encoding(asset, headers.get("accept-encoding"))
+    body = asset.bodies[encoding]
+    if encoding != "identity":
+        common["Content-Encoding"] = encoding
+    response = Response(body if method != "HEAD" else b"", media_type=asset.content_type, headers=common)
+    response.headers["Content-Length"] = str(len(body))
+    return response
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that serves the manifest's hashed assets from memory."""
+
+    def __init__(self, manifest: Manifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset = self.manifest.assets.get(path)
+        if asset is None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("Cache-Control", REVALIDATE)
+            return response
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        return respond(asset, Headers(scope=scope), IMMUTABLE, scope["method"])
@@ -0,0 +1,131 @@
+"""
+app/cache.py
+------------
+In-process LRU/TTL cache for expensive read endpoints (report summary,
+metrics, dashboard to-do).
+
+    @router.get("/summary", dependencies=[Depends(versions.etag(...))])
+    @db_endpoint
+    @cache.cached("animals", "litters", "harvests", "feed_costs")
+    def report_summary(...): ...
+
+Entries are keyed by endpoint, query parameters, today's date and the
+`table_versions` counters of the tables the endpoint reads. A write to one
+of those tables (from any worker) changes the key, so stale entries are
+never served; they simply age out of the LRU. The counters for the key are
+read in the same read transaction as the body (`begin_snapshot`), not
+taken from the ETag check before it, and the response's ETag is
+re-derived from them (`versions.retag`). Each uvicorn worker keeps its own
+cache and they all invalidate through the shared database counters.
+
+Configuration:
+    RESPONSE_CACHE_SIZE=256   max entries per process (0 disables the cache)
+    RESPONSE_CACHE_TTL=300    seconds an entry may be served
+"""
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from . import versions
+from .database import begin_snapshot
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """Thread-safe LRU with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def _count(self, name: str, counter: str) -> None:
+        per_name = self._counters.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0})
+        per_name[counter] += 1
+
+    def get(self, key, name: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._count(name, "hits")
+                    return value
+                del self._entries[key]
+                self._count(name, "expirations")
+            self._count(name, "misses")
+            return _MISSING
+
+    def put(self, key, name: str, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                (evicted_name, *_), _ = self._entries.popitem(last=False)
+                self._count(evicted_name, "evictions")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            totals = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+            for per_name in self._counters.values():
+                for k, v in per_name.items():
+                    totals[k] += v
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                **totals,
+                "endpoints": {name: dict(c) for name, c in sorted(self._counters.items())},
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cached(*tables: str):
+    """
+    Cache a sync endpoint body (taking `db`) until one of `tables` is written.
+
+    The endpoint's other keyword arguments are its query parameters and must
+    be hashable. Cached values are shared between requests: never mutate them.
+    """
+    def decorator(fn):
+        # Counters are reported under the endpoint name (_metrics -> metrics)
+        name = fn.__name__.lstrip("_")
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            db = kwargs["db"]
+            params = tuple(sorted((k, v) for k, v in kwargs.items() if k != "db"))
+            begin_snapshot(db)
+            key = (name, params, tuple(sorted(versions.current(db, tables).items())), date.today())
+            versions.retag(db)
+
+            value = response_cache.get(key, name)
+            if value is _MISSING:
+                value = fn(*args, **kwargs)
+                response_cache.put(key, name, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,163 @@
+"""
+app/changes.py
+--------------
+Change log behind the live feed (GET /changes).
+
+Every write to a versioned table appends compact events to `change_events`
+in the same transaction as the write:
+
+    {"entity": "animals", "id": 12, "op": "update", "fields": {"status": "sold"}}
+
+- ORM writes (the routers' add/modify/delete) are recorded by a Session
+  `after_flush` listener: inserts carry every column, updates only the
+  columns that changed, deletes none.
+- Core bulk writes call `record()` / `record_bulk()` themselves. A "bulk"
+  event (imports) only names the table; clients reload it.
+
+Events commit or roll back with the write, and SQLite has one writer at a
+time, so event ids are gapless and in commit order across all workers. A
+client that reconnects with the last id it saw resumes exactly there. The
+log keeps the newest CHANGE_FEED_RETAIN events; a client that falls further
+behind is told to reload ("reset").
+
+Configuration:
+    CHANGE_FEED_RETAIN=10000   events kept for resuming clients
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime
+
+from sqlalchemy import event, func, insert, inspect
+from sqlalchemy.orm import Session
+
+from .versions import VERSIONED_TABLES
+
+CHANGE_FEED_RETAIN = int(os.getenv("CHANGE_FEED_RETAIN", "10000"))
+
+# The retention trigger prunes once every PRUNE_EVERY events
+PRUNE_EVERY = 500
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _dumps(fields: dict | None) -> str | None:
+    return None if fields is None else json.dumps(fields, default=_json_default, separators=(",", ":"))
+
+
+# ---------------------------------------------------------------------------
+# DDL (metadata after_create listener)
+# ---------------------------------------------------------------------------
+
+def create_retention_trigger(target, connection, **kw) -> None:
+    # Recreated on every start so a changed CHANGE_FEED_RETAIN applies
+    connection.exec_driver_sql("DROP TRIGGER IF EXISTS change_events_prune")
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER change_events_prune AFTER INSERT ON change_events "
+        f"WHEN new.event_id % {PRUNE_EVERY} = 0 BEGIN "
+        f"DELETE FROM change_events WHERE event_id <= new.event_id - {CHANGE_FEED_RETAIN}; END"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def _write(session: Session, rows: list[dict]) -> None:
+    from .models import ChangeEvent
+
+    if rows:
+        # On the flush's connection: no autoflush, same transaction
+        session.connection().execute(insert(ChangeEvent.__table__), rows)
+
+
+def record(db: Session, entity: str, op: str, items) -> None:
+    """Log `op` for each (id, fields) in `items`, for writes made with Core."""
+    _write(db, [
+        {"entity": entity, "entity_id": entity_id, "op": op, "fields": _dumps(fields)}
+        for entity_id, fields in items
+    ])
+
+
+def record_bulk(db: Session, entity: str, count: int) -> None:
+    """Log that `count` rows of `entity` changed at once; clients reload the table."""
+    if count:
+        _write(db, [{"entity": entity, "entity_id": None, "op": "bulk", "fields": _dumps({"count": count})}])
+
+
+def _columns(state, changed_only: bool) -> dict:
+    fields = {}
+    for attr in state.mapper.column_attrs:
+        if changed_only and not state.attrs[attr.key].history.has_changes():
+            continue
+        fields[attr.key] = getattr(state.obj(), attr.key)
+    return fields
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context) -> None:
+    # session.new / dirty / deleted and attribute history still describe
+    # this flush here; they are reset after it
+    rows = []
+    for op, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            state = inspect(obj)
+            table = state.mapper.local_table.name
+            if table not in VERSIONED_TABLES:
+                continue
+            if op == "update":
+                fields = _columns(state, changed_only=True)
+                if not fields:
+                    continue
+            else:
+                fields = _columns(state, changed_only=False) if op == "insert" else None
+            (entity_id,) = state.mapper.identity_key_from_instance(obj)[1]
+            rows.append({"entity": table, "entity_id": entity_id, "op": op, "fields": _dumps(fields)})
+    _write(session, rows)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def bounds(db: Session) -> tuple[int | None, int | None]:
+    """(oldest, newest) event id still in the log."""
+    from .models import ChangeEvent
+
+    oldest, newest = db.query(func.min(ChangeEvent.event_id), func.max(ChangeEvent.event_id)).one()
+    db.rollback()
+    return oldest, newest
+
+
+def since(db: Session, after: int, limit: int) -> list[tuple[int, str]]:
+    """
+    Up to `limit` events after `after` as (event id, JSON payload), oldest first.
+
+    Ends the read transaction before returning: a feed polls for hours and
+    must not pin a WAL snapshot between polls.
+    """
+    from .models import ChangeEvent
+
+    rows = (
+        db.query(ChangeEvent)
+        .filter(ChangeEvent.event_id > after)
+        .order_by(ChangeEvent.event_id.asc())
+        .limit(limit)
+        .all()
+    )
+    out = [
+        (
+            r.event_id,
+            '{"entity":%s,"id":%s,"op":%s,"fields":%s}' % (
+                json.dumps(r.entity), json.dumps(r.entity_id), json.dumps(r.op), r.fields or "null",
+            ),
+        )
+        for r in rows
+    ]
+    db.rollback()
+    return out
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import functools
+import inspect
 import os
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+
+from . import perf, slow_queries, telemetry
 
 # Production/Docker-ready:
 # - Default DB file: ./rabbit_tracker.db (relative to current working directory)
@@ -11,23 +17,206 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 #     DATABASE_URL=sqlite:////data/rabbit_tracker.db
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./rabbit_tracker.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# Serve requests through an async engine instead of the threadpool:
+#     DATABASE_ASYNC=1
+# Off by default: the ORM work then all runs on the event loop thread, which
+# measured slower under write contention (README, "Async database sessions").
+# The async URL defaults to DATABASE_URL with the aiosqlite driver, e.g.
+#     sqlite+aiosqlite:////data/rabbit_tracker.db
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "0").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1),
+)
+
+# SQLite connection profile, applied to every new connection:
+#     SQLITE_PROFILE=tuned     WAL, relaxed fsync, big cache + mmap (default)
+#     SQLITE_PROFILE=durable   WAL with a full fsync on every commit
+#     SQLITE_PROFILE=off       SQLite defaults (rollback journal, no pragmas)
+# Any single pragma can be overridden on top of the profile, e.g.
+#     SQLITE_MMAP_SIZE=0  SQLITE_BUSY_TIMEOUT=15000
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+
+SQLITE_PROFILES: dict[str, dict[str, str]] = {
+    "tuned": {
+        "journal_mode": "WAL",        # readers never block the writer
+        "synchronous": "NORMAL",      # safe with WAL; fsync at checkpoints only
+        "mmap_size": "268435456",     # 256 MiB of the file memory-mapped
+        "cache_size": "-65536",       # 64 MiB page cache (negative = KiB)
+        "temp_store": "MEMORY",       # sorts / GROUP BY temp b-trees in RAM
+        "busy_timeout": "5000",       # wait up to 5 s for the write lock
+        "foreign_keys": "ON",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": "-65536",
+        "temp_store": "MEMORY",
+        "busy_timeout": "5000",
+        "foreign_keys": "ON",
+    },
+    "off": {},
+}
+
+# Statements slower than this are logged with their query plan and kept for
+# GET /debug/slow-queries (see app/slow_queries.py); 0 turns the log off.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_TOP = int(os.getenv("SLOW_QUERY_TOP", "20"))
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
+slow_query_log = slow_queries.SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_TOP)
+
+SQLITE_PRAGMAS = (
+    "journal_mode", "synchronous", "mmap_size", "cache_size",
+    "temp_store", "busy_timeout", "foreign_keys",
 )
 
+
+def sqlite_pragmas(profile: str | None = None) -> dict[str, str]:
+    """Resolve a profile name plus SQLITE_<PRAGMA> env overrides into pragma settings."""
+    profile = profile or SQLITE_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}; expected one of {sorted(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PRAGMAS:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict[str, str]) -> None:
+    """Run the given PRAGMAs on every connection the engine opens."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def make_engine(url: str = DATABASE_URL, profile: str | None = None, **kwargs):
+    connect_args = {}
+    if url.startswith("sqlite"):
+        # CountingConnection: rows fetched per request for app/perf.py
+        connect_args = {"check_same_thread": False, "factory": perf.CountingConnection}
+
+    engine = create_engine(url, connect_args=connect_args, **kwargs)
+    if url.startswith("sqlite"):
+        apply_sqlite_pragmas(engine, sqlite_pragmas(profile))
+    if SLOW_QUERY_MS > 0:
+        slow_query_log.attach(engine)
+    return engine
+
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, profile: str | None = None, **kwargs):
+    engine = create_async_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(profile))
+    if SLOW_QUERY_MS > 0:
+        slow_query_log.attach(engine.sync_engine)
+    return engine
+
+
+# The sync engine always exists: startup DDL, CLI tools and seed_db use it.
+engine = make_engine(DATABASE_URL)
+telemetry.instrument_engine(engine, "sync")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    async_engine = make_async_engine(ASYNC_DATABASE_URL)
+    telemetry.instrument_engine(async_engine.sync_engine, "async")
+    # Attributes must stay loaded after commit: lazy refreshes would need IO
+    # outside the greenlet that AsyncSession.run_sync provides.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# The request session: an AsyncSession when DATABASE_ASYNC is set, else a Session.
+get_db = get_async_db if DATABASE_ASYNC else get_sync_db
+
+
+def begin_snapshot(db: Session) -> None:
+    """
+    Start a read transaction on `db` now, so every following SELECT sees one
+    snapshot of the database.
+
+    pysqlite (and aiosqlite on top of it) only sends BEGIN before a write:
+    without this each SELECT of a read-only request sees whatever was
+    committed when it ran. Table versions memoized before the BEGIN (by an
+    ETag check) may be older than the snapshot and are forgotten.
+    """
+    conn = db.connection()
+    if not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN")
+        db.info.pop("table_versions", None)  # see versions.current
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Call `fn(session, *args, **kwargs)` with the sync Session behind `db`.
+
+    - AsyncSession: via `AsyncSession.run_sync`, on the event loop with the
+      ORM calls awaiting the async driver, so no threadpool worker is held.
+    - Session: on the threadpool, exactly as a plain `def` route would.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+def sibling_session(db):
+    """
+    A new session on the same engine as `db` (an AsyncSession for an
+    AsyncSession), for work that outlives the request: FastAPI closes the
+    request session when the endpoint returns, before a streamed body is sent.
+    """
+    if isinstance(db, AsyncSession):
+        return AsyncSession(db.bind, autoflush=False, expire_on_commit=False)
+    return Session(bind=db.get_bind(), autoflush=False)
+
+
+async def close_session(db) -> None:
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+def db_endpoint(fn):
+    """
+    Turn an endpoint written against a sync Session into an `async def` route.
+
+    The body runs through `run_db` against whatever `get_db` yields for the
+    `db` parameter.
+    """
+    # Resolve annotations against the endpoint's module, not this one
+    signature = inspect.signature(fn, eval_str=True)
+
+    @functools.wraps(fn)
+    async def endpoint(*args, **kwargs):
+        return await run_db(kwargs["db"], lambda session: fn(*args, **{**kwargs, "db": session}))
+
+    endpoint.__signature__ = signature
+    return endpoint
@@ -0,0 +1,74 @@
+"""
+app/fastjson.py
+---------------
+Fast JSON path for large read-only responses.
+
+A list endpoint normally returns ORM objects and FastAPI turns each one into
+its `response_model` (a pydantic validation per row) before encoding. Rows
+read from our own tables are already valid, so the list endpoints skip that:
+
+    @router.get("/", response_model=list[schemas.AnimalOut], ...)
+    def list_animals(response: Response, ...):
+        q = db.query(*fastjson.columns(models.Animal, schemas.AnimalOut))
+        return fastjson.respond(pagination.paginate(q, ...), response)
+
+- `columns()` selects exactly the schema's fields, in the schema's order,
+  as plain Core rows (no ORM identity map or attribute instrumentation).
+- `respond()` encodes them in one call (orjson when installed, otherwise
+  pydantic-core's serializer) and returns the bytes as the response, so
+  FastAPI does not validate or encode them again.
+
+The body is the same JSON the response_model path produces, and
+`response_model` still documents the endpoint, so the OpenAPI schema is
+unchanged. Report payloads that are already plain dicts go through
+`respond_data()`, which skips FastAPI's jsonable_encoder walk.
+
+benchmarks/json_lists.py compares the two paths.
+"""
+from __future__ import annotations
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # optional: pydantic-core is about half as fast
+    orjson = None
+
+
+def columns(model, schema: type[BaseModel]) -> list:
+    """The model's columns named by `schema`'s fields, in field order."""
+    return [getattr(model, name).label(name) for name in schema.model_fields]
+
+
+def _encode(data) -> bytes:
+    return orjson.dumps(data) if orjson is not None else to_json(data)
+
+
+def dumps(rows) -> bytes:
+    """JSON array of objects from Core rows (dates as ISO strings)."""
+    if not rows:
+        return b"[]"
+    # zip() with the shared key tuple is ~3x cheaper than Row._asdict()
+    keys = rows[0]._fields
+    return _encode([dict(zip(keys, row)) for row in rows])
+
+
+def respond(rows, response: Response | None = None) -> Response:
+    """`rows` as a JSON array response."""
+    return _raw(dumps(rows), response)
+
+
+def respond_data(data, response: Response | None = None) -> Response:
+    """Plain dicts/lists (report payloads, row dicts) as a JSON response."""
+    return _raw(_encode(data), response)
+
+
+def _raw(body: bytes, response: Response | None) -> Response:
+    out = Response(body, media_type="application/json")
+    # Headers set on the endpoint's `response` parameter (ETag,
+    # X-Next-Cursor) are dropped by FastAPI when a Response is returned
+    if response is not None:
+        out.raw_headers.extend(response.raw_headers)
+    return out
@@ -4,73 +4,120 @@ from __future__ import annotations
 # Correct command:
 #   python -m uvicorn app.main:app --reload
 
-from fastapi import FastAPI, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 
-from .database import Base, engine, get_db
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from sqlalchemy import Integer, cast, func, or_, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.schema import CreateIndex
+
+from .database import Base, SessionLocal, async_engine, begin_snapshot, db_endpoint, engine, get_db, run_db, slow_query_log
 from .routers import animals, breedings
 from .routers import litters as litters_router
 from .routers import harvests as harvests_router
 from .routers import reports as reports_router
 from .routers import feed_costs as feed_costs_router
 from .routers import sales as sales_router
-from . import models, schemas
+from .routers import imports as imports_router
+from .routers import search as search_router
+from .routers import changes as changes_router
+from . import assets, cache, fastjson, models, pagination, perf, rollups, schemas, search, telemetry, versions
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Meat Rabbit Tracker")
+# create_all() only indexes tables it creates; add new indexes to existing ones
+with engine.begin() as _conn:
+    for _table in Base.metadata.sorted_tables:
+        for _index in _table.indexes:
+            _conn.execute(CreateIndex(_index, if_not_exists=True))
+
+with SessionLocal() as _db:
+    rollups.ensure_initialized(_db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # aiosqlite runs every connection on a non-daemon thread: pooled
+    # connections left open keep the process alive after uvicorn stops
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(title="Meat Rabbit Tracker", lifespan=lifespan)
+
+if perf.PERF_TRACKING:
+    app.add_middleware(perf.PerfMiddleware)
+app.add_middleware(telemetry.MetricsMiddleware)
+
+# Scripts and stylesheets are hashed and compressed once per process
+static_assets = assets.Manifest()
+app.mount("/static", assets.AssetFiles(static_assets, directory=assets.STATIC_DIR), name="static")
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+
+@app.exception_handler(OperationalError)
+async def database_busy(request: Request, exc: OperationalError):
+    # SQLite gave up waiting for the write lock (busy_timeout): the request
+    # can simply be retried, so say so instead of a bare 500
+    message = str(exc.orig)
+    if "database is locked" in message or "database is busy" in message:
+        return JSONResponse({"detail": "Database is busy, try again"}, status_code=503, headers={"Retry-After": "1"})
+    raise exc
 
 
 # -----------------------------
 # UI PAGES
 # -----------------------------
+def _page(request: Request, name: str):
+    return assets.respond(static_assets.pages[name], request.headers, assets.REVALIDATE, request.method)
+
+
 @app.get("/dashboard")
-def ui_dashboard():
-    return FileResponse("app/static/dashboard.html")
+async def ui_dashboard(request: Request):
+    return _page(request, "dashboard.html")
 
 
 @app.get("/ranch/animals")
-def ui_animals():
-    return FileResponse("app/static/animals.html")
+async def ui_animals(request: Request):
+    return _page(request, "animals.html")
 
 
 @app.get("/ranch/breedings")
-def ui_breedings():
-    return FileResponse("app/static/breedings.html")
+async def ui_breedings(request: Request):
+    return _page(request, "breedings.html")
 
 
 @app.get("/ranch/kindlings")
-def ui_kindlings():
-    return FileResponse("app/static/kindlings.html")
+async def ui_kindlings(request: Request):
+    return _page(request, "kindlings.html")
 
 
 @app.get("/ranch/weanings")
-def ui_weanings():
-    return FileResponse("app/static/weanings.html")
+async def ui_weanings(request: Request):
+    return _page(request, "weanings.html")
 
 
 @app.get("/ranch/harvests")
-def ui_harvests():
-    return FileResponse("app/static/harvests.html")
+async def ui_harvests(request: Request):
+    return _page(request, "harvests.html")
 
 
 @app.get("/ranch/feed-costs")
-def ui_feed_costs():
-    return FileResponse("app/static/feed_costs.html")
+async def ui_feed_costs(request: Request):
+    return _page(request, "feed_costs.html")
 
 
 @app.get("/ranch/sales")
-def ui_sales():
-    return FileResponse("app/static/sales.html")
+async def ui_sales(request: Request):
+    return _page(request, "sales.html")
 
 
 @app.get("/ranch/reports")
-def ui_reports():
-    return FileResponse("app/static/reports.html")
+async def ui_reports(request: Request):
+    return _page(request, "reports.html")
 
 
 # -----------------------------
@@ -83,44 +130,73 @@ app.include_router(harvests_router.router)
 app.include_router(feed_costs_router.router)
 app.include_router(sales_router.router)
 app.include_router(reports_router.router)
+app.include_router(imports_router.router)
+app.include_router(search_router.router)
+app.include_router(changes_router.router)
 
 
 # -----------------------------
 # OPTION ENDPOINTS (for dropdowns)
 # -----------------------------
-@app.get("/options/breedings", response_model=list[schemas.OptionItem])
+OPTIONS_SEARCH_LIMIT = 20
+
+
+def _animal_ids_matching(q: str):
+    """SELECT of animal ids whose tattoo starts with `q` (index range scan)."""
+    return select(models.Animal.animal_id).where(search.tattoo_prefix(models.Animal.tattoo, q))
+
+
+@app.get("/options/breedings", response_model=list[schemas.OptionItem], dependencies=[Depends(versions.etag("breedings", "animals"))])
+@perf.budget(queries=2)
+@db_endpoint
 def options_breedings(
     include_successful: bool = True,
+    q: str | None = Query(default=None, min_length=1, description="Doe or buck tattoo prefix"),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
 ):
-    animals = db.query(models.Animal).all()
-    tattoo_by_id = {a.animal_id: a.tattoo for a in animals}
-
-    q = db.query(models.Breeding)
+    doe, buck = aliased(models.Animal), aliased(models.Animal)
+    query = (
+        db.query(models.Breeding, doe.tattoo, buck.tattoo)
+        .outerjoin(doe, doe.animal_id == models.Breeding.doe_id)
+        .outerjoin(buck, buck.animal_id == models.Breeding.buck_id)
+    )
     if not include_successful:
-        q = q.filter(models.Breeding.result != "successful")
+        query = query.filter(models.Breeding.result != "successful")
+    if q:
+        matching = _animal_ids_matching(q)
+        query = query.filter(or_(models.Breeding.doe_id.in_(matching), models.Breeding.buck_id.in_(matching)))
+        limit = limit or OPTIONS_SEARCH_LIMIT
 
-    breedings = q.order_by(models.Breeding.bred_date.desc()).all()
+    rows = query.order_by(models.Breeding.bred_date.desc()).limit(limit).all()
 
     out: list[schemas.OptionItem] = []
-    for b in breedings:
-        doe = tattoo_by_id.get(b.doe_id, f"ID {b.doe_id}")
-        buck = tattoo_by_id.get(b.buck_id, f"ID {b.buck_id}")
-        label = f"#{b.breeding_id} {doe} x {buck} (bred {b.bred_date})"
+    for b, doe_tattoo, buck_tattoo in rows:
+        doe_label = doe_tattoo or f"ID {b.doe_id}"
+        buck_label = buck_tattoo or f"ID {b.buck_id}"
+        label = f"#{b.breeding_id} {doe_label} x {buck_label} (bred {b.bred_date})"
         out.append(schemas.OptionItem(id=b.breeding_id, label=label))
     return out
 
 
-@app.get("/options/litters", response_model=list[schemas.OptionItem])
+@app.get("/options/litters", response_model=list[schemas.OptionItem], dependencies=[Depends(versions.etag("litters", "breedings", "animals"))])
+@perf.budget(queries=2)
+@db_endpoint
 def options_litters(
     only_not_weaned: bool = False,
+    q: str | None = Query(default=None, min_length=1, description="Doe tattoo prefix"),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.Litter)
+    query = db.query(models.Litter)
     if only_not_weaned:
-        q = q.filter(models.Litter.weaned_count.is_(None))
+        query = query.filter(models.Litter.weaned_count.is_(None))
+    if q:
+        breedings = select(models.Breeding.breeding_id).where(models.Breeding.doe_id.in_(_animal_ids_matching(q)))
+        query = query.filter(models.Litter.breeding_id.in_(breedings))
+        limit = limit or OPTIONS_SEARCH_LIMIT
 
-    litters = q.order_by(models.Litter.kindling_date.desc()).all()
+    litters = query.order_by(models.Litter.kindling_date.desc()).limit(limit).all()
 
     out: list[schemas.OptionItem] = []
     for l in litters:
@@ -130,83 +206,156 @@ def options_litters(
     return out
 
 
-@app.get("/options/animals", response_model=list[schemas.OptionItem])
+@app.get("/options/animals", response_model=list[schemas.OptionItem], dependencies=[Depends(versions.etag("animals"))])
+@perf.budget(queries=3)
+@db_endpoint
 def options_animals(
-    status: str | None = Query(default=None),
+    status: str | None = Query(default=None, description="One status or a comma-separated list"),
+    q: str | None = Query(default=None, min_length=1, description="Tattoo prefix or (3+ characters) substring"),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.Animal)
+    a = models.Animal
+    query = db.query(a.animal_id, a.tattoo, a.sex, a.status)
     if status:
-        q = q.filter(models.Animal.status == status)
-
-    animals = q.order_by(models.Animal.tattoo.asc()).all()
+        query = query.filter(a.status.in_([s for s in status.split(",") if s]))
+
+    if not q:
+        animals = query.order_by(a.tattoo.asc()).limit(limit).all()
+    else:
+        # Prefix matches first, then tattoos that merely contain q
+        limit = limit or OPTIONS_SEARCH_LIMIT
+        prefix = search.tattoo_prefix(a.tattoo, q)
+        animals = query.filter(prefix).order_by(func.lower(a.tattoo)).limit(limit).all()
+        if len(animals) < limit and len(q) >= search.MIN_SUBSTRING_LENGTH:
+            animals += (
+                query.filter(a.animal_id.in_(search.tattoo_contains(q)), ~prefix)
+                .order_by(func.lower(a.tattoo))
+                .limit(limit - len(animals))
+                .all()
+            )
 
     out: list[schemas.OptionItem] = []
-    for a in animals:
-        label = f"{a.tattoo} (ID {a.animal_id}, {a.sex}, {a.status})"
-        out.append(schemas.OptionItem(id=a.animal_id, label=label))
+    for row in animals:
+        label = f"{row.tattoo} (ID {row.animal_id}, {row.sex}, {row.status})"
+        out.append(schemas.OptionItem(id=row.animal_id, label=label))
     return out
 
 
 # -----------------------------
 # DERIVED METRICS
 # -----------------------------
-@app.get("/metrics", response_model=dict)
-def metrics(db: Session = Depends(get_db)):
-    litters = db.query(models.Litter).all()
-    harvests = db.query(models.Harvest).all()
-
-    total_litters = len(litters)
-    avg_litter_size = (
-        sum(l.born_alive for l in litters) / total_litters
-        if total_litters else None
+@cache.cached("litters", "harvests", "animals")
+def _metrics(db: Session) -> dict:
+    # Two aggregate queries regardless of herd history: one over litters,
+    # one over harvests LEFT JOIN animals for the birth dates.
+    litter_stats = db.query(
+        func.count(models.Litter.litter_id).label("litters"),
+        func.sum(models.Litter.born_alive).label("born_alive"),
+        func.sum(models.Litter.weaned_count).label("weaned"),
+        func.count(models.Litter.weaned_count).label("weaned_known"),
+    ).one()
+
+    days = cast(
+        func.julianday(models.Harvest.harvest_date) - func.julianday(models.Animal.birth_date),
+        Integer,
     )
+    harvest_stats = (
+        db.query(
+            func.count(models.Harvest.harvest_id).label("harvests"),
+            func.sum(days).label("days_sum"),
+            func.count(days).label("days_count"),
+        )
+        .select_from(models.Harvest)
+        .outerjoin(models.Animal, models.Animal.animal_id == models.Harvest.animal_id)
+        .one()
+    )
+
+    total_litters = litter_stats.litters
+    born_alive = litter_stats.born_alive or 0
+    avg_litter_size = born_alive / total_litters if total_litters else None
 
     kit_survival_rate = None
-    if litters and all(l.weaned_count is not None for l in litters) and sum(l.born_alive for l in litters) > 0:
-        kit_survival_rate = sum(l.weaned_count for l in litters) / sum(l.born_alive for l in litters)
+    if total_litters and litter_stats.weaned_known == total_litters and born_alive > 0:
+        kit_survival_rate = litter_stats.weaned / born_alive
 
     avg_days_to_harvest = None
-    if harvests:
-        days = []
-        for h in harvests:
-            a = db.get(models.Animal, h.animal_id)
-            if a and a.birth_date:
-                days.append((h.harvest_date - a.birth_date).days)
-        if days:
-            avg_days_to_harvest = sum(days) / len(days)
+    if harvest_stats.days_count:
+        avg_days_to_harvest = harvest_stats.days_sum / harvest_stats.days_count
 
     return {
         "total_litters": total_litters,
         "average_litter_size": avg_litter_size,
         "kit_survival_rate": kit_survival_rate,
         "average_days_to_harvest": avg_days_to_harvest,
-        "harvested_rabbits": len(harvests),
+        "harvested_rabbits": harvest_stats.harvests,
     }
 
 
+@app.get("/metrics", response_model=dict, dependencies=[Depends(versions.etag("litters", "harvests", "animals"))])
+@perf.budget(queries=5)
+@db_endpoint
+def metrics(db: Session = Depends(get_db)):
+    return _metrics(db=db)
+
+
+@app.get("/metrics/cache", response_model=dict)
+async def cache_stats():
+    """Hit/miss/eviction counters of this worker's response cache."""
+    return cache.response_cache.stats()
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics(db: Session = Depends(get_db)):
+    """Service metrics of this worker in the Prometheus text format (not the herd KPIs of /metrics)."""
+    telemetry.collect_threadpool()
+    rows = await run_db(db, telemetry.count_rows)
+    telemetry.collect({"sync": engine, "async": async_engine}, rows)
+    return PlainTextResponse(telemetry.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/perf", response_model=dict)
+async def debug_perf(request: Request, reset: bool = Query(default=False)):
+    """Queries, rows and SQL time per route for this worker (HTML for browsers)."""
+    snapshot = perf.registry.snapshot()
+    if reset:
+        perf.registry.clear()
+    if "text/html" in request.headers.get("accept", ""):
+        return HTMLResponse(perf.render_html(snapshot))
+    return snapshot
+
+
+@app.get("/debug/slow-queries", response_model=dict)
+async def debug_slow_queries(reset: bool = Query(default=False)):
+    """This worker's slowest statements, each with its worst run's parameters, route and query plan."""
+    statements = slow_query_log.snapshot()
+    if reset:
+        slow_query_log.clear()
+    return {"threshold_ms": slow_query_log.threshold_ms, "statements": statements}
+
+
 # -----------------------------
 # DASHBOARD TODO
 # -----------------------------
-@app.get("/dashboard/todo", response_model=dict)
-def dashboard_todo(
-    kindling_window_days: int = Query(default=7, ge=1, le=60),
-    wean_age_days: int = Query(default=42, ge=1, le=120),
-    harvest_age_days: int = Query(default=84, ge=1, le=200),
-    limit: int = Query(default=25, ge=1, le=200),
-    db: Session = Depends(get_db),
-):
+@cache.cached("breedings", "litters", "animals")
+def _dashboard_todo(
+    db: Session,
+    kindling_window_days: int,
+    wean_age_days: int,
+    harvest_age_days: int,
+    limit: int,
+) -> dict:
     from datetime import date, timedelta
 
     today = date.today()
 
-    animals = db.query(models.Animal).all()
-    tattoo_by_id = {a.animal_id: a.tattoo for a in animals}
-
     # 1) Kindlings due soon
     end = today + timedelta(days=kindling_window_days)
+    doe, buck = aliased(models.Animal), aliased(models.Animal)
     due_breedings = (
-        db.query(models.Breeding)
+        db.query(models.Breeding, doe.tattoo, buck.tattoo)
+        .outerjoin(doe, doe.animal_id == models.Breeding.doe_id)
+        .outerjoin(buck, buck.animal_id == models.Breeding.buck_id)
         .filter(models.Breeding.result == "pending")
         .filter(models.Breeding.expected_kindling.isnot(None))
         .filter(models.Breeding.expected_kindling >= today)
@@ -217,39 +366,38 @@ def dashboard_todo(
     )
 
     kindlings_due = []
-    for b in due_breedings:
-        doe = tattoo_by_id.get(b.doe_id, f"ID {b.doe_id}")
-        buck = tattoo_by_id.get(b.buck_id, f"ID {b.buck_id}")
+    for b, doe_tattoo, buck_tattoo in due_breedings:
+        doe_label = doe_tattoo or f"ID {b.doe_id}"
+        buck_label = buck_tattoo or f"ID {b.buck_id}"
         kindlings_due.append({
             "breeding_id": b.breeding_id,
-            "doe_tattoo": doe,
-            "buck_tattoo": buck,
+            "doe_tattoo": doe_label,
+            "buck_tattoo": buck_label,
             "bred_date": b.bred_date,
             "expected_kindling": b.expected_kindling,
-            "label": f"{doe} x {buck} — expected {b.expected_kindling}",
+            "label": f"{doe_label} x {buck_label} — expected {b.expected_kindling}",
             "link": "/ranch/kindlings",
         })
 
-    # 2) Weanings due
+    # 2) Weanings due: old enough and no kits generated yet. The anti-join
+    # probes animals.litter_id per litter, and LIMIT applies after it.
     wean_cutoff = today - timedelta(days=wean_age_days)
+    has_kits = (
+        select(models.Animal.animal_id)
+        .where(models.Animal.litter_id == models.Litter.litter_id)
+        .exists()
+    )
     candidate_litters = (
         db.query(models.Litter)
         .filter(models.Litter.kindling_date <= wean_cutoff)
+        .filter(~has_kits)
         .order_by(models.Litter.kindling_date.asc())
         .limit(limit)
         .all()
     )
 
-    kit_count_by_litter: dict[int, int] = {}
-    for a in animals:
-        if a.litter_id is not None:
-            kit_count_by_litter[a.litter_id] = kit_count_by_litter.get(a.litter_id, 0) + 1
-
     weanings_due = []
     for l in candidate_litters:
-        kits = kit_count_by_litter.get(l.litter_id, 0)
-        if kits > 0:
-            continue
         age_days = (today - l.kindling_date).days
         weanings_due.append({
             "litter_id": l.litter_id,
@@ -258,7 +406,7 @@ def dashboard_todo(
             "age_days": age_days,
             "born_alive": l.born_alive,
             "weaned_count": l.weaned_count,
-            "kits_generated": kits,
+            "kits_generated": 0,
             "label": f"L{l.litter_id} — {age_days}d old (kindled {l.kindling_date})",
             "link": "/ranch/weanings",
         })
@@ -301,6 +449,78 @@ def dashboard_todo(
     }
 
 
+@app.get("/dashboard/todo", response_model=dict, dependencies=[Depends(versions.etag("breedings", "litters", "animals"))])
+@perf.budget(queries=6)
+@db_endpoint
+def dashboard_todo(
+    kindling_window_days: int = Query(default=7, ge=1, le=60),
+    wean_age_days: int = Query(default=42, ge=1, le=120),
+    harvest_age_days: int = Query(default=84, ge=1, le=200),
+    limit: int = Query(default=25, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    return _dashboard_todo(
+        db=db,
+        kindling_window_days=kindling_window_days,
+        wean_age_days=wean_age_days,
+        harvest_age_days=harvest_age_days,
+        limit=limit,
+    )
+
+
+BOOTSTRAP_TABLES = ("animals", "breedings", "litters", "harvests")
+
+
+@app.get(
+    "/dashboard/bootstrap",
+    response_model=schemas.DashboardBootstrap,
+    dependencies=[Depends(versions.etag(*BOOTSTRAP_TABLES))],
+)
+@perf.budget(queries=12)
+@db_endpoint
+def dashboard_bootstrap(
+    response: Response,
+    recent: int = Query(default=10, ge=1, le=100),
+    kindling_window_days: int = Query(default=7, ge=1, le=60),
+    wean_age_days: int = Query(default=42, ge=1, le=120),
+    harvest_age_days: int = Query(default=84, ge=1, le=200),
+    limit: int = Query(default=25, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """
+    Everything the dashboard renders, in one response: KPIs, the newest
+    `recent` rows of each table and the to-do lists. All of it is read in
+    one explicit read transaction (`begin_snapshot`), so a write committed
+    halfway through cannot make the KPIs disagree with the lists, and every
+    part is bounded in SQL however long the herd history gets.
+
+    The ETag dependency read the table versions before that transaction:
+    they are read again inside it, so the cache keys of the KPIs and to-dos
+    and the returned ETag describe the same snapshot as the lists.
+    """
+    begin_snapshot(db)
+    versions.retag(db)
+
+    def newest(model, schema, *order):
+        rows = db.query(*fastjson.columns(model, schema)).order_by(*(c.desc() for c in order)).limit(recent)
+        return [row._asdict() for row in rows]
+
+    return fastjson.respond_data({
+        "metrics": _metrics(db=db),
+        "animals": newest(models.Animal, schemas.AnimalOut, models.Animal.animal_id),
+        "breedings": newest(models.Breeding, schemas.BreedingOut, models.Breeding.bred_date, models.Breeding.breeding_id),
+        "litters": newest(models.Litter, schemas.LitterOut, models.Litter.kindling_date, models.Litter.litter_id),
+        "harvests": newest(models.Harvest, schemas.HarvestOut, models.Harvest.harvest_date, models.Harvest.harvest_id),
+        "todo": _dashboard_todo(
+            db=db,
+            kindling_window_days=kindling_window_days,
+            wean_age_days=wean_age_days,
+            harvest_age_days=harvest_age_days,
+            limit=limit,
+        ),
+    }, response)
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "dashboard": "/dashboard"}
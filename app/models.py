@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, Integer, String, Date, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Float, Text, ForeignKey, Index, event, func
 from .database import Base
+from . import changes, search, versions
 
 
 class Animal(Base):
     __tablename__ = "animals"
+    __table_args__ = (
+        # harvest-ready growouts: status = ? AND birth_date <= ? ORDER BY birth_date
+        Index("ix_animals_status_birth_date", "status", "birth_date"),
+        # mortality reports: status = 'deceased' AND death_date BETWEEN ? AND ?
+        Index("ix_animals_status_death_date", "status", "death_date"),
+    )
 
     animal_id = Column(Integer, primary_key=True, index=True)
     tattoo = Column(String, unique=True, nullable=False)
@@ -15,19 +22,27 @@ class Animal(Base):
     birth_date = Column(Date)
     source = Column(String)
     status = Column(String, nullable=False)
-    litter_id = Column(Integer, ForeignKey("litters.litter_id"), nullable=True)
+    litter_id = Column(Integer, ForeignKey("litters.litter_id"), nullable=True, index=True)
     death_date = Column(Date)
     death_reason = Column(Text)
     notes = Column(Text)
 
 
+# tattoo typeahead: lower(tattoo) >= ? AND lower(tattoo) < ? (case-insensitive prefix)
+Index("ix_animals_tattoo_lower", func.lower(Animal.tattoo))
+
+
 class Breeding(Base):
     __tablename__ = "breedings"
+    __table_args__ = (
+        # kindlings due: result = 'pending' AND expected_kindling BETWEEN ? AND ?
+        Index("ix_breedings_result_expected_kindling", "result", "expected_kindling"),
+    )
 
     breeding_id = Column(Integer, primary_key=True, index=True)
-    doe_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False)
-    buck_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False)
-    bred_date = Column(Date, nullable=False)
+    doe_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False, index=True)
+    buck_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False, index=True)
+    bred_date = Column(Date, nullable=False, index=True)
     expected_kindling = Column(Date)
     result = Column(String, default="pending")  # pending/successful/missed
     notes = Column(Text)
@@ -37,8 +52,8 @@ class Litter(Base):
     __tablename__ = "litters"
 
     litter_id = Column(Integer, primary_key=True, index=True)
-    breeding_id = Column(Integer, ForeignKey("breedings.breeding_id"), nullable=False)
-    kindling_date = Column(Date, nullable=False)
+    breeding_id = Column(Integer, ForeignKey("breedings.breeding_id"), nullable=False, index=True)
+    kindling_date = Column(Date, nullable=False, index=True)
     born_alive = Column(Integer, nullable=False)
     born_dead = Column(Integer, default=0)
     weaned_count = Column(Integer)
@@ -49,8 +64,8 @@ class Harvest(Base):
     __tablename__ = "harvests"
 
     harvest_id = Column(Integer, primary_key=True, index=True)
-    animal_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False)
-    harvest_date = Column(Date, nullable=False)
+    animal_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=False, index=True)
+    harvest_date = Column(Date, nullable=False, index=True)
     live_weight_grams = Column(Integer)
     carcass_weight_grams = Column(Integer)
     notes = Column(Text)
@@ -60,7 +75,7 @@ class FeedCost(Base):
     __tablename__ = "feed_costs"
 
     feed_cost_id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False, index=True)
     description = Column(String, nullable=True)
     cost_per_unit = Column(Float, nullable=True)
     total_cost = Column(Float, nullable=False)
@@ -72,11 +87,70 @@ class Sale(Base):
     sale_id = Column(Integer, primary_key=True, index=True)
 
     # Exactly one of animal_id or litter_id must be set
-    animal_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=True)
-    litter_id = Column(Integer, ForeignKey("litters.litter_id"), nullable=True)
+    animal_id = Column(Integer, ForeignKey("animals.animal_id"), nullable=True, index=True)
+    litter_id = Column(Integer, ForeignKey("litters.litter_id"), nullable=True, index=True)
 
-    sale_date = Column(Date, nullable=False)
+    sale_date = Column(Date, nullable=False, index=True)
     sale_price = Column(Float, nullable=False)
     buyer_name = Column(String, nullable=True)
     buyer_contact = Column(String, nullable=True)  # phone, email, address, etc.
     notes = Column(Text, nullable=True)
+
+
+class MonthlyRollup(Base):
+    """
+    Per-month totals behind /reports/summary.
+
+    Maintained incrementally by the write paths (see app/rollups.py) and
+    recomputable from the raw tables with `python -m app.rollups --rebuild`.
+    """
+    __tablename__ = "monthly_rollups"
+
+    month = Column(String, primary_key=True)  # YYYY-MM
+
+    # Litters (by kindling month)
+    litters = Column(Integer, nullable=False, default=0)
+    born_alive = Column(Integer, nullable=False, default=0)
+    weaned_litters = Column(Integer, nullable=False, default=0)
+    weaned = Column(Integer, nullable=False, default=0)
+    weaned_born_alive = Column(Integer, nullable=False, default=0)
+
+    # Harvests (by harvest month)
+    harvests = Column(Integer, nullable=False, default=0)
+    days_count = Column(Integer, nullable=False, default=0)
+    days_sum = Column(Integer, nullable=False, default=0)
+    yield_count = Column(Integer, nullable=False, default=0)
+    yield_sum = Column(Float, nullable=False, default=0.0)
+
+    # Mortality (by death month)
+    deaths = Column(Integer, nullable=False, default=0)
+
+    # Feed costs (by purchase month)
+    feed_cost_entries = Column(Integer, nullable=False, default=0)
+    feed_cost_total = Column(Float, nullable=False, default=0.0)
+
+
+class TableVersion(Base):
+    """Change counter per table, bumped by triggers (see app/versions.py)."""
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ChangeEvent(Base):
+    """One entry of the live change feed (see app/changes.py)."""
+    __tablename__ = "change_events"
+
+    event_id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # table name
+    entity_id = Column(Integer)  # NULL for bulk events
+    op = Column(String, nullable=False)  # insert/update/delete/bulk
+    fields = Column(Text)  # JSON object of changed columns
+
+
+# FTS5 virtual tables and their sync triggers live outside the ORM tables
+event.listen(Base.metadata, "after_create", search.create_fts_tables)
+event.listen(Base.metadata, "before_drop", search.drop_fts_tables)
+event.listen(Base.metadata, "after_create", versions.create_version_triggers)
+event.listen(Base.metadata, "after_create", changes.create_retention_trigger)
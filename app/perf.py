@@ -0,0 +1,305 @@
+"""
+app/perf.py
+-----------
+Per-request SQL accounting: how many queries a request ran, how many rows
+it fetched and how long it spent in SQL.
+
+    Server-Timing: db;dur=3.41;desc="7 queries, 120 rows", app;dur=9.87
+
+- `PerfMiddleware` opens a `RequestStats` for every HTTP request (a context
+  variable, so it follows the request into the threadpool) and adds the
+  Server-Timing header when the response starts.
+- Engine-level cursor events count every statement and its time; rows are
+  counted as the sqlite3 cursor hands them out (`CountingConnection`), or,
+  under aiosqlite, as the driver adapter buffers them.
+- Per-route totals, the most recent requests and N+1 suspects (one
+  statement run REPEATED_STATEMENT_THRESHOLD times or more in a request)
+  are kept in `registry` and served at /debug/perf.
+
+Routes can declare how many queries they may run:
+
+    @router.get("/summary", ...)
+    @perf.budget(queries=6)
+    @db_endpoint
+    def report_summary(...): ...
+
+Going over budget is counted (and logged). With PERF_STRICT=1, which the
+test suite turns on, it raises `QueryBudgetExceeded` instead, so a change
+that adds queries to a budgeted route fails its tests.
+
+Configuration:
+    PERF_TRACKING=1   0 removes the middleware (the cursor hooks then no-op)
+    PERF_STRICT=0     1 raises on budget overruns
+"""
+from __future__ import annotations
+
+import html
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+PERF_TRACKING = os.getenv("PERF_TRACKING", "1").lower() in ("1", "true", "yes")
+PERF_STRICT = os.getenv("PERF_STRICT", "0").lower() in ("1", "true", "yes")
+
+# One statement this many times in a request looks like a loop of queries
+REPEATED_STATEMENT_THRESHOLD = 10
+RECENT_REQUESTS = 50
+
+log = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class RequestStats:
+    scope: dict = field(default_factory=dict, repr=False)
+    queries: int = 0
+    rows: int = 0
+    sql_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    @property
+    def route(self) -> str:
+        return route_name(self.scope)
+
+    def repeated(self) -> list[tuple[str, int]]:
+        return [(s, n) for s, n in self.statements.most_common() if n >= REPEATED_STATEMENT_THRESHOLD]
+
+    def server_timing(self, seconds: float) -> str:
+        return (
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.queries} queries, {self.rows} rows", '
+            f"app;dur={seconds * 1000:.2f}"
+        )
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("perf_request", default=None)
+
+
+def route_path(scope) -> str:
+    """"/animals/{animal_id}"; the router fills in the route once it has matched."""
+    route = scope.get("route")
+    return route.path if route is not None else scope.get("root_path") or "(unrouted)"
+
+
+def route_name(scope) -> str:
+    return f"{scope.get('method')} {route_path(scope)}"
+
+
+def current() -> RequestStats | None:
+    """The stats of the request being served, if any."""
+    return _current.get()
+
+
+def budget(queries: int):
+    """Declare the most SQL statements one request to this endpoint may run."""
+    def decorator(fn):
+        fn.query_budget = queries
+        return fn
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# SQL hooks
+# ---------------------------------------------------------------------------
+
+class CountingCursor(sqlite3.Cursor):
+    """sqlite3 cursor that adds the rows it fetches to the current request."""
+
+    def fetchone(self):
+        row = super().fetchone()
+        stats = _current.get()
+        if stats is not None and row is not None:
+            stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += len(rows)
+        return rows
+
+
+class CountingConnection(sqlite3.Connection):
+    """Passed to sqlite3.connect(factory=...) by make_engine."""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["perf_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.pop("perf_started", None)
+    if started is not None:
+        stats.sql_seconds += time.perf_counter() - started
+    stats.queries += 1
+    stats.statements[statement] += 1
+    # The aiosqlite adapter has fetched every row already, on its own thread
+    # where the request's context variable is not set
+    buffered = getattr(cursor, "_rows", None)
+    if buffered is not None and not getattr(cursor, "server_side", False):
+        stats.rows += len(buffered)
+
+
+# ---------------------------------------------------------------------------
+# Aggregation (/debug/perf)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    queries: int = 0
+    max_queries: int = 0
+    rows: int = 0
+    sql_seconds: float = 0.0
+    seconds: float = 0.0
+    budget: int | None = None
+    over_budget: int = 0
+    repeated: int = 0
+
+
+class PerfRegistry:
+    """Per-route totals and the recent requests of this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: dict[str, RouteStats] = {}
+        self.recent: deque = deque(maxlen=RECENT_REQUESTS)
+
+    def record(self, route: str, stats: RequestStats, seconds: float, query_budget: int | None) -> None:
+        repeated = stats.repeated()
+        over = query_budget is not None and stats.queries > query_budget
+        with self._lock:
+            r = self.routes.setdefault(route, RouteStats())
+            r.requests += 1
+            r.queries += stats.queries
+            r.max_queries = max(r.max_queries, stats.queries)
+            r.rows += stats.rows
+            r.sql_seconds += stats.sql_seconds
+            r.seconds += seconds
+            r.budget = query_budget
+            r.over_budget += over
+            r.repeated += bool(repeated)
+            self.recent.append({
+                "route": route,
+                "queries": stats.queries,
+                "rows": stats.rows,
+                "sql_ms": round(stats.sql_seconds * 1000, 2),
+                "ms": round(seconds * 1000, 2),
+                "repeated": [{"statement": s, "count": n} for s, n in repeated],
+            })
+
+        for statement, n in repeated:
+            log.warning("%s ran one statement %d times (N+1?): %s", route, n, " ".join(statement.split())[:200])
+        if over:
+            message = f"{route} ran {stats.queries} queries; its budget is {query_budget}"
+            if PERF_STRICT:
+                raise QueryBudgetExceeded(message)
+            log.warning(message)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self.recent.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {
+                name: {
+                    "requests": r.requests,
+                    "avg_queries": round(r.queries / r.requests, 2),
+                    "max_queries": r.max_queries,
+                    "budget": r.budget,
+                    "over_budget": r.over_budget,
+                    "avg_rows": round(r.rows / r.requests, 1),
+                    "avg_sql_ms": round(r.sql_seconds * 1000 / r.requests, 2),
+                    "avg_ms": round(r.seconds * 1000 / r.requests, 2),
+                    "n_plus_one_suspects": r.repeated,
+                }
+                for name, r in sorted(self.routes.items(), key=lambda kv: -kv[1].sql_seconds)
+            }
+            return {"routes": routes, "recent": list(reversed(self.recent))}
+
+
+registry = PerfRegistry()
+
+
+def render_html(snapshot: dict) -> str:
+    """/debug/perf as a plain table for the browser."""
+    columns = ["requests", "avg_queries", "max_queries", "budget", "over_budget", "avg_rows",
+               "avg_sql_ms", "avg_ms", "n_plus_one_suspects"]
+    head = "".join(f"<th>{c.replace('_', ' ')}</th>" for c in ["route", *columns])
+    body = "".join(
+        f"<tr><td>{html.escape(name)}</td>" + "".join(f"<td>{'' if r[c] is None else r[c]}</td>" for c in columns) + "</tr>"
+        for name, r in snapshot["routes"].items()
+    )
+    suspects = "".join(
+        f"<li>{html.escape(req['route'])}: {s['count']}x <code>{html.escape(s['statement'])}</code></li>"
+        for req in snapshot["recent"] for s in req["repeated"]
+    )
+    return (
+        "<!doctype html><html><head><meta charset='utf-8'><title>SQL per request</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:right}td:first-child{text-align:left}"
+        "</style></head><body><h1>SQL per request</h1>"
+        f"<table><tr>{head}</tr>{body}</table>"
+        f"<h2>Repeated statements (recent requests)</h2><ul>{suspects or '<li>none</li>'}</ul>"
+        "</body></html>"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class PerfMiddleware:
+    """Opens RequestStats per HTTP request; adds Server-Timing; records the totals."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+        query_budget = getattr(scope.get("endpoint"), "query_budget", None)
+        registry.record(stats.route, stats, time.perf_counter() - started, query_budget)
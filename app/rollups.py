@@ -0,0 +1,354 @@
+"""
+app/rollups.py
+--------------
+Monthly rollups for /reports/summary.
+
+Every write path that changes a reported figure (litters, harvests,
+deaths, feed costs) records its contribution here in the same
+transaction, so the summary reads one row per month instead of
+aggregating every record.
+
+If the rollups ever drift (manual SQL edits, restored backups), recompute
+them from the raw tables:
+    python -m app.rollups --rebuild
+"""
+from __future__ import annotations
+
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import Float, Integer, case, cast, delete, func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models, versions
+
+# (month key, {rollup column: amount}); month is None when nothing is counted
+Contribution = tuple[str | None, dict]
+
+FIELDS = (
+    "litters", "born_alive", "weaned_litters", "weaned", "weaned_born_alive",
+    "harvests", "days_count", "days_sum", "yield_count", "yield_sum",
+    "deaths",
+    "feed_cost_entries", "feed_cost_total",
+)
+
+# A month belongs on the report axis if any of these is non-zero
+PRESENCE_FIELDS = ("litters", "harvests", "deaths", "feed_cost_entries")
+
+# The tables the rollups are computed from: /reports/summary is versioned
+# (ETag, response cache) by their counters
+SOURCE_TABLES = ("animals", "litters", "harvests", "feed_costs")
+
+
+def month_key(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def empty_month() -> dict:
+    return {f: 0 for f in FIELDS}
+
+
+# ---------------------------------------------------------------------------
+# Contributions of single records
+# ---------------------------------------------------------------------------
+
+def litter_contribution(litter: models.Litter) -> Contribution:
+    weaned_known = litter.weaned_count is not None
+    born_alive = litter.born_alive or 0
+    return month_key(litter.kindling_date), {
+        "litters": 1,
+        "born_alive": born_alive,
+        "weaned_litters": 1 if weaned_known else 0,
+        "weaned": litter.weaned_count or 0,
+        "weaned_born_alive": born_alive if weaned_known else 0,
+    }
+
+
+def harvest_contribution(harvest: models.Harvest, birth_date: date | None) -> Contribution:
+    live = harvest.live_weight_grams
+    carcass = harvest.carcass_weight_grams
+    has_yield = bool(live and carcass and live > 0)
+    return month_key(harvest.harvest_date), {
+        "harvests": 1,
+        "days_count": 1 if birth_date else 0,
+        "days_sum": (harvest.harvest_date - birth_date).days if birth_date else 0,
+        "yield_count": 1 if has_yield else 0,
+        "yield_sum": carcass / live if has_yield else 0.0,
+    }
+
+
+def death_contribution(animal: models.Animal) -> Contribution:
+    if animal.status != "deceased" or animal.death_date is None:
+        return None, {}
+    return month_key(animal.death_date), {"deaths": 1}
+
+
+def feed_cost_contribution(entry: models.FeedCost) -> Contribution:
+    return month_key(entry.date), {
+        "feed_cost_entries": 1,
+        "feed_cost_total": float(entry.total_cost or 0),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Applying contributions (joins the caller's transaction; caller commits)
+# ---------------------------------------------------------------------------
+
+def _apply(db: Session, month: str | None, deltas: dict) -> None:
+    deltas = {k: v for k, v in deltas.items() if v}
+    if month is None or not deltas:
+        return
+    stmt = sqlite_insert(models.MonthlyRollup).values(month=month, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.MonthlyRollup.month],
+        set_={k: getattr(models.MonthlyRollup, k) + stmt.excluded[k] for k in deltas},
+    )
+    db.execute(stmt)
+
+
+def add(db: Session, contribution: Contribution) -> None:
+    _apply(db, *contribution)
+
+
+def negate(contribution: Contribution) -> Contribution:
+    month, deltas = contribution
+    return month, {k: -v for k, v in deltas.items()}
+
+
+def remove(db: Session, contribution: Contribution) -> None:
+    _apply(db, *negate(contribution))
+
+
+def add_all(db: Session, contributions) -> None:
+    """Apply many contributions with one upsert per month (bulk imports)."""
+    merged: dict[str, dict] = {}
+    for month, deltas in contributions:
+        if month is None:
+            continue
+        acc = merged.setdefault(month, {})
+        for k, v in deltas.items():
+            acc[k] = acc.get(k, 0) + v
+    for month, deltas in merged.items():
+        _apply(db, month, deltas)
+
+
+def replace(db: Session, old: Contribution, new: Contribution) -> None:
+    """Swap a record's old contribution for its new one (one upsert if the month is unchanged)."""
+    if old[0] == new[0]:
+        keys = set(old[1]) | set(new[1])
+        _apply(db, new[0], {k: new[1].get(k, 0) - old[1].get(k, 0) for k in keys})
+        return
+    remove(db, old)
+    add(db, new)
+
+
+# ---------------------------------------------------------------------------
+# Raw aggregation (GROUP BY month over the source tables)
+# ---------------------------------------------------------------------------
+
+def _month(col):
+    return func.strftime("%Y-%m", col)
+
+
+def _range_filters(q, col, start_date, end_date):
+    if start_date is not None:
+        q = q.filter(col >= start_date)
+    if end_date is not None:
+        q = q.filter(col <= end_date)
+    return q
+
+
+def raw_months(db: Session, start_date: date | None = None, end_date: date | None = None) -> dict:
+    """
+    Aggregate the raw tables into {month: {field: value}} for a date range.
+
+    Undated deaths (deceased without a death_date) are keyed under None and
+    only counted when no range is given.
+    """
+    out: dict = {}
+
+    def merge(rows):
+        for r in rows:
+            vals = r._asdict()
+            out.setdefault(vals.pop("month"), empty_month()).update(vals)
+
+    l = models.Litter
+    month = _month(l.kindling_date).label("month")
+    q = db.query(
+        month,
+        func.count().label("litters"),
+        func.coalesce(func.sum(l.born_alive), 0).label("born_alive"),
+        func.count(l.weaned_count).label("weaned_litters"),
+        func.coalesce(func.sum(l.weaned_count), 0).label("weaned"),
+        func.coalesce(func.sum(case((l.weaned_count.isnot(None), l.born_alive))), 0).label("weaned_born_alive"),
+    )
+    merge(_range_filters(q, l.kindling_date, start_date, end_date).group_by(month))
+
+    h, a = models.Harvest, models.Animal
+    month = _month(h.harvest_date).label("month")
+    days = cast(func.julianday(h.harvest_date) - func.julianday(a.birth_date), Integer)
+    yld = case(
+        (
+            (h.live_weight_grams > 0)
+            & h.carcass_weight_grams.isnot(None)
+            & (h.carcass_weight_grams != 0),
+            cast(h.carcass_weight_grams, Float) / h.live_weight_grams,
+        )
+    )
+    q = (
+        db.query(
+            month,
+            func.count().label("harvests"),
+            func.count(days).label("days_count"),
+            func.coalesce(func.sum(days), 0).label("days_sum"),
+            func.count(yld).label("yield_count"),
+            func.coalesce(func.sum(yld), 0.0).label("yield_sum"),
+        )
+        .select_from(h)
+        .outerjoin(a, a.animal_id == h.animal_id)
+    )
+    merge(_range_filters(q, h.harvest_date, start_date, end_date).group_by(month))
+
+    month = _month(a.death_date).label("month")
+    q = db.query(month, func.count().label("deaths")).filter(a.status == "deceased")
+    if start_date is not None or end_date is not None:
+        q = _range_filters(q.filter(a.death_date.isnot(None)), a.death_date, start_date, end_date)
+    merge(q.group_by(month))
+
+    fc = models.FeedCost
+    month = _month(fc.date).label("month")
+    q = db.query(
+        month,
+        func.count().label("feed_cost_entries"),
+        func.sum(fc.total_cost).label("feed_cost_total"),
+    )
+    merge(_range_filters(q, fc.date, start_date, end_date).group_by(month))
+
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _rollup_rows(db: Session, first_month: str | None, last_month: str | None) -> dict:
+    q = db.query(models.MonthlyRollup)
+    if first_month is not None:
+        q = q.filter(models.MonthlyRollup.month >= first_month)
+    if last_month is not None:
+        q = q.filter(models.MonthlyRollup.month <= last_month)
+    return {r.month: {f: getattr(r, f) for f in FIELDS} for r in q}
+
+
+def _first_of_next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def months_in_range(db: Session, start_date: date | None, end_date: date | None) -> dict:
+    """
+    {month: {field: value}} for a date range, read from the rollups.
+
+    Whole months come from monthly_rollups. A range that starts or ends
+    mid-month has its partial edge months aggregated from the raw tables,
+    which touches at most two months of records.
+    """
+    if start_date is None and end_date is None:
+        months = _rollup_rows(db, None, None)
+        # Deceased without a death date never land in a monthly row
+        undated = (
+            db.query(func.count(models.Animal.animal_id))
+            .filter(models.Animal.status == "deceased")
+            .filter(models.Animal.death_date.is_(None))
+            .scalar()
+        )
+        if undated:
+            months.setdefault(None, empty_month())["deaths"] = undated
+        return months
+
+    # Whole months covered by [start_date, end_date]
+    full_from = start_date
+    if start_date is not None and start_date.day != 1:
+        full_from = _first_of_next_month(start_date)
+    full_to = end_date
+    if end_date is not None and _first_of_next_month(end_date) - timedelta(days=1) != end_date:
+        full_to = end_date.replace(day=1) - timedelta(days=1)
+
+    if full_from is not None and full_to is not None and full_from > full_to:
+        return raw_months(db, start_date, end_date)
+
+    months = _rollup_rows(
+        db,
+        month_key(full_from) if full_from is not None else None,
+        month_key(full_to) if full_to is not None else None,
+    )
+    if start_date is not None and start_date < full_from:
+        months.update(raw_months(db, start_date, full_from - timedelta(days=1)))
+    if end_date is not None and end_date > full_to:
+        months.update(raw_months(db, full_to + timedelta(days=1), end_date))
+    return months
+
+
+# ---------------------------------------------------------------------------
+# Rebuild
+# ---------------------------------------------------------------------------
+
+def rebuild(db: Session) -> int:
+    """
+    Recompute every rollup row from the raw tables. Returns the number of months written.
+
+    The source tables' versions are bumped too: the summary's ETag and cache
+    entries were derived from the rollups being replaced.
+    """
+    rows = [{"month": mk, **vals} for mk, vals in raw_months(db).items() if mk is not None]
+    db.execute(delete(models.MonthlyRollup))
+    if rows:
+        db.execute(insert(models.MonthlyRollup), rows)
+    versions.bump(db, SOURCE_TABLES)
+    db.commit()
+    return len(rows)
+
+
+def ensure_initialized(db: Session) -> None:
+    """Backfill the rollups once for databases that predate the table."""
+    if db.query(models.MonthlyRollup.month).first() is not None:
+        return
+    has_history = any(
+        db.query(q.exists()).scalar()
+        for q in (
+            db.query(models.Litter.litter_id),
+            db.query(models.Harvest.harvest_id),
+            db.query(models.FeedCost.feed_cost_id),
+            db.query(models.Animal.animal_id).filter(models.Animal.status == "deceased"),
+        )
+    )
+    if has_history:
+        rebuild(db)
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def main() -> None:
+    if "--rebuild" not in sys.argv:
+        print("Usage: python -m app.rollups --rebuild")
+        sys.exit(2)
+
+    from .database import Base, engine, SessionLocal
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Rebuilding monthly rollups...")
+        n = rebuild(db)
+        print(f"  ✓ Months: {n}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
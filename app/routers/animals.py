@@ -2,17 +2,24 @@ from __future__ import annotations
 
 from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import fastjson, models, pagination, perf, rollups, schemas, versions
 
 router = APIRouter(prefix="/animals", tags=["animals"])
 
 
 @router.post("/", response_model=schemas.AnimalOut)
+@db_endpoint
 def create_animal(payload: schemas.AnimalCreate, db: Session = Depends(get_db)):
+    # Deaths and harvests have their own workflows (PATCH / POST /harvests)
+    if payload.status in ("deceased", "harvested"):
+        raise HTTPException(400, f"Cannot create an animal with status '{payload.status}'")
+    if payload.litter_id is not None and not db.get(models.Litter, payload.litter_id):
+        raise HTTPException(404, "Litter not found")
+
     animal = models.Animal(**payload.model_dump())
     db.add(animal)
     db.commit()
@@ -20,20 +27,34 @@ def create_animal(payload: schemas.AnimalCreate, db: Session = Depends(get_db)):
     return animal
 
 
-@router.get("/", response_model=list[schemas.AnimalOut])
+@router.get("/", response_model=list[schemas.AnimalOut], dependencies=[Depends(versions.etag("animals"))])
+@perf.budget(queries=2)
+@db_endpoint
 def list_animals(
+    response: Response,
     skip: int = Query(default=0, ge=0),
-    limit: int = Query(default=200, ge=1, le=1000),
+    limit: int = Query(default=200, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: str | None = Query(default=None),
     status: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.Animal)
+    q = db.query(*fastjson.columns(models.Animal, schemas.AnimalOut))
     if status:
         q = q.filter(models.Animal.status == status)
-    return q.order_by(models.Animal.animal_id.asc()).offset(skip).limit(limit).all()
 
+    # Legacy OFFSET paging; prefer following X-Next-Cursor
+    if skip and cursor is None:
+        rows = q.order_by(models.Animal.animal_id.asc()).offset(skip).limit(limit).all()
+    else:
+        rows = pagination.paginate(
+            q, [models.Animal.animal_id],
+            descending=False, cursor=cursor, limit=limit, response=response,
+        )
+    return fastjson.respond(rows, response)
 
-@router.get("/{animal_id}", response_model=schemas.AnimalOut)
+
+@router.get("/{animal_id}", response_model=schemas.AnimalOut, dependencies=[Depends(versions.etag("animals"))])
+@db_endpoint
 def get_animal(animal_id: int, db: Session = Depends(get_db)):
     animal = db.get(models.Animal, animal_id)
     if not animal:
@@ -42,6 +63,7 @@ def get_animal(animal_id: int, db: Session = Depends(get_db)):
 
 
 @router.patch("/{animal_id}", response_model=schemas.AnimalOut)
+@db_endpoint
 def update_animal_status(
     animal_id: int,
     payload: schemas.AnimalStatusUpdate,
@@ -55,6 +77,7 @@ def update_animal_status(
     if payload.status == "harvested":
         raise HTTPException(400, "Use /harvests to mark an animal harvested")
 
+    before = rollups.death_contribution(animal)
     animal.status = payload.status
 
     if payload.status == "deceased":
@@ -64,12 +87,14 @@ def update_animal_status(
         animal.death_date = None
         animal.death_reason = None
 
+    rollups.replace(db, before, rollups.death_contribution(animal))
     db.commit()
     db.refresh(animal)
     return animal
 
 
 @router.delete("/{animal_id}", status_code=204)
+@db_endpoint
 def delete_animal(animal_id: int, db: Session = Depends(get_db)):
     """
     Hard-delete an animal record.
@@ -77,6 +102,7 @@ def delete_animal(animal_id: int, db: Session = Depends(get_db)):
     Guards:
     - Cannot delete an animal that is the doe or buck on any breeding.
     - Cannot delete an animal that has a harvest record.
+    - Cannot delete an animal that has an individual sale record.
     - Cannot delete an animal that is a parent via litter_id kit rows
       (delete the kits first).
     """
@@ -113,5 +139,19 @@ def delete_animal(animal_id: int, db: Session = Depends(get_db)):
             "Delete the harvest first.",
         )
 
+    # Block if referenced by a sale
+    sale_ref = (
+        db.query(models.Sale)
+        .filter(models.Sale.animal_id == animal_id)
+        .first()
+    )
+    if sale_ref:
+        raise HTTPException(
+            409,
+            f"Animal {animal_id} has a sale record ({sale_ref.sale_id}). "
+            "Delete the sale first.",
+        )
+
+    rollups.remove(db, rollups.death_contribution(animal))
     db.delete(animal)
     db.commit()
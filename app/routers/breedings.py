@@ -2,16 +2,19 @@ from __future__ import annotations
 
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import fastjson, models, pagination, perf, schemas, versions
 
 router = APIRouter(prefix="/breedings", tags=["breedings"])
 
+GESTATION_DAYS = 31
+
 
 @router.post("/", response_model=schemas.BreedingOut)
+@db_endpoint
 def create_breeding(payload: schemas.BreedingCreate, db: Session = Depends(get_db)):
     doe = db.get(models.Animal, payload.doe_id)
     buck = db.get(models.Animal, payload.buck_id)
@@ -25,7 +28,7 @@ def create_breeding(payload: schemas.BreedingCreate, db: Session = Depends(get_d
         doe_id=payload.doe_id,
         buck_id=payload.buck_id,
         bred_date=payload.bred_date,
-        expected_kindling=payload.bred_date + timedelta(days=31),
+        expected_kindling=payload.bred_date + timedelta(days=GESTATION_DAYS),
         result="pending",
     )
 
@@ -35,12 +38,25 @@ def create_breeding(payload: schemas.BreedingCreate, db: Session = Depends(get_d
     return breeding
 
 
-@router.get("/", response_model=list[schemas.BreedingOut])
-def list_breedings(db: Session = Depends(get_db)):
-    return db.query(models.Breeding).order_by(models.Breeding.bred_date.desc()).all()
+@router.get("/", response_model=list[schemas.BreedingOut], dependencies=[Depends(versions.etag("breedings"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_breedings(
+    response: Response,
+    cursor: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    rows = pagination.paginate(
+        db.query(*fastjson.columns(models.Breeding, schemas.BreedingOut)),
+        [models.Breeding.bred_date, models.Breeding.breeding_id],
+        descending=True, cursor=cursor, limit=limit, response=response,
+    )
+    return fastjson.respond(rows, response)
 
 
 @router.patch("/{breeding_id}", response_model=schemas.BreedingOut)
+@db_endpoint
 def update_breeding(breeding_id: int, payload: schemas.BreedingUpdate, db: Session = Depends(get_db)):
     breeding = db.get(models.Breeding, breeding_id)
     if not breeding:
@@ -0,0 +1,213 @@
+"""
+Live change feed as Server-Sent Events.
+
+    GET /changes            new events from now on
+    GET /changes?last_event_id=N, or the Last-Event-ID header
+                            every event after N, then new ones
+
+Each event is
+
+    id: 42
+    event: change
+    data: {"entity": "animals", "id": 12, "op": "update", "fields": {"status": "sold"}}
+
+EventSource sends Last-Event-ID by itself when it reconnects, so a dropped
+connection resumes without missing events. When the events after N are no
+longer in the log (or N is from another database) the feed sends one
+`reset` event and carries on from the newest event; the client reloads.
+
+A stream ends after CHANGE_FEED_STREAM_SECONDS and the browser reconnects,
+which returns the connection to the pool of a busy worker now and then.
+
+Streams do not poll the database themselves: while any are open, one task
+per worker (`ChangeFeed`) reads new events every CHANGE_FEED_POLL seconds
+and keeps the latest SHARED_EVENTS in memory for all of them. A stream only
+reads the log itself to catch up from an id older than that, each time with
+a short session of its own (the request session is closed before the body
+is sent).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+
+import anyio
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import close_session, get_db, run_db, sibling_session
+from .. import changes
+
+log = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+CHANGE_FEED_POLL = float(os.getenv("CHANGE_FEED_POLL", "1.0"))
+CHANGE_FEED_STREAM_SECONDS = float(os.getenv("CHANGE_FEED_STREAM_SECONDS", "300"))
+
+KEEPALIVE_SECONDS = 15
+BATCH = 500
+RETRY_MS = 2000
+# Newest events kept in memory for the open streams of a worker
+SHARED_EVENTS = 2 * BATCH
+
+
+def _frame(event: str, data: str, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n"
+
+
+async def _read(open_session, fn, *args):
+    """Run `fn(session, *args)` on a session opened and closed for this one read."""
+    db = open_session()
+    try:
+        return await run_db(db, fn, *args)
+    finally:
+        await close_session(db)
+
+
+class ChangeFeed:
+    """
+    The one poller of a worker: reads events after the newest it has seen,
+    keeps the last SHARED_EVENTS, and wakes the streams waiting for them.
+
+    It runs only while a stream is subscribed, and starts from a clean
+    state every time the first one subscribes.
+    """
+
+    def __init__(self):
+        self.newest: int | None = None
+        self.events: deque[tuple[int, str]] = deque(maxlen=SHARED_EVENTS)
+        self.subscribers = 0
+        self._task: asyncio.Task | None = None
+        self._arrived: asyncio.Condition | None = None
+
+    @asynccontextmanager
+    async def subscribe(self, open_session):
+        if self.subscribers == 0:
+            self.newest = None
+            self.events.clear()
+            self._arrived = asyncio.Condition()
+            # A fresh context: the polls belong to no request's SQL accounting
+            self._task = asyncio.get_running_loop().create_task(
+                self._poll(open_session), context=contextvars.Context(),
+            )
+        self.subscribers += 1
+        try:
+            yield self
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0:
+                task, self._task = self._task, None
+                task.cancel()
+                # Wait for the poll to stop: one cancelled mid-read still owns
+                # a threadpool job and a session, which must not outlive the
+                # last stream (or the event loop serving it)
+                with anyio.CancelScope(shield=True):
+                    with suppress(asyncio.CancelledError):
+                        await task
+
+    def events_after(self, after: int) -> list[tuple[int, str]] | None:
+        """Up to BATCH events after `after` from memory, or None if they are not all there."""
+        if self.newest is None:
+            return None
+        if after >= self.newest:
+            return []
+        if not self.events or self.events[0][0] > after + 1:
+            return None
+        return [e for e in self.events if e[0] > after][:BATCH]
+
+    async def wait(self, after: int, timeout: float) -> None:
+        """Until an event after `after` has been read, or `timeout` seconds."""
+        arrived = self._arrived
+        async with arrived:
+            try:
+                await asyncio.wait_for(
+                    arrived.wait_for(lambda: self.newest is not None and self.newest > after), timeout,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, open_session) -> None:
+        while True:
+            try:
+                if self.newest is None:
+                    _, newest = await _read(open_session, changes.bounds)
+                    events, self.newest = [], newest or 0
+                else:
+                    events = await _read(open_session, changes.since, self.newest, BATCH)
+                    if events:
+                        self.events.extend(events)
+                        self.newest = events[-1][0]
+                        async with self._arrived:
+                            self._arrived.notify_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("change feed poll failed")
+                events = []
+            if len(events) < BATCH:
+                await asyncio.sleep(CHANGE_FEED_POLL)
+
+
+feed = ChangeFeed()
+
+
+@router.get("", response_class=StreamingResponse)
+async def change_feed(
+    request: Request,
+    last_event_id: int | None = Query(default=None, ge=0),
+    last_event_id_header: str | None = Header(default=None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+):
+    if last_event_id is None and last_event_id_header and last_event_id_header.strip().isdigit():
+        last_event_id = int(last_event_id_header)
+
+    open_session = functools.partial(sibling_session, db)
+
+    async def stream():
+        yield f"retry: {RETRY_MS}\n\n"
+
+        oldest, newest = await _read(open_session, changes.bounds)
+        newest = newest or 0
+        after = last_event_id
+        if after is None:
+            after = newest
+        elif after > newest or (oldest is not None and after < oldest - 1):
+            yield _frame("reset", '{"last_event_id":%d}' % newest, newest)
+            after = newest
+
+        deadline = time.monotonic() + CHANGE_FEED_STREAM_SECONDS
+        quiet_since = time.monotonic()
+        async with feed.subscribe(open_session):
+            while True:
+                events = feed.events_after(after)
+                if events is None:  # further back than the shared events: catch up from the log
+                    events = await _read(open_session, changes.since, after, BATCH)
+                for event_id, data in events:
+                    yield _frame("change", data, event_id)
+                    after = event_id
+                if len(events) == BATCH:
+                    continue  # catching up
+                if events:
+                    quiet_since = time.monotonic()
+                elif time.monotonic() - quiet_since >= KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    quiet_since = time.monotonic()
+
+                if time.monotonic() >= deadline or await request.is_disconnected():
+                    break
+                await feed.wait(after, CHANGE_FEED_POLL)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
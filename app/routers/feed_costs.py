@@ -1,36 +1,48 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import fastjson, models, pagination, perf, rollups, schemas, versions
 
 router = APIRouter(prefix="/feed-costs", tags=["feed-costs"])
 
 
-@router.get("/", response_model=list[schemas.FeedCostOut])
-def list_feed_costs(db: Session = Depends(get_db)):
-    return (
-        db.query(models.FeedCost)
-        .order_by(models.FeedCost.date.desc())
-        .all()
+@router.get("/", response_model=list[schemas.FeedCostOut], dependencies=[Depends(versions.etag("feed_costs"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_feed_costs(
+    response: Response,
+    cursor: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    rows = pagination.paginate(
+        db.query(*fastjson.columns(models.FeedCost, schemas.FeedCostOut)),
+        [models.FeedCost.date, models.FeedCost.feed_cost_id],
+        descending=True, cursor=cursor, limit=limit, response=response,
     )
+    return fastjson.respond(rows, response)
 
 
 @router.post("/", response_model=schemas.FeedCostOut)
+@db_endpoint
 def create_feed_cost(payload: schemas.FeedCostCreate, db: Session = Depends(get_db)):
     entry = models.FeedCost(**payload.model_dump())
     db.add(entry)
+    rollups.add(db, rollups.feed_cost_contribution(entry))
     db.commit()
     db.refresh(entry)
     return entry
 
 
 @router.delete("/{feed_cost_id}", status_code=204)
+@db_endpoint
 def delete_feed_cost(feed_cost_id: int, db: Session = Depends(get_db)):
     entry = db.get(models.FeedCost, feed_cost_id)
     if not entry:
         raise HTTPException(404, "Feed cost entry not found")
+    rollups.remove(db, rollups.feed_cost_contribution(entry))
     db.delete(entry)
     db.commit()
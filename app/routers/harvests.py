@@ -1,40 +1,61 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import fastjson, models, pagination, perf, rollups, schemas, versions
 
 router = APIRouter(prefix="/harvests", tags=["harvests"])
 
 
-@router.get("/", response_model=list[schemas.HarvestOut])
-def list_harvests(db: Session = Depends(get_db)):
-    return db.query(models.Harvest).order_by(models.Harvest.harvest_date.desc()).all()
+@router.get("/", response_model=list[schemas.HarvestOut], dependencies=[Depends(versions.etag("harvests"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_harvests(
+    response: Response,
+    cursor: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    rows = pagination.paginate(
+        db.query(*fastjson.columns(models.Harvest, schemas.HarvestOut)),
+        [models.Harvest.harvest_date, models.Harvest.harvest_id],
+        descending=True, cursor=cursor, limit=limit, response=response,
+    )
+    return fastjson.respond(rows, response)
 
 
 @router.post("/", response_model=schemas.HarvestOut)
+@db_endpoint
 def record_harvest(payload: schemas.HarvestCreate, db: Session = Depends(get_db)):
     animal = db.get(models.Animal, payload.animal_id)
     if not animal:
         raise HTTPException(404, "Animal not found")
 
     harvest = models.Harvest(**payload.model_dump())
+    death_before = rollups.death_contribution(animal)
     animal.status = "harvested"
 
     db.add(harvest)
+    rollups.add(db, rollups.harvest_contribution(harvest, animal.birth_date))
+    rollups.remove(db, death_before)
     db.commit()
     db.refresh(harvest)
     return harvest
 
 
 @router.patch("/{harvest_id}", response_model=schemas.HarvestOut)
+@db_endpoint
 def update_harvest(harvest_id: int, payload: schemas.HarvestUpdate, db: Session = Depends(get_db)):
     harvest = db.get(models.Harvest, harvest_id)
     if not harvest:
         raise HTTPException(404, "Harvest not found")
 
+    animal = db.get(models.Animal, harvest.animal_id)
+    birth_date = animal.birth_date if animal else None
+    before = rollups.harvest_contribution(harvest, birth_date)
+
     if payload.harvest_date is not None:
         harvest.harvest_date = payload.harvest_date
     if payload.live_weight_grams is not None:
@@ -44,6 +65,7 @@ def update_harvest(harvest_id: int, payload: schemas.HarvestUpdate, db: Session
     if payload.notes is not None:
         harvest.notes = payload.notes
 
+    rollups.replace(db, before, rollups.harvest_contribution(harvest, birth_date))
     db.commit()
     db.refresh(harvest)
     return harvest
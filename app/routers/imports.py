@@ -0,0 +1,372 @@
+"""
+Bulk import of herd records (spreadsheet migrations).
+
+POST /import/{entity} streams the request body as NDJSON (one JSON object
+per line) or CSV (header row first). Each row is validated with the same
+schemas.*Create model and rules as the single-record POST. Valid rows are
+inserted in batches of `batch_size`, one transaction per batch. Invalid rows
+are skipped and listed in the report by row number, and the import carries on.
+
+Cross-references may be given by tattoo instead of id:
+    breedings   doe_tattoo, buck_tattoo          -> doe_id, buck_id
+    litters     doe_tattoo + bred_date           -> breeding_id
+    harvests    animal_tattoo                    -> animal_id
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..database import get_db, run_db
+from .. import changes, models, rollups, schemas
+from .breedings import GESTATION_DAYS
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+
+class RowError(Exception):
+    """A row that could not even be parsed; reported instead of imported."""
+
+
+# ---------------------------------------------------------------------------
+# Parsing the streamed body into (row number, fields) pairs
+# ---------------------------------------------------------------------------
+
+async def _lines(chunks):
+    """Decode a byte stream into lines, keeping line endings."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _ndjson_rows(chunks):
+    n = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        n += 1
+        try:
+            fields = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield n, RowError(f"Invalid JSON: {e.msg}")
+            continue
+        if not isinstance(fields, dict):
+            yield n, RowError("Expected a JSON object")
+            continue
+        yield n, fields
+
+
+async def _csv_rows(chunks):
+    header = None
+    record = ""
+    n = 0
+    async for line in _lines(chunks):
+        record += line
+        if record.count('"') % 2:
+            continue  # a quoted field continues on the next line
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        n += 1
+        if len(values) > len(header):
+            yield n, RowError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells are missing values, so schema defaults apply
+        yield n, {k: v for k, v in zip(header, values) if v != ""}
+    if record.strip():
+        yield n + 1, RowError("Unterminated quoted field")
+
+
+# ---------------------------------------------------------------------------
+# Per-entity importers: validate a batch, insert it, apply side effects.
+# Each returns the number of rows inserted; the caller commits.
+# ---------------------------------------------------------------------------
+
+def _messages(e: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+
+def _validate(rows, model, reject):
+    out = []
+    for n, raw in rows:
+        try:
+            out.append((n, model.model_validate(raw)))
+        except ValidationError as e:
+            reject(n, *_messages(e))
+    return out
+
+
+def _resolve_tattoos(db: Session, rows, reject, **fields):
+    """Fill id fields from tattoo fields (doe_tattoo="doe_id") where no id was given."""
+    def wanted(raw):
+        return [(t, f) for t, f in fields.items() if raw.get(f) is None and raw.get(t) is not None]
+
+    tattoos = {str(raw[t]) for _, raw in rows for t, _ in wanted(raw)}
+    ids = {}
+    if tattoos:
+        ids = dict(
+            db.query(models.Animal.tattoo, models.Animal.animal_id)
+            .filter(models.Animal.tattoo.in_(tattoos))
+            .all()
+        )
+
+    out = []
+    for n, raw in rows:
+        unknown = []
+        for t, f in wanted(raw):
+            if str(raw[t]) in ids:
+                raw[f] = ids[str(raw[t])]
+            else:
+                unknown.append(f"{t}: unknown tattoo '{raw[t]}'")
+        if unknown:
+            reject(n, *unknown)
+        else:
+            out.append((n, raw))
+    return out
+
+
+def _insert(db: Session, model, values: list[dict]) -> int:
+    if values:
+        db.execute(insert(model.__table__), values)
+        changes.record_bulk(db, model.__tablename__, len(values))
+    return len(values)
+
+
+def _import_animals(db: Session, rows, reject) -> int:
+    records = _validate(rows, schemas.AnimalCreate, reject)
+
+    tattoos = {r.tattoo for _, r in records}
+    taken = {t for (t,) in db.query(models.Animal.tattoo).filter(models.Animal.tattoo.in_(tattoos))}
+    litter_ids = {r.litter_id for _, r in records if r.litter_id is not None}
+    litters = {i for (i,) in db.query(models.Litter.litter_id).filter(models.Litter.litter_id.in_(litter_ids))}
+
+    values = []
+    for n, r in records:
+        if r.status in ("deceased", "harvested"):
+            reject(n, f"Cannot create an animal with status '{r.status}'")
+        elif r.litter_id is not None and r.litter_id not in litters:
+            reject(n, "Litter not found")
+        elif r.tattoo in taken:
+            reject(n, f"Tattoo '{r.tattoo}' already exists")
+        else:
+            taken.add(r.tattoo)
+            values.append(r.model_dump())
+    return _insert(db, models.Animal, values)
+
+
+def _import_breedings(db: Session, rows, reject) -> int:
+    rows = _resolve_tattoos(db, rows, reject, doe_tattoo="doe_id", buck_tattoo="buck_id")
+    records = _validate(rows, schemas.BreedingCreate, reject)
+
+    animal_ids = {r.doe_id for _, r in records} | {r.buck_id for _, r in records}
+    sexes = dict(
+        db.query(models.Animal.animal_id, models.Animal.sex)
+        .filter(models.Animal.animal_id.in_(animal_ids))
+        .all()
+    )
+
+    values = []
+    for n, r in records:
+        if sexes.get(r.doe_id) != "F":
+            reject(n, "Invalid doe")
+        elif sexes.get(r.buck_id) != "M":
+            reject(n, "Invalid buck")
+        else:
+            values.append({
+                "doe_id": r.doe_id,
+                "buck_id": r.buck_id,
+                "bred_date": r.bred_date,
+                "expected_kindling": r.bred_date + timedelta(days=GESTATION_DAYS),
+                "result": "pending",
+            })
+    return _insert(db, models.Breeding, values)
+
+
+def _resolve_breedings(db: Session, rows, reject):
+    """Fill breeding_id from doe_tattoo + bred_date where no id was given."""
+    def wanted(raw):
+        return raw.get("breeding_id") is None and raw.get("doe_tattoo") is not None
+
+    tattoos = {str(raw["doe_tattoo"]) for _, raw in rows if wanted(raw)}
+    found = defaultdict(list)
+    if tattoos:
+        q = (
+            db.query(models.Animal.tattoo, models.Breeding.bred_date, models.Breeding.breeding_id)
+            .join(models.Breeding, models.Breeding.doe_id == models.Animal.animal_id)
+            .filter(models.Animal.tattoo.in_(tattoos))
+        )
+        for tattoo, bred_date, breeding_id in q:
+            found[(tattoo, bred_date.isoformat())].append(breeding_id)
+
+    out = []
+    for n, raw in rows:
+        if wanted(raw):
+            matches = found.get((str(raw["doe_tattoo"]), str(raw.get("bred_date"))), [])
+            if len(matches) != 1:
+                problem = "No breeding" if not matches else "Several breedings"
+                reject(n, f"{problem} for doe '{raw['doe_tattoo']}' bred on {raw.get('bred_date')}")
+                continue
+            raw["breeding_id"] = matches[0]
+        out.append((n, raw))
+    return out
+
+
+def _import_litters(db: Session, rows, reject) -> int:
+    rows = _resolve_breedings(db, rows, reject)
+    records = _validate(rows, schemas.LitterCreate, reject)
+
+    breeding_ids = {r.breeding_id for _, r in records}
+    found = {i for (i,) in db.query(models.Breeding.breeding_id).filter(models.Breeding.breeding_id.in_(breeding_ids))}
+
+    accepted = []
+    for n, r in records:
+        if r.breeding_id not in found:
+            reject(n, "Breeding not found")
+        else:
+            accepted.append(r)
+
+    if accepted:
+        db.execute(
+            update(models.Breeding)
+            .where(models.Breeding.breeding_id.in_({r.breeding_id for r in accepted}))
+            .values(result="successful")
+            .execution_options(synchronize_session=False)
+        )
+        changes.record_bulk(db, "breedings", len({r.breeding_id for r in accepted}))
+    rollups.add_all(db, (rollups.litter_contribution(r) for r in accepted))
+    return _insert(db, models.Litter, [r.model_dump() for r in accepted])
+
+
+def _import_harvests(db: Session, rows, reject) -> int:
+    rows = _resolve_tattoos(db, rows, reject, animal_tattoo="animal_id")
+    records = _validate(rows, schemas.HarvestCreate, reject)
+
+    animal_ids = {r.animal_id for _, r in records}
+    animals = {
+        a.animal_id: a
+        for a in db.query(
+            models.Animal.animal_id, models.Animal.birth_date, models.Animal.status, models.Animal.death_date
+        ).filter(models.Animal.animal_id.in_(animal_ids))
+    }
+
+    values = []
+    contributions = []
+    harvested = set()
+    for n, r in records:
+        animal = animals.get(r.animal_id)
+        if animal is None:
+            reject(n, "Animal not found")
+            continue
+        contributions.append(rollups.harvest_contribution(r, animal.birth_date))
+        if animal.animal_id not in harvested:
+            contributions.append(rollups.negate(rollups.death_contribution(animal)))
+            harvested.add(animal.animal_id)
+        values.append(r.model_dump())
+
+    if harvested:
+        db.execute(
+            update(models.Animal)
+            .where(models.Animal.animal_id.in_(harvested))
+            .values(status="harvested")
+            .execution_options(synchronize_session=False)
+        )
+        changes.record_bulk(db, "animals", len(harvested))
+    rollups.add_all(db, contributions)
+    return _insert(db, models.Harvest, values)
+
+
+IMPORTERS = {
+    "animals": _import_animals,
+    "breedings": _import_breedings,
+    "litters": _import_litters,
+    "harvests": _import_harvests,
+}
+
+
+def _import_batch(db: Session, importer, batch) -> tuple[int, list[schemas.ImportRowError]]:
+    errors: list[schemas.ImportRowError] = []
+
+    def reject(n: int, *messages: str):
+        errors.append(schemas.ImportRowError(row=n, errors=list(messages)))
+
+    rows = []
+    for n, raw in batch:
+        if isinstance(raw, RowError):
+            reject(n, str(raw))
+        else:
+            rows.append((n, raw))
+
+    try:
+        inserted = importer(db, rows, reject)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        rejected = {err.row for err in errors}
+        reason = f"Batch rolled back: {getattr(e, 'orig', None) or e}"
+        for n, _ in rows:
+            if n not in rejected:
+                reject(n, reason)
+        inserted = 0
+    return inserted, errors
+
+
+@router.post("/{entity}", response_model=schemas.ImportReport)
+async def import_rows(
+    entity: str,
+    request: Request,
+    format: str | None = Query(default=None, pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(default=DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    db: Session = Depends(get_db),
+):
+    importer = IMPORTERS.get(entity)
+    if importer is None:
+        raise HTTPException(404, f"Unknown import entity; expected one of: {', '.join(IMPORTERS)}")
+
+    # Without ?format= the Content-Type decides (text/csv, else NDJSON)
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    rows = (_csv_rows if format == "csv" else _ndjson_rows)(request.stream())
+
+    report = schemas.ImportReport(entity=entity, received=0, inserted=0, failed=0, errors=[])
+
+    async def flush(batch):
+        inserted, errors = await run_db(db, _import_batch, importer, batch)
+        report.inserted += inserted
+        report.errors.extend(errors)
+
+    batch = []
+    async for row in rows:
+        report.received += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    report.errors.sort(key=lambda err: err.row)
+    report.failed = len(report.errors)
+    return report
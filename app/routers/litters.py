@@ -1,20 +1,37 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from collections import Counter
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import changes, fastjson, models, pagination, perf, rollups, schemas, versions
 
 router = APIRouter(prefix="/litters", tags=["litters"])
 
 
-@router.get("/", response_model=list[schemas.LitterOut])
-def list_litters(db: Session = Depends(get_db)):
-    return db.query(models.Litter).order_by(models.Litter.kindling_date.desc()).all()
+@router.get("/", response_model=list[schemas.LitterOut], dependencies=[Depends(versions.etag("litters"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_litters(
+    response: Response,
+    cursor: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    rows = pagination.paginate(
+        db.query(*fastjson.columns(models.Litter, schemas.LitterOut)),
+        [models.Litter.kindling_date, models.Litter.litter_id],
+        descending=True, cursor=cursor, limit=limit, response=response,
+    )
+    return fastjson.respond(rows, response)
 
 
 @router.post("/", response_model=schemas.LitterOut)
+@db_endpoint
 def create_litter(payload: schemas.LitterCreate, db: Session = Depends(get_db)):
     breeding = db.get(models.Breeding, payload.breeding_id)
     if not breeding:
@@ -24,6 +41,7 @@ def create_litter(payload: schemas.LitterCreate, db: Session = Depends(get_db)):
         litter = models.Litter(**payload.model_dump())
         breeding.result = "successful"
         db.add(litter)
+        rollups.add(db, rollups.litter_contribution(litter))
         db.commit()
         db.refresh(litter)
         return litter
@@ -33,11 +51,14 @@ def create_litter(payload: schemas.LitterCreate, db: Session = Depends(get_db)):
 
 
 @router.patch("/{litter_id}", response_model=schemas.LitterOut)
+@db_endpoint
 def update_litter(litter_id: int, payload: schemas.LitterUpdate, db: Session = Depends(get_db)):
     litter = db.get(models.Litter, litter_id)
     if not litter:
         raise HTTPException(404, "Litter not found")
 
+    before = rollups.litter_contribution(litter)
+
     if payload.kindling_date is not None:
         litter.kindling_date = payload.kindling_date
     if payload.born_alive is not None:
@@ -49,73 +70,143 @@ def update_litter(litter_id: int, payload: schemas.LitterUpdate, db: Session = D
     if payload.notes is not None:
         litter.notes = payload.notes
 
+    rollups.replace(db, before, rollups.litter_contribution(litter))
     db.commit()
     db.refresh(litter)
     return litter
 
 
-@router.get("/{litter_id}/kits", response_model=list[schemas.AnimalOut])
-def list_kits_for_litter(litter_id: int, db: Session = Depends(get_db)):
-    return (
-        db.query(models.Animal)
+@router.get("/{litter_id}/kits", response_model=list[schemas.AnimalOut], dependencies=[Depends(versions.etag("animals"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_kits_for_litter(litter_id: int, response: Response, db: Session = Depends(get_db)):
+    rows = (
+        db.query(*fastjson.columns(models.Animal, schemas.AnimalOut))
         .filter(models.Animal.litter_id == litter_id)
         .order_by(models.Animal.animal_id.asc())
         .all()
     )
+    return fastjson.respond(rows, response)
+
+
+def _generate_kits(db: Session, requests: list[tuple[models.Litter, schemas.GenerateKitsRequest]]):
+    """
+    Create the weaned kits for each (litter, request) pair with one bulk INSERT.
+
+    Tattoos continue from the kits each litter already has; those counts come
+    from one grouped query over the animals.litter_id index. A tattoo that
+    would clash is a 409 before anything is inserted. The caller commits
+    (or rolls back).
+    """
+    litter_ids = [litter.litter_id for litter, _ in requests]
+    existing = dict(
+        db.query(models.Animal.litter_id, func.count())
+        .filter(models.Animal.litter_id.in_(litter_ids))
+        .group_by(models.Animal.litter_id)
+        .all()
+    )
 
+    rows = []
+    for litter, payload in requests:
+        before = rollups.litter_contribution(litter)
+        litter.weaned_count = payload.weaned_count
+        rollups.replace(db, before, rollups.litter_contribution(litter))
 
-@router.post("/{litter_id}/generate-kits", response_model=schemas.GenerateKitsResponse)
-def generate_kits(litter_id: int, payload: schemas.GenerateKitsRequest, db: Session = Depends(get_db)):
-    litter = db.get(models.Litter, litter_id)
-    if not litter:
-        raise HTTPException(404, "Litter not found")
+        prefix = payload.tattoo_prefix or f"L{litter.litter_id}-"
 
-    litter.weaned_count = payload.weaned_count
+        m = payload.male_count or 0
+        f = payload.female_count or 0
+        u = payload.weaned_count - (m + f)
+        sexes = ("M" * m) + ("F" * f) + ("U" * u)
 
-    prefix = payload.tattoo_prefix or f"L{litter_id}-"
+        start_index = existing.get(litter.litter_id, 0) + 1
+        for i in range(payload.weaned_count):
+            rows.append({
+                "tattoo": f"{prefix}K{start_index + i:02d}",
+                "sex": sexes[i],
+                "status": payload.status,
+                "birth_date": litter.kindling_date,
+                "litter_id": litter.litter_id,
+                "source": "generated",
+                "notes": f"Generated from litter {litter.litter_id} at weaning",
+            })
+
+    # A custom prefix can repeat another litter's tattoos, in this batch or
+    # already in the herd: name the first clash instead of failing the INSERT
+    tattoos = [r["tattoo"] for r in rows]
+    repeated = next((t for t, n in Counter(tattoos).items() if n > 1), None)
+    if repeated is not None:
+        raise HTTPException(409, f"Tattoo '{repeated}' would be generated twice in this batch")
+    taken = db.query(models.Animal.tattoo).filter(models.Animal.tattoo.in_(tattoos)).order_by(models.Animal.tattoo).first()
+    if taken is not None:
+        raise HTTPException(409, f"Tattoo '{taken.tattoo}' already exists")
+
+    # One multi-row INSERT ... RETURNING. SQLite does not promise RETURNING
+    # order, so ids are matched back through the (unique) tattoos.
+    try:
+        ids = dict(
+            db.execute(
+                insert(models.Animal).returning(models.Animal.tattoo, models.Animal.animal_id),
+                rows,
+            ).all()
+        )
+    except IntegrityError:
+        # Taken by a concurrent request since the check above
+        raise HTTPException(409, "A generated tattoo already exists")
+    changes.record(db, "animals", "insert", ((ids[r["tattoo"]], {**r, "animal_id": ids[r["tattoo"]]}) for r in rows))
+
+    out = []
+    offset = 0
+    for litter, payload in requests:
+        tattoos = [r["tattoo"] for r in rows[offset:offset + payload.weaned_count]]
+        offset += payload.weaned_count
+        out.append(schemas.GenerateKitsResponse(
+            litter_id=litter.litter_id,
+            created=payload.weaned_count,
+            animal_ids=[ids[t] for t in tattoos],
+            tattoos=tattoos,
+        ))
+    return out
+
+
+@router.post("/generate-kits", response_model=list[schemas.GenerateKitsResponse])
+@perf.budget(queries=9)
+@db_endpoint
+def generate_kits_batch(payload: schemas.GenerateKitsBatchRequest, db: Session = Depends(get_db)):
+    """Wean several litters at once; either every litter's kits are created or none are."""
+    litter_ids = [item.litter_id for item in payload.litters]
+    if len(set(litter_ids)) != len(litter_ids):
+        raise HTTPException(400, "Each litter may appear only once per batch")
+
+    litters = {
+        litter.litter_id: litter
+        for litter in db.query(models.Litter).filter(models.Litter.litter_id.in_(litter_ids))
+    }
+    missing = [i for i in litter_ids if i not in litters]
+    if missing:
+        raise HTTPException(404, f"Litter not found: {missing[0]}")
 
-    m = payload.male_count or 0
-    f = payload.female_count or 0
-    u = payload.weaned_count - (m + f)
-    sexes = ("M" * m) + ("F" * f) + ("U" * u)
+    try:
+        out = _generate_kits(db, [(litters[item.litter_id], item) for item in payload.litters])
+        db.commit()
+        return out
+    except Exception:
+        db.rollback()
+        raise
 
-    existing = (
-        db.query(models.Animal)
-        .filter(models.Animal.litter_id == litter_id)
-        .count()
-    )
-    start_index = existing + 1
 
-    created_ids: list[int] = []
-    created_tattoos: list[str] = []
+@router.post("/{litter_id}/generate-kits", response_model=schemas.GenerateKitsResponse)
+@perf.budget(queries=8)
+@db_endpoint
+def generate_kits(litter_id: int, payload: schemas.GenerateKitsRequest, db: Session = Depends(get_db)):
+    litter = db.get(models.Litter, litter_id)
+    if not litter:
+        raise HTTPException(404, "Litter not found")
 
     try:
-        for i in range(payload.weaned_count):
-            n = start_index + i
-            tattoo = f"{prefix}K{n:02d}"
-
-            animal = models.Animal(
-                tattoo=tattoo,
-                sex=sexes[i],
-                status=payload.status,
-                birth_date=litter.kindling_date,
-                litter_id=litter_id,
-                source="generated",
-                notes=f"Generated from litter {litter_id} at weaning",
-            )
-
-            db.add(animal)
-            db.flush()
-            created_ids.append(animal.animal_id)
-            created_tattoos.append(tattoo)
-
+        (out,) = _generate_kits(db, [(litter, payload)])
         db.commit()
-        return schemas.GenerateKitsResponse(
-            litter_id=litter_id,
-            created=payload.weaned_count,
-            animal_ids=created_ids,
-            tattoos=created_tattoos,
-        )
+        return out
     except Exception:
         db.rollback()
         raise
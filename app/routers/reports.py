@@ -1,14 +1,16 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from datetime import date
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from starlette.background import BackgroundTask
 
-from ..database import get_db
-from .. import models
+from ..database import begin_snapshot, close_session, db_endpoint, get_db, run_db, sibling_session
+from .. import cache, fastjson, models, perf, rollups, versions
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -22,92 +24,143 @@ def _date_range_filters(start_date, end_date, col):
         yield col <= end_date
 
 
-def _csv_stream(rows, header):
-    import csv
-    from io import StringIO
+# Rows pulled from SQLite per fetch, and CSV rows written per chunk sent to
+# the client. Together they bound an export's memory regardless of table size.
+CSV_FETCH_SIZE = 1000
+CSV_FLUSH_ROWS = 500
+
+
+class _CsvChunker:
+    """Writes CSV rows into a buffer and hands it back every `CSV_FLUSH_ROWS` rows."""
+
+    def __init__(self, header):
+        import csv
+        from io import StringIO
+
+        self.buf = StringIO()
+        self.writer = csv.writer(self.buf)
+        self.writer.writerow(header)
+        self.pending = 0
+
+    def add(self, row) -> str | None:
+        self.writer.writerow(row)
+        self.pending += 1
+        if self.pending < CSV_FLUSH_ROWS:
+            return None
+        return self.flush()
+
+    def flush(self) -> str:
+        chunk = self.buf.getvalue()
+        self.buf.seek(0)
+        self.buf.truncate(0)
+        self.pending = 0
+        return chunk
+
+
+def _snapshot_versions(db: Session, tables) -> dict[str, int]:
+    begin_snapshot(db)
+    return versions.current(db, tables)
+
+
+async def _csv_response(request: Request, db, tables, statement, header, to_row, filename: str):
+    """
+    Stream `statement` as CSV, converting each result row with `to_row`.
+
+    The export gets its own session (`sibling_session`) with one read
+    transaction: the ETag is computed from the `tables` versions inside it,
+    and the rows streamed afterwards come from the same snapshot. Rows are
+    fetched `CSV_FETCH_SIZE` at a time and written out in chunks of
+    `CSV_FLUSH_ROWS`; the session is closed once the body is sent (or the
+    client goes away). On an AsyncSession the rows are fetched with
+    `AsyncSession.stream()`.
+    """
+    stream_db = sibling_session(db)
+    try:
+        headers = versions.conditional(request, await run_db(stream_db, _snapshot_versions, tables))
+    except BaseException:
+        await close_session(stream_db)
+        raise
+
+    if isinstance(stream_db, AsyncSession):
+        body = _csv_stream_async(stream_db, statement, header, to_row)
+    else:
+        body = _csv_stream_sync(stream_db, statement, header, to_row)
+    return StreamingResponse(
+        body,
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}", **headers},
+        background=BackgroundTask(close_session, stream_db),
+    )
 
-    buf = StringIO()
-    w = csv.writer(buf)
-    w.writerow(header)
-    yield buf.getvalue()
 
-    for r in rows:
-        buf.seek(0)
-        buf.truncate(0)
-        w.writerow(r)
-        yield buf.getvalue()
+def _csv_stream_sync(db: Session, statement, header, to_row):
+    out = _CsvChunker(header)
+    for r in db.execute(statement.execution_options(yield_per=CSV_FETCH_SIZE)):
+        chunk = out.add(to_row(r))
+        if chunk:
+            yield chunk
+    yield out.flush()
 
 
-def _month_key(d: date) -> str:
-    return f"{d.year:04d}-{d.month:02d}"
+async def _csv_stream_async(db: AsyncSession, statement, header, to_row):
+    out = _CsvChunker(header)
+    result = await db.stream(statement.execution_options(yield_per=CSV_FETCH_SIZE))
+    async for r in result:
+        chunk = out.add(to_row(r))
+        if chunk:
+            yield chunk
+    yield out.flush()
 
 
-@router.get("/summary")
+@router.get("/summary", dependencies=[Depends(versions.etag(*rollups.SOURCE_TABLES))])
+@perf.budget(queries=12)
+@db_endpoint
 def report_summary(
+    response: Response,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    # --- Litters ---
-    lq = db.query(models.Litter)
-    for f in _date_range_filters(start_date, end_date, models.Litter.kindling_date):
-        lq = lq.filter(f)
-    litters = lq.all()
+    return fastjson.respond_data(_report_summary(start_date=start_date, end_date=end_date, db=db), response)
 
-    total_litters = len(litters)
-    total_born_alive = sum(l.born_alive or 0 for l in litters)
-    avg_litter_size = (total_born_alive / total_litters) if total_litters else None
 
-    weaned_known = [l for l in litters if l.weaned_count is not None]
-    survival_rate = None
-    denom = sum(l.born_alive or 0 for l in weaned_known)
-    if weaned_known and denom > 0:
-        survival_rate = sum(l.weaned_count or 0 for l in weaned_known) / denom
+@cache.cached(*rollups.SOURCE_TABLES)
+def _report_summary(start_date: date | None, end_date: date | None, db: Session) -> dict:
+    # One row per month from the incrementally maintained rollups; only
+    # partial edge months of a date range are aggregated from raw records.
+    by_month = rollups.months_in_range(db, start_date, end_date)
 
-    # --- Harvests ---
-    hq = db.query(models.Harvest)
-    for f in _date_range_filters(start_date, end_date, models.Harvest.harvest_date):
-        hq = hq.filter(f)
-    harvests = hq.all()
+    def total(field: str):
+        return sum(m[field] for m in by_month.values())
 
-    harvested_count = len(harvests)
+    # --- Litters ---
+    total_litters = total("litters")
+    total_born_alive = total("born_alive")
+    avg_litter_size = (total_born_alive / total_litters) if total_litters else None
 
-    animals = db.query(models.Animal).all()
-    animal_by_id = {a.animal_id: a for a in animals}
+    survival_rate = None
+    denom = total("weaned_born_alive")
+    if total("weaned_litters") and denom > 0:
+        survival_rate = total("weaned") / denom
 
-    days_to_harvest = []
-    yields = []
-    for h in harvests:
-        a = animal_by_id.get(h.animal_id)
-        if a and a.birth_date:
-            days_to_harvest.append((h.harvest_date - a.birth_date).days)
-        if h.live_weight_grams and h.carcass_weight_grams and h.live_weight_grams > 0:
-            yields.append(h.carcass_weight_grams / h.live_weight_grams)
+    # --- Harvests ---
+    harvested_count = total("harvests")
 
-    avg_days_to_harvest = (sum(days_to_harvest) / len(days_to_harvest)) if days_to_harvest else None
-    avg_yield = (sum(yields) / len(yields)) if yields else None
+    days_count = total("days_count")
+    avg_days_to_harvest = (total("days_sum") / days_count) if days_count else None
+    yield_count = total("yield_count")
+    avg_yield = (total("yield_sum") / yield_count) if yield_count else None
 
     # --- Mortality ---
-    aq = db.query(models.Animal).filter(models.Animal.status == "deceased")
-    if start_date is not None or end_date is not None:
-        if start_date is not None:
-            aq = aq.filter(models.Animal.death_date.isnot(None)).filter(models.Animal.death_date >= start_date)
-        if end_date is not None:
-            aq = aq.filter(models.Animal.death_date.isnot(None)).filter(models.Animal.death_date <= end_date)
-    deceased = aq.all()
-    mortality_count = len(deceased)
+    mortality_count = total("deaths")
 
     # --- Feed Costs ---
-    fq = db.query(models.FeedCost)
-    for f in _date_range_filters(start_date, end_date, models.FeedCost.date):
-        fq = fq.filter(f)
-    feed_costs = fq.all()
-
-    total_feed_cost = sum(fc.total_cost or 0 for fc in feed_costs)
+    feed_cost_by_month = {
+        mk: float(m["feed_cost_total"] or 0)
+        for mk, m in by_month.items() if m["feed_cost_entries"]
+    }
+    total_feed_cost = sum(m["feed_cost_total"] or 0 for m in by_month.values() if m["feed_cost_entries"])
     avg_feed_cost_per_month = None
-    feed_cost_by_month: dict[str, float] = defaultdict(float)
-    for fc in feed_costs:
-        feed_cost_by_month[_month_key(fc.date)] += float(fc.total_cost or 0)
     if feed_cost_by_month:
         avg_feed_cost_per_month = total_feed_cost / len(feed_cost_by_month)
 
@@ -117,42 +170,22 @@ def report_summary(
         cost_per_harvested = total_feed_cost / harvested_count
 
     # --- Time series ---
-    litters_by_month: dict[str, int] = defaultdict(int)
-    born_alive_by_month: dict[str, int] = defaultdict(int)
-    weaned_by_month: dict[str, int] = defaultdict(int)
-
-    for l in litters:
-        mk = _month_key(l.kindling_date)
-        litters_by_month[mk] += 1
-        born_alive_by_month[mk] += int(l.born_alive or 0)
-        if l.weaned_count is not None:
-            weaned_by_month[mk] += int(l.weaned_count or 0)
-
-    harvests_by_month: dict[str, int] = defaultdict(int)
-    avg_yield_by_month_acc: dict[str, list] = defaultdict(list)
-
-    for h in harvests:
-        mk = _month_key(h.harvest_date)
-        harvests_by_month[mk] += 1
-        if h.live_weight_grams and h.carcass_weight_grams and h.live_weight_grams > 0:
-            avg_yield_by_month_acc[mk].append(h.carcass_weight_grams / h.live_weight_grams)
-
-    avg_yield_by_month: dict[str, float | None] = {}
-    for mk, vals in avg_yield_by_month_acc.items():
-        avg_yield_by_month[mk] = sum(vals) / len(vals) if vals else None
-
-    mortality_by_month: dict[str, int] = defaultdict(int)
-    for a in deceased:
-        if a.death_date:
-            mortality_by_month[_month_key(a.death_date)] += 1
+    dated = {
+        mk: m for mk, m in by_month.items()
+        if mk is not None and any(m[f] for f in rollups.PRESENCE_FIELDS)
+    }
+    litters_by_month = {mk: m["litters"] for mk, m in dated.items()}
+    born_alive_by_month = {mk: m["born_alive"] for mk, m in dated.items()}
+    weaned_by_month = {mk: m["weaned"] for mk, m in dated.items()}
+    harvests_by_month = {mk: m["harvests"] for mk, m in dated.items()}
+    mortality_by_month = {mk: m["deaths"] for mk, m in dated.items()}
+    avg_yield_by_month = {
+        mk: (m["yield_sum"] / m["yield_count"]) if m["yield_count"] else None
+        for mk, m in dated.items()
+    }
 
     # Stable month axis across all series
-    months = sorted(set(
-        list(litters_by_month.keys())
-        + list(harvests_by_month.keys())
-        + list(mortality_by_month.keys())
-        + list(feed_cost_by_month.keys())
-    ))
+    months = sorted(dated)
 
     def series(name: str, mapping, fmt="int"):
         out = []
@@ -209,131 +242,142 @@ def report_summary(
 
 
 @router.get("/breedings.csv")
-def report_breedings_csv(
+@perf.budget(queries=3)
+async def report_breedings_csv(
+    request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     result: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    animals = db.query(models.Animal).all()
-    tattoo_by_id = {a.animal_id: a.tattoo for a in animals}
-
-    q = db.query(models.Breeding)
-    for f in _date_range_filters(start_date, end_date, models.Breeding.bred_date):
-        q = q.filter(f)
+    doe = aliased(models.Animal)
+    buck = aliased(models.Animal)
+    b = models.Breeding
+
+    q = (
+        select(
+            b.breeding_id, b.doe_id, b.buck_id, b.bred_date, b.expected_kindling, b.result,
+            doe.tattoo.label("doe_tattoo"), buck.tattoo.label("buck_tattoo"),
+        )
+        .outerjoin(doe, doe.animal_id == b.doe_id)
+        .outerjoin(buck, buck.animal_id == b.buck_id)
+    )
+    for f in _date_range_filters(start_date, end_date, b.bred_date):
+        q = q.where(f)
     if result:
-        q = q.filter(models.Breeding.result == result)
-
-    breedings = q.order_by(models.Breeding.bred_date.desc()).all()
+        q = q.where(b.result == result)
+    q = q.order_by(b.bred_date.desc())
 
     header = ["breeding_id", "doe_tattoo", "buck_tattoo", "bred_date", "expected_kindling", "result"]
-    rows = [
-        [
-            b.breeding_id,
-            tattoo_by_id.get(b.doe_id, b.doe_id),
-            tattoo_by_id.get(b.buck_id, b.buck_id),
-            b.bred_date,
-            b.expected_kindling,
-            b.result,
+
+    def to_row(r):
+        return [
+            r.breeding_id,
+            r.doe_tattoo if r.doe_tattoo is not None else r.doe_id,
+            r.buck_tattoo if r.buck_tattoo is not None else r.buck_id,
+            r.bred_date,
+            r.expected_kindling,
+            r.result,
         ]
-        for b in breedings
-    ]
 
-    return StreamingResponse(
-        _csv_stream(rows, header),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=breedings.csv"},
-    )
+    return await _csv_response(request, db, ("breedings", "animals"), q, header, to_row, "breedings.csv")
 
 
 @router.get("/litters.csv")
-def report_litters_csv(
+@perf.budget(queries=3)
+async def report_litters_csv(
+    request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    animals = db.query(models.Animal).all()
-    tattoo_by_id = {a.animal_id: a.tattoo for a in animals}
-
-    breedings = db.query(models.Breeding).all()
-    breeding_map = {
-        b.breeding_id: (tattoo_by_id.get(b.doe_id, b.doe_id), tattoo_by_id.get(b.buck_id, b.buck_id))
-        for b in breedings
-    }
-
-    q = db.query(models.Litter)
-    for f in _date_range_filters(start_date, end_date, models.Litter.kindling_date):
-        q = q.filter(f)
-    litters = q.order_by(models.Litter.kindling_date.desc()).all()
+    doe = aliased(models.Animal)
+    buck = aliased(models.Animal)
+    l, b = models.Litter, models.Breeding
+
+    q = (
+        select(
+            l.litter_id, l.breeding_id, l.kindling_date, l.born_alive, l.born_dead, l.weaned_count,
+            b.breeding_id.label("found_breeding"), b.doe_id, b.buck_id,
+            doe.tattoo.label("doe_tattoo"), buck.tattoo.label("buck_tattoo"),
+        )
+        .outerjoin(b, b.breeding_id == l.breeding_id)
+        .outerjoin(doe, doe.animal_id == b.doe_id)
+        .outerjoin(buck, buck.animal_id == b.buck_id)
+    )
+    for f in _date_range_filters(start_date, end_date, l.kindling_date):
+        q = q.where(f)
+    q = q.order_by(l.kindling_date.desc())
 
     header = ["litter_id", "breeding_id", "doe_tattoo", "buck_tattoo", "kindling_date", "born_alive", "born_dead", "weaned_count", "survival_pct"]
-    rows = []
-    for l in litters:
-        doe, buck = breeding_map.get(l.breeding_id, ("—", "—"))
+
+    def to_row(r):
+        if r.found_breeding is None:
+            doe_t, buck_t = "—", "—"
+        else:
+            doe_t = r.doe_tattoo if r.doe_tattoo is not None else r.doe_id
+            buck_t = r.buck_tattoo if r.buck_tattoo is not None else r.buck_id
         survival = None
-        if l.weaned_count is not None and l.born_alive:
-            survival = round((l.weaned_count / l.born_alive) * 100, 1)
-        rows.append([l.litter_id, l.breeding_id, doe, buck, l.kindling_date, l.born_alive, l.born_dead, l.weaned_count, survival])
+        if r.weaned_count is not None and r.born_alive:
+            survival = round((r.weaned_count / r.born_alive) * 100, 1)
+        return [r.litter_id, r.breeding_id, doe_t, buck_t, r.kindling_date, r.born_alive, r.born_dead, r.weaned_count, survival]
 
-    return StreamingResponse(
-        _csv_stream(rows, header),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=litters.csv"},
-    )
+    return await _csv_response(request, db, ("litters", "breedings", "animals"), q, header, to_row, "litters.csv")
 
 
 @router.get("/harvests.csv")
-def report_harvests_csv(
+@perf.budget(queries=3)
+async def report_harvests_csv(
+    request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    animals = db.query(models.Animal).all()
-    animal_by_id = {a.animal_id: a for a in animals}
-
-    q = db.query(models.Harvest)
-    for f in _date_range_filters(start_date, end_date, models.Harvest.harvest_date):
-        q = q.filter(f)
-    harvests = q.order_by(models.Harvest.harvest_date.desc()).all()
+    h, a = models.Harvest, models.Animal
+
+    q = (
+        select(
+            h.harvest_id, h.animal_id, h.harvest_date, h.live_weight_grams, h.carcass_weight_grams,
+            a.animal_id.label("found_animal"), a.tattoo, a.litter_id, a.birth_date,
+        )
+        .outerjoin(a, a.animal_id == h.animal_id)
+    )
+    for f in _date_range_filters(start_date, end_date, h.harvest_date):
+        q = q.where(f)
+    q = q.order_by(h.harvest_date.desc())
 
     header = ["harvest_id", "animal_id", "tattoo", "litter_id", "harvest_date", "age_days", "live_weight_grams", "carcass_weight_grams", "yield_pct"]
-    rows = []
-    for h in harvests:
-        a = animal_by_id.get(h.animal_id)
-        tattoo = a.tattoo if a else "—"
-        litter_id = a.litter_id if a else None
-        age_days = (h.harvest_date - a.birth_date).days if (a and a.birth_date) else None
+
+    def to_row(r):
+        found = r.found_animal is not None
+        tattoo = r.tattoo if found else "—"
+        age_days = (r.harvest_date - r.birth_date).days if (found and r.birth_date) else None
         yld = None
-        if h.live_weight_grams and h.carcass_weight_grams and h.live_weight_grams > 0:
-            yld = round((h.carcass_weight_grams / h.live_weight_grams) * 100, 1)
-        rows.append([h.harvest_id, h.animal_id, tattoo, litter_id, h.harvest_date, age_days, h.live_weight_grams, h.carcass_weight_grams, yld])
+        if r.live_weight_grams and r.carcass_weight_grams and r.live_weight_grams > 0:
+            yld = round((r.carcass_weight_grams / r.live_weight_grams) * 100, 1)
+        return [r.harvest_id, r.animal_id, tattoo, r.litter_id, r.harvest_date, age_days, r.live_weight_grams, r.carcass_weight_grams, yld]
 
-    return StreamingResponse(
-        _csv_stream(rows, header),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=harvests.csv"},
-    )
+    return await _csv_response(request, db, ("harvests", "animals"), q, header, to_row, "harvests.csv")
 
 
 @router.get("/feed-costs.csv")
-def report_feed_costs_csv(
+@perf.budget(queries=3)
+async def report_feed_costs_csv(
+    request: Request,
     start_date: date | None = Query(default=None),
     end_date: date | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.FeedCost)
-    for f in _date_range_filters(start_date, end_date, models.FeedCost.date):
-        q = q.filter(f)
-    feed_costs = q.order_by(models.FeedCost.date.desc()).all()
+    fc = models.FeedCost
+
+    q = select(fc.feed_cost_id, fc.date, fc.description, fc.cost_per_unit, fc.total_cost)
+    for f in _date_range_filters(start_date, end_date, fc.date):
+        q = q.where(f)
+    q = q.order_by(fc.date.desc())
 
     header = ["feed_cost_id", "date", "description", "cost_per_unit", "total_cost"]
-    rows = [
-        [fc.feed_cost_id, fc.date, fc.description, fc.cost_per_unit, fc.total_cost]
-        for fc in feed_costs
-    ]
 
-    return StreamingResponse(
-        _csv_stream(rows, header),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=feed_costs.csv"},
-    )
+    def to_row(r):
+        return [r.feed_cost_id, r.date, r.description, r.cost_per_unit, r.total_cost]
+
+    return await _csv_response(request, db, ("feed_costs",), q, header, to_row, "feed_costs.csv")
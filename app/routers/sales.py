@@ -1,24 +1,33 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import db_endpoint, get_db
+from .. import fastjson, models, pagination, perf, schemas, versions
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
 
-@router.get("/", response_model=list[schemas.SaleOut])
-def list_sales(db: Session = Depends(get_db)):
-    return (
-        db.query(models.Sale)
-        .order_by(models.Sale.sale_date.desc())
-        .all()
+@router.get("/", response_model=list[schemas.SaleOut], dependencies=[Depends(versions.etag("sales"))])
+@perf.budget(queries=2)
+@db_endpoint
+def list_sales(
+    response: Response,
+    cursor: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    rows = pagination.paginate(
+        db.query(*fastjson.columns(models.Sale, schemas.SaleOut)),
+        [models.Sale.sale_date, models.Sale.sale_id],
+        descending=True, cursor=cursor, limit=limit, response=response,
     )
+    return fastjson.respond(rows, response)
 
 
 @router.post("/", response_model=schemas.SaleOut)
+@db_endpoint
 def create_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
     # --- Individual animal sale ---
     if payload.animal_id is not None:
@@ -73,6 +82,7 @@ def create_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
 
 
 @router.delete("/{sale_id}", status_code=204)
+@db_endpoint
 def delete_sale(sale_id: int, db: Session = Depends(get_db)):
     sale = db.get(models.Sale, sale_id)
     if not sale:
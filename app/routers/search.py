@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from ..database import db_endpoint, get_db
+from .. import pagination, schemas, search, versions
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+ENTITIES = sorted({entity for entity, *_ in search.NOTE_SOURCES.values()})
+
+
+@router.get("/", response_model=list[schemas.SearchHit], dependencies=[Depends(versions.etag("animals", "breedings", "litters", "harvests", "sales"))])
+@db_endpoint
+def search_notes(
+    response: Response,
+    q: str = Query(min_length=1, description="Words to find; a trailing * matches a prefix"),
+    entity: str | None = Query(default=None, description=f"One of: {', '.join(ENTITIES)}"),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """Notes and death reasons matching `q`, best match first."""
+    match = search.match_query(q)
+    if not match:
+        raise HTTPException(400, "Search needs at least one word")
+    if entity is not None and entity not in ENTITIES:
+        raise HTTPException(400, f"entity must be one of: {', '.join(ENTITIES)}")
+
+    fts = search.notes_table()
+    query = db.query(
+        fts.c.rowid,
+        fts.c.rank,
+        func.snippet(literal_column(search.NOTES_FTS), 0, "[", "]", "…", 12).label("snippet"),
+    ).filter(literal_column(search.NOTES_FTS).op("MATCH")(match))
+    if entity is not None:
+        query = query.filter((fts.c.rowid % search.KIND_SLOTS).in_(search.kinds_for(entity)))
+
+    rows = pagination.paginate(
+        query, [fts.c.rank, fts.c.rowid],
+        descending=False, cursor=cursor, limit=limit, response=response,
+    )
+
+    out: list[schemas.SearchHit] = []
+    for r in rows:
+        hit_entity, hit_id, field = search.note_source(r.rowid)
+        out.append(schemas.SearchHit(entity=hit_entity, id=hit_id, field=field, snippet=r.snippet, rank=r.rank))
+    return out
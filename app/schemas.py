@@ -124,6 +124,14 @@ class GenerateKitsRequest(BaseModel):
         return self
 
 
+class GenerateKitsBatchItem(GenerateKitsRequest):
+    litter_id: int
+
+
+class GenerateKitsBatchRequest(BaseModel):
+    litters: List[GenerateKitsBatchItem] = Field(min_length=1, max_length=200)
+
+
 class GenerateKitsResponse(BaseModel):
     litter_id: int
     created: int
@@ -186,3 +194,45 @@ class SaleOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# -----------------------------
+# Dashboard
+# -----------------------------
+
+class DashboardBootstrap(BaseModel):
+    metrics: dict
+    animals: List[AnimalOut]
+    breedings: List[BreedingOut]
+    litters: List[LitterOut]
+    harvests: List[HarvestOut]
+    todo: dict
+
+
+# -----------------------------
+# Bulk import
+# -----------------------------
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ImportReport(BaseModel):
+    entity: str
+    received: int
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+
+
+# -----------------------------
+# Search
+# -----------------------------
+
+class SearchHit(BaseModel):
+    entity: str     # animal / breeding / litter / harvest / sale
+    id: int
+    field: str      # notes / death_reason
+    snippet: str
+    rank: float     # bm25; lower is a better match
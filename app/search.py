@@ -0,0 +1,180 @@
+"""
+app/search.py
+-------------
+Indexed text lookups.
+
+Tattoo typeahead (/options/* ?q=):
+- prefix matches are a range scan on the lower(tattoo) index
+  (ix_animals_tattoo_lower), so "nz1" reads only the matching entries;
+- substring matches of 3+ characters go through `animals_tattoo_fts`, an
+  FTS5 trigram table over animals.tattoo kept in sync by triggers.
+
+Notes search (/search):
+- `notes_fts` holds every free-text note (animal notes and death reasons,
+  breeding, litter, harvest and sale notes), one FTS5 row per note, kept in
+  sync by triggers on the source tables. The rowid encodes where a note
+  came from (`source_id * 8 + kind`), so triggers update it by rowid.
+
+The FTS5 tables are created and dropped together with the ORM tables (see
+the metadata listeners in models.py); an index created for an existing
+database is filled from the source tables on first start.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Float, Integer, Text, and_, column, func, literal_column, select, table
+
+TATTOO_FTS = "animals_tattoo_fts"
+
+# Trigram queries need at least this many characters
+MIN_SUBSTRING_LENGTH = 3
+
+NOTES_FTS = "notes_fts"
+
+# kind -> (entity, table, id column, text column); a note's rowid is source id * KIND_SLOTS + kind
+NOTE_SOURCES: dict[int, tuple[str, str, str, str]] = {
+    0: ("animal", "animals", "animal_id", "notes"),
+    1: ("animal", "animals", "animal_id", "death_reason"),
+    2: ("breeding", "breedings", "breeding_id", "notes"),
+    3: ("litter", "litters", "litter_id", "notes"),
+    4: ("harvest", "harvests", "harvest_id", "notes"),
+    5: ("sale", "sales", "sale_id", "notes"),
+}
+KIND_SLOTS = 8
+
+
+def _note_triggers() -> dict[str, str]:
+    triggers = {}
+    by_table: dict[str, list[tuple[int, str, str]]] = {}
+    for kind, (_, tbl, id_col, text_col) in NOTE_SOURCES.items():
+        by_table.setdefault(tbl, []).append((kind, id_col, text_col))
+
+    for tbl, sources in by_table.items():
+        def inserts(ref):
+            return "".join(
+                f"INSERT INTO {NOTES_FTS}(rowid, body) SELECT {ref}.{id_col} * {KIND_SLOTS} + {kind}, {ref}.{text_col} "
+                f"WHERE {ref}.{text_col} IS NOT NULL AND {ref}.{text_col} != '';\n"
+                for kind, id_col, text_col in sources
+            )
+
+        def deletes(ref):
+            return "".join(
+                f"DELETE FROM {NOTES_FTS} WHERE rowid = {ref}.{id_col} * {KIND_SLOTS} + {kind};\n"
+                for kind, id_col, _ in sources
+            )
+
+        columns = ", ".join(text_col for _, _, text_col in sources)
+        triggers[f"{NOTES_FTS}_{tbl}_ai"] = f"AFTER INSERT ON {tbl} BEGIN\n{inserts('new')}END"
+        triggers[f"{NOTES_FTS}_{tbl}_ad"] = f"AFTER DELETE ON {tbl} BEGIN\n{deletes('old')}END"
+        triggers[f"{NOTES_FTS}_{tbl}_au"] = (
+            f"AFTER UPDATE OF {columns} ON {tbl} BEGIN\n{deletes('old')}{inserts('new')}END"
+        )
+    return triggers
+
+
+# name -> (CREATE VIRTUAL TABLE, {trigger name: body}, statements filling a new table)
+FTS_TABLES: dict[str, tuple[str, dict[str, str], list[str]]] = {
+    TATTOO_FTS: (
+        f"CREATE VIRTUAL TABLE {TATTOO_FTS} USING fts5("
+        "tattoo, content='animals', content_rowid='animal_id', tokenize='trigram')",
+        {
+            f"{TATTOO_FTS}_ai": f"""AFTER INSERT ON animals BEGIN
+                INSERT INTO {TATTOO_FTS}(rowid, tattoo) VALUES (new.animal_id, new.tattoo);
+            END""",
+            f"{TATTOO_FTS}_ad": f"""AFTER DELETE ON animals BEGIN
+                INSERT INTO {TATTOO_FTS}({TATTOO_FTS}, rowid, tattoo) VALUES ('delete', old.animal_id, old.tattoo);
+            END""",
+            f"{TATTOO_FTS}_au": f"""AFTER UPDATE OF tattoo ON animals BEGIN
+                INSERT INTO {TATTOO_FTS}({TATTOO_FTS}, rowid, tattoo) VALUES ('delete', old.animal_id, old.tattoo);
+                INSERT INTO {TATTOO_FTS}(rowid, tattoo) VALUES (new.animal_id, new.tattoo);
+            END""",
+        },
+        # External-content tables index whatever the content table holds
+        [f"INSERT INTO {TATTOO_FTS}({TATTOO_FTS}) VALUES ('rebuild')"],
+    ),
+    NOTES_FTS: (
+        # porter: "fostered" finds "foster", "fostering", ...
+        f"CREATE VIRTUAL TABLE {NOTES_FTS} USING fts5(body, tokenize='porter unicode61 remove_diacritics 2')",
+        _note_triggers(),
+        [
+            f"INSERT INTO {NOTES_FTS}(rowid, body) SELECT {id_col} * {KIND_SLOTS} + {kind}, {text_col} "
+            f"FROM {tbl} WHERE {text_col} IS NOT NULL AND {text_col} != ''"
+            for kind, (_, tbl, id_col, text_col) in NOTE_SOURCES.items()
+        ],
+    ),
+}
+
+
+# ---------------------------------------------------------------------------
+# DDL (metadata after_create / before_drop listeners)
+# ---------------------------------------------------------------------------
+
+def create_fts_tables(target, connection, **kw) -> None:
+    for name, (create, triggers, populate) in FTS_TABLES.items():
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).first()
+        if not exists:
+            connection.exec_driver_sql(create)
+            for statement in populate:
+                connection.exec_driver_sql(statement)
+        for trigger, body in triggers.items():
+            connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {trigger} {body}")
+
+
+def drop_fts_tables(target, connection, **kw) -> None:
+    for name, (_, triggers, _) in FTS_TABLES.items():
+        for trigger in triggers:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
+
+
+# ---------------------------------------------------------------------------
+# Query helpers
+# ---------------------------------------------------------------------------
+
+def match_phrase(text: str) -> str:
+    """Quote user input as a single FTS5 phrase (no operators)."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def tattoo_prefix(col, text: str):
+    """`col` starts with `text` (case-insensitive), as a range on lower(col)."""
+    lo = text.lower()
+    hi = lo[:-1] + chr(ord(lo[-1]) + 1)
+    key = func.lower(col)
+    return and_(key >= lo, key < hi)
+
+
+def tattoo_contains(text: str):
+    """SELECT of animal ids whose tattoo contains `text` (3+ characters)."""
+    fts = table(TATTOO_FTS, column("rowid"))
+    return select(fts.c.rowid).where(literal_column(TATTOO_FTS).op("MATCH")(match_phrase(text)))
+
+
+def match_query(text: str) -> str:
+    """
+    Turn a search box string into an FTS5 query: every word must match,
+    words are taken literally, and a trailing * makes a word a prefix.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append(match_phrase(word) + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def notes_table():
+    """notes_fts as a selectable (rowid, rank, body)."""
+    return table(NOTES_FTS, column("rowid", Integer), column("rank", Float), column("body", Text))
+
+
+def kinds_for(entity: str) -> list[int]:
+    return [kind for kind, (e, *_) in NOTE_SOURCES.items() if e == entity]
+
+
+def note_source(rowid: int) -> tuple[str, int, str]:
+    """(entity, id, field) a notes_fts rowid points at."""
+    entity, _, _, field = NOTE_SOURCES[rowid % KIND_SLOTS]
+    return entity, rowid // KIND_SLOTS, field
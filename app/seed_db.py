@@ -9,16 +9,37 @@ Run from the project root:
 
 Pass --reset to wipe the database first:
     python -m app.seed_db --reset
+
+Synthetic herds for performance work (10^5 - 10^6 rows):
+    python -m app.seed_db --reset --does 2000 --years 5
+    python -m app.seed_db --reset --animals 1000000 --workers 8
+
+Each founder doe's lineage (her breedings, litters and kits, and the
+daughters kept as replacement does, with their own litters) is simulated
+on its own random stream seeded from --seed and the doe's number. Lineages
+are generated in parallel worker processes and bulk-inserted in founder
+order, so a given --seed and --until always produce the same database,
+whatever the number of workers. --until defaults to today, so the herd
+stays current for the dashboard but differs from day to day: pass it
+explicitly to reproduce a herd (benchmarks/endpoints.py does).
+
+A synthetic herd numbers its rows from 1 and needs an empty database:
+without --reset, --does/--animals refuse to run against existing animals.
 """
 from __future__ import annotations
 
-import sys
+import argparse
+import os
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
-from urllib.parse import urlparse
 
-from .database import Base, engine, SessionLocal, DATABASE_URL
-from . import models
+from sqlalchemy import insert
+
+from .database import Base, engine, SessionLocal
+from . import models, rollups, search
+from .routers.breedings import GESTATION_DAYS
 
 
 # ---------------------------------------------------------------------------
@@ -30,15 +51,15 @@ def _days_ago(n: int) -> date:
 
 
 def _remove_sqlite_file_if_local() -> None:
-    """Delete the SQLite file so we start completely fresh."""
-    parsed = urlparse(DATABASE_URL)
-    # urlparse turns  sqlite:///./foo.db  into  path=./foo.db
-    path = parsed.path.lstrip("/")
+    """Delete the SQLite file (and its WAL files) so we start completely fresh."""
+    # sqlite:///./foo.db -> ./foo.db, sqlite:////data/foo.db -> /data/foo.db
+    path = engine.url.database
     if path and path != ":memory:":
-        import os
-        if os.path.exists(path):
-            os.remove(path)
-            print(f"  Removed existing database: {path}")
+        engine.dispose()
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+                print(f"  Removed existing database: {name}")
 
 
 # ---------------------------------------------------------------------------
@@ -285,6 +306,9 @@ def seed(db) -> None:
 
     db.commit()
 
+    # Seed rows bypass the routers, so compute the report rollups in one go
+    rollups.rebuild(db)
+
     # ------------------------------------------------------------------
     # Summary
     # ------------------------------------------------------------------
@@ -302,24 +326,287 @@ def seed(db) -> None:
     print(f"  ✓ Sales:       {sale_count}")
 
 
+# ---------------------------------------------------------------------------
+# Synthetic herds (--does / --animals)
+# ---------------------------------------------------------------------------
+
+FIRST_BREEDING_AGE = 180    # days
+REBREED_AFTER_WEANING = 14  # days, at most
+WEAN_AGE = 42
+BREEDING_CAREER = (3 * 365, 5 * 365)
+
+# Rough yearly output of one doe's lineage, used to size --animals
+ANIMALS_PER_DOE_YEAR = 45
+
+DEATH_REASONS = ["enteritis", "pneumonia", "heat stress", "predator", "injury", "unknown"]
+LITTER_NOTES = ["fostered two kits to another doe", "small litter, first kindling", "nest built late",
+                "one kit runt, supplemented", "excellent mothering"]
+
+INSERT_BATCH = 20_000
+
+
+def _lineage(seed: int, founder: int, bucks: int, start: date, until: date) -> dict[str, list[dict]]:
+    """
+    Simulate founder doe `founder` and her retained daughters from `start` to `until`.
+
+    Ids are local to the lineage (1, 2, ... per table); buck_id refers to
+    the shared bucks 1..`bucks`. `_rebase` turns them into table ids.
+    """
+    rng = random.Random(f"{seed}:{founder}")
+    animals: list[dict] = []
+    breedings: list[dict] = []
+    litters: list[dict] = []
+    harvests: list[dict] = []
+    sales: list[dict] = []
+    max_does = 1 + (until - start).days // 365
+
+    def animal(**row) -> dict:
+        row = {"animal_id": len(animals) + 1, "breed": None, "color": None, "litter_id": None,
+               "death_date": None, "death_reason": None, "notes": None, **row}
+        animals.append(row)
+        return row
+
+    def sell(when: date, price: float, notes: str, **subject) -> None:
+        buyer = rng.choice(BUYERS)
+        sales.append({"sale_date": when, "sale_price": price, "notes": notes,
+                      "buyer_name": buyer[0] if buyer else None, "buyer_contact": buyer[1] if buyer else None,
+                      "animal_id": None, "litter_id": None, **subject})
+
+    breed = rng.choice(BREEDS)
+    does = [animal(tattoo=f"D{founder:06d}", sex="F", status="breeder", breed=breed, color=rng.choice(COLORS),
+                   birth_date=start - timedelta(days=rng.randint(150, 400)), source="purchased")]
+
+    for doe in does:  # grows as daughters are kept
+        bred = max(doe["birth_date"] + timedelta(days=FIRST_BREEDING_AGE), start) + timedelta(days=rng.randint(0, 30))
+        retire = doe["birth_date"] + timedelta(days=rng.randint(*BREEDING_CAREER))
+
+        while bred <= until and bred < retire:
+            expected = bred + timedelta(days=GESTATION_DAYS)
+            kindled = expected + timedelta(days=rng.randint(-1, 2))
+            if kindled > until:
+                result = "pending"
+            else:
+                result = "successful" if rng.random() < 0.85 else "missed"
+            breedings.append({"breeding_id": len(breedings) + 1, "doe_id": doe["animal_id"],
+                              "buck_id": rng.randint(1, bucks), "bred_date": bred,
+                              "expected_kindling": expected, "result": result, "notes": None})
+            if result == "pending":
+                break
+            if result == "missed":
+                bred += timedelta(days=rng.randint(14, 21))
+                continue
+
+            born_alive = min(14, max(1, round(rng.gauss(8, 2))))
+            litter = {"litter_id": len(litters) + 1, "breeding_id": len(breedings), "kindling_date": kindled,
+                      "born_alive": born_alive, "born_dead": rng.choices([0, 1, 2, 3], [60, 25, 10, 5])[0],
+                      "weaned_count": None,
+                      "notes": rng.choice(LITTER_NOTES) if rng.random() < 0.1 else None}
+            litters.append(litter)
+            weaned_on = kindled + timedelta(days=WEAN_AGE)
+            bred = weaned_on + timedelta(days=rng.randint(0, REBREED_AFTER_WEANING))
+            if weaned_on > until:
+                continue
+
+            # Weaning: kits become animals, then meet their fate
+            weaned = max(0, born_alive - rng.choices([0, 1, 2], [70, 22, 8])[0])
+            litter["weaned_count"] = weaned
+            whole_litter_sale = rng.random() < 0.05 and kindled + timedelta(days=63) <= until
+            sold_kits = 0
+            for i in range(1, weaned + 1):
+                kit = animal(tattoo=f"D{founder:06d}-{litter['litter_id']:03d}-K{i:02d}", sex=rng.choice("MF"),
+                             status="growout", breed=breed, color=rng.choice(COLORS), birth_date=kindled,
+                             source="homebred", litter_id=litter["litter_id"])
+                fate = rng.random()
+                if kit["sex"] == "F" and len(does) < max_does and fate < 0.03:
+                    kit["status"] = "breeder"
+                    does.append(kit)
+                elif whole_litter_sale:
+                    kit["status"] = "sold"
+                    sold_kits += 1
+                elif fate < 0.07:
+                    died = kindled + timedelta(days=rng.randint(WEAN_AGE + 1, 80))
+                    if died <= until:
+                        kit.update(status="deceased", death_date=died, death_reason=rng.choice(DEATH_REASONS))
+                elif fate < 0.19:
+                    sold = kindled + timedelta(days=rng.randint(56, 75))
+                    if sold <= until:
+                        kit["status"] = "sold"
+                        sell(sold, round(rng.uniform(18.0, 35.0), 2), "Live sale", animal_id=kit["animal_id"])
+                else:
+                    harvested = kindled + timedelta(days=rng.randint(80, 95))
+                    if harvested <= until:
+                        kit["status"] = "harvested"
+                        live = rng.randint(2200, 2900)
+                        harvests.append({"animal_id": kit["animal_id"], "harvest_date": harvested,
+                                         "live_weight_grams": live,
+                                         "carcass_weight_grams": int(live * rng.uniform(0.52, 0.60)),
+                                         "notes": None})
+            if sold_kits:
+                sell(kindled + timedelta(days=63), round(sold_kits * 22.50, 2),
+                     f"Whole litter sale ({sold_kits} kits)", litter_id=litter["litter_id"])
+
+        if retire <= until:
+            doe["status"] = "sold"
+            sell(retire, round(rng.uniform(25.0, 45.0), 2), "Retired breeder", animal_id=doe["animal_id"])
+
+    return {"animals": animals, "breedings": breedings, "litters": litters, "harvests": harvests, "sales": sales}
+
+
+def _lineage_task(task: tuple) -> dict[str, list[dict]]:
+    return _lineage(*task)
+
+
+def _rebase(rows: dict[str, list[dict]], animal_base: int, breeding_base: int, litter_base: int) -> None:
+    """Shift a lineage's local ids past the rows already inserted."""
+    for r in rows["animals"]:
+        r["animal_id"] += animal_base
+        if r["litter_id"] is not None:
+            r["litter_id"] += litter_base
+    for r in rows["breedings"]:
+        r["breeding_id"] += breeding_base
+        r["doe_id"] += animal_base
+    for r in rows["litters"]:
+        r["litter_id"] += litter_base
+        r["breeding_id"] += breeding_base
+    for r in rows["harvests"]:
+        r["animal_id"] += animal_base
+    for r in rows["sales"]:
+        if r["animal_id"] is not None:
+            r["animal_id"] += animal_base
+        if r["litter_id"] is not None:
+            r["litter_id"] += litter_base
+
+
+TABLES = {
+    "animals": models.Animal,
+    "breedings": models.Breeding,
+    "litters": models.Litter,
+    "harvests": models.Harvest,
+    "sales": models.Sale,
+}
+
+
+def _insert_rows(pending: dict[str, list[dict]]) -> None:
+    # Kits reference litters, litters breedings, breedings the (kit) does:
+    # the batch is only consistent as a whole, so keys are checked at COMMIT
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA defer_foreign_keys = ON")
+        for name, model in TABLES.items():
+            if pending[name]:
+                conn.execute(insert(model), pending[name])
+                pending[name] = []
+
+
+def _feed_costs(seed: int, does: int, start: date, until: date) -> list[dict]:
+    """A weekly pellet order sized to the herd, plus hay and supplements."""
+    rng = random.Random(f"{seed}:feed")
+    rows = []
+    day = start
+    while day <= until:
+        bags = max(1, round(does * rng.uniform(0.8, 1.2) / 4))
+        rows.append({"date": day, "description": f"{bags} x 50 lb pellets",
+                     "cost_per_unit": 14.00, "total_cost": round(bags * 14.00, 2)})
+        if rng.random() < 0.5:
+            extra = rng.choice(["Timothy hay bale", "Oat hay bale", "Mineral supplement"])
+            rows.append({"date": min(until, day + timedelta(days=rng.randint(0, 6))), "description": extra,
+                         "cost_per_unit": None, "total_cost": round(rng.uniform(8.0, 12.0) * max(1, does // 20), 2)})
+        day += timedelta(days=7)
+    return rows
+
+
+def generate(does: int, bucks: int, years: float, seed: int, until: date, workers: int | None) -> dict[str, int]:
+    """Bulk-insert a synthetic herd; returns row counts per table."""
+    start = until - timedelta(days=round(years * 365))
+    counts = dict.fromkeys([*TABLES, "feed_costs"], 0)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Animal), [
+            {"animal_id": i, "tattoo": f"B{i:05d}", "sex": "M", "status": "breeder",
+             "breed": BREEDS[i % len(BREEDS)], "color": COLORS[i % len(COLORS)],
+             "birth_date": start - timedelta(days=300 + i % 200), "source": "purchased"}
+            for i in range(1, bucks + 1)
+        ])
+        feed = _feed_costs(seed, does, start, until)
+        conn.execute(insert(models.FeedCost), feed)
+    counts["animals"] += bucks
+    counts["feed_costs"] += len(feed)
+
+    # Rebuilding the FTS indexes once is much cheaper than a trigger per row
+    with engine.begin() as conn:
+        search.drop_fts_tables(None, conn)
+
+    animal_base, breeding_base, litter_base = bucks, 0, 0
+    pending: dict[str, list[dict]] = {name: [] for name in TABLES}
+    tasks = ((seed, founder, bucks, start, until) for founder in range(1, does + 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in founder order however the work is spread
+        chunksize = max(1, min(64, does // (4 * (workers or os.cpu_count() or 1))))
+        for founder, rows in enumerate(pool.map(_lineage_task, tasks, chunksize=chunksize), start=1):
+            _rebase(rows, animal_base, breeding_base, litter_base)
+            animal_base += len(rows["animals"])
+            breeding_base += len(rows["breedings"])
+            litter_base += len(rows["litters"])
+            for name in TABLES:
+                pending[name].extend(rows[name])
+                counts[name] += len(rows[name])
+            if sum(len(v) for v in pending.values()) >= INSERT_BATCH:
+                _insert_rows(pending)
+            if founder % 100 == 0 or founder == does:
+                print(f"\r  Lineages: {founder}/{does}", end="", flush=True)
+    _insert_rows(pending)
+    print()
+
+    print("  Indexing text for search...")
+    with engine.begin() as conn:
+        search.create_fts_tables(None, conn)
+    return counts
+
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
 
 def main() -> None:
-    reset = "--reset" in sys.argv
-
-    if reset:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="delete the database file first")
+    size = parser.add_argument_group("synthetic herd (omit for the small demo herd)")
+    size.add_argument("--does", type=int, help="founder does, each starting a lineage")
+    size.add_argument("--animals", type=int, help="approximate animal rows; sets --does when it is not given")
+    size.add_argument("--bucks", type=int, help="herd bucks (default: one per 10 does)")
+    size.add_argument("--years", type=float, default=3.0, help="years of history (default 3)")
+    size.add_argument("--until", type=date.fromisoformat, default=date.today(), help="last day of history (default today; pass it for a reproducible herd)")
+    size.add_argument("--seed", type=int, default=42)
+    size.add_argument("--workers", type=int, default=None, help="generator processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.reset:
         print("Resetting database...")
         _remove_sqlite_file_if_local()
 
     print("Creating tables...")
     Base.metadata.create_all(bind=engine)
 
+    synthetic = args.does is not None or args.animals is not None
+    if synthetic and not args.reset:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("SELECT 1 FROM animals LIMIT 1").first() is not None:
+                parser.error("--does/--animals generate a herd with its own ids; add --reset to replace the existing data")
+
     print("Seeding data...")
     db = SessionLocal()
     try:
-        seed(db)
+        if not synthetic:
+            seed(db)
+        else:
+            does = args.does or max(1, round(args.animals / (ANIMALS_PER_DOE_YEAR * args.years)))
+            bucks = args.bucks or max(1, does // 10)
+            t0 = time.perf_counter()
+            counts = generate(does, bucks, args.years, args.seed, args.until, args.workers)
+            print("  Rebuilding report rollups...")
+            rollups.rebuild(db)
+            for name, n in counts.items():
+                print(f"  ✓ {name.replace('_', ' ').capitalize() + ':':<12} {n}")
+            print(f"  in {time.perf_counter() - t0:.1f}s")
     except Exception:
         db.rollback()
         raise
@@ -0,0 +1,151 @@
+"""
+app/slow_queries.py
+-------------------
+Slow-query log: statements that take longer than SLOW_QUERY_MS.
+
+app/database.py attaches `slow_query_log` to the engines make_engine creates.
+A statement over the threshold is logged (logger "app.slow_queries") as one
+JSON line
+
+    {"event": "slow_query", "ms": 812.4, "route": "GET /reports/summary",
+     "statement": "SELECT ...", "parameters": ["2025-01-01"],
+     "plan": ["SCAN harvests", "USE TEMP B-TREE FOR GROUP BY"], ...}
+
+with the EXPLAIN QUERY PLAN of the statement and its parameters, run on the
+same connection right after it (so it sees the same schema, statistics and
+attached databases). The worst occurrence of each of the SLOW_QUERY_TOP
+slowest statements is kept for GET /debug/slow-queries.
+
+The time is the statement's execute call: with the sync driver that is the
+work until the first row (all of it for sorts and aggregates); aiosqlite
+fetches the whole result inside it.
+
+Configuration (app/database.py):
+    SLOW_QUERY_MS=250    threshold in milliseconds (0 turns the log off)
+    SLOW_QUERY_TOP=20    statements kept for /debug/slow-queries
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from . import perf
+
+log = logging.getLogger(__name__)
+
+# Statements EXPLAIN QUERY PLAN accepts (not PRAGMA, BEGIN, DDL, ...)
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Keep log lines bounded: long IN lists and text values are cut
+MAX_PARAMETERS = 50
+MAX_TEXT = 200
+
+
+def _trim(value):
+    if isinstance(value, str) and len(value) > MAX_TEXT:
+        return value[:MAX_TEXT] + "..."
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return value
+
+
+def _parameters(parameters, executemany: bool):
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    if isinstance(parameters, dict):
+        return {k: _trim(v) for k, v in list(parameters.items())[:MAX_PARAMETERS]}
+    return [_trim(v) for v in list(parameters or ())[:MAX_PARAMETERS]]
+
+
+def explain(dbapi_connection, statement: str, parameters) -> list[str] | None:
+    """EXPLAIN QUERY PLAN lines, indented by depth, or None if SQLite refuses."""
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        rows = cursor.fetchall()
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+class SlowQueryLog:
+    """Statements over `threshold_ms`, logged, and the worst `top` of them kept."""
+
+    def __init__(self, threshold_ms: float, top: int):
+        self.threshold_ms = threshold_ms
+        self.top = top
+        self._lock = threading.Lock()
+        self._worst: dict[str, dict] = {}
+
+    def attach(self, engine) -> None:
+        if not event.contains(engine, "after_cursor_execute", self._after):
+            event.listen(engine, "before_cursor_execute", self._before)
+            event.listen(engine, "after_cursor_execute", self._after)
+
+    def detach(self, engine) -> None:
+        if event.contains(engine, "after_cursor_execute", self._after):
+            event.remove(engine, "before_cursor_execute", self._before)
+            event.remove(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_started"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("slow_query_started", None)
+        if started is None or self.threshold_ms <= 0:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        if ms < self.threshold_ms:
+            return
+
+        request = perf.current()
+        first = parameters[0] if executemany and parameters else parameters
+        entry = {
+            "event": "slow_query",
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "ms": round(ms, 2),
+            "route": request.route if request is not None else None,
+            "statement": statement,
+            "parameters": _parameters(parameters, executemany),
+            "executemany": len(parameters) if executemany else None,
+            "plan": explain(conn.connection.dbapi_connection, statement, first or ()),
+        }
+        log.warning(json.dumps(entry, default=str))
+        self.record(entry)
+
+    def record(self, entry: dict) -> None:
+        with self._lock:
+            worst = self._worst.get(entry["statement"])
+            if worst is None:
+                self._worst[entry["statement"]] = {**entry, "count": 1, "total_ms": entry["ms"]}
+                if len(self._worst) > self.top:
+                    fastest = min(self._worst.values(), key=lambda e: e["ms"])
+                    del self._worst[fastest["statement"]]
+                return
+            count, total = worst["count"] + 1, worst["total_ms"] + entry["ms"]
+            if entry["ms"] > worst["ms"]:
+                worst.update(entry)
+            worst.update(count=count, total_ms=round(total, 2))
+
+    def snapshot(self) -> list[dict]:
+        """The kept statements, slowest first, each with its worst occurrence."""
+        with self._lock:
+            return sorted((dict(e) for e in self._worst.values()), key=lambda e: -e["ms"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._worst.clear()
@@ -8,15 +8,30 @@ function toast(msg, ok=true) {
   setTimeout(() => { toastEl.hidden = true; }, 2500);
 }
 
+// GET responses carry an ETag with `Cache-Control: no-cache`. Within a page
+// the last body per URL is kept here and revalidated with If-None-Match, so
+// unchanged lists come back as an empty 304; across page loads the
+// browser's HTTP cache revalidates the same way.
+const apiCache = new Map();
+
 async function api(path, opts={}) {
-  const res = await fetch(path, {
-    headers: { 'Content-Type': 'application/json', ...(opts.headers || {}) },
-    ...opts
-  });
+  const method = (opts.method || 'GET').toUpperCase();
+  const cached = method === 'GET' ? apiCache.get(path) : undefined;
+  const headers = { 'Content-Type': 'application/json', ...(opts.headers || {}) };
+  if (cached) headers['If-None-Match'] = cached.etag;
+
+  const res = await fetch(path, { ...opts, headers });
+
+  if (res.status === 304 && cached) return structuredClone(cached.data);
 
   let data = null;
   try { data = await res.json(); } catch {}
 
+  const etag = res.headers.get('ETag');
+  if (method === 'GET' && res.ok && etag) {
+    apiCache.set(path, { etag, data: structuredClone(data) });
+  }
+
   if (!res.ok) {
     const detail = (data && data.detail) ? data.detail : res.statusText;
     throw new Error(detail);
@@ -107,6 +122,33 @@ function populateSelect(selectEl, options, placeholder) {
   }
 }
 
+// Typeahead: refill `selectEl` from an /options endpoint as the user types.
+// `path` already carries its own filters, e.g. '/options/animals?status=growout'.
+function attachTypeahead(inputEl, selectEl, path, placeholder, limit=50) {
+  if (!selectEl) return;
+  const sep = path.includes('?') ? '&' : '?';
+  let timer = null;
+  let seq = 0;
+
+  const refresh = async () => {
+    const q = inputEl ? inputEl.value.trim() : '';
+    const mine = ++seq;
+    const url = `${path}${sep}limit=${limit}` + (q ? `&q=${encodeURIComponent(q)}` : '');
+    try {
+      const options = await api(url);
+      if (mine === seq) populateSelect(selectEl, options, placeholder);  // ignore stale replies
+    } catch (err) { toast(err.message, false); }
+  };
+
+  if (inputEl) {
+    inputEl.oninput = () => {
+      clearTimeout(timer);
+      timer = setTimeout(refresh, 150);
+    };
+  }
+  return refresh();
+}
+
 function populateSelectBySex(selectEl, animals, sex, placeholder) {
   if (!selectEl) return;
   const current = selectEl.value;
@@ -173,6 +215,7 @@ function initThemeToggle() {
 
 async function loadCommon() {
   initThemeToggle();
+  startChangeFeed();
 
   const refreshBtn = document.getElementById('refreshBtn');
   if (refreshBtn) {
@@ -182,6 +225,75 @@ async function loadCommon() {
   }
 }
 
+// ----------------------------------------
+// Live updates
+// ----------------------------------------
+// /changes streams {entity, id, op, fields} for every write, from any
+// screen. Pages register the tables they show and patch their rows in
+// place; EventSource resends Last-Event-ID when it reconnects, so nothing
+// is missed across a dropped connection.
+const PRIMARY_KEYS = {
+  animals: 'animal_id', breedings: 'breeding_id', litters: 'litter_id',
+  harvests: 'harvest_id', feed_costs: 'feed_cost_id', sales: 'sale_id',
+};
+const liveHandlers = new Map();   // name -> { entities, fn(change) }
+let changeFeed = null;
+
+// Registering a name again (a page re-initialising) replaces its handler
+function onLiveChange(name, entities, fn) {
+  liveHandlers.set(name, { entities: [].concat(entities), fn });
+}
+
+function startChangeFeed() {
+  if (changeFeed || !window.EventSource) return;
+  changeFeed = new EventSource('/changes');
+  changeFeed.addEventListener('change', (e) => {
+    const change = JSON.parse(e.data);
+    for (const { entities, fn } of liveHandlers.values()) {
+      if (entities.includes(change.entity)) fn(change);
+    }
+  });
+  // The feed lost our place (pruned log, restored database): reload once
+  changeFeed.addEventListener('reset', () => {
+    initPage().catch(err => toast(err.message, false));
+  });
+}
+
+// Run fn once for a burst of changes (e.g. a litter's kits arriving together)
+const scheduled = new Set();
+function schedule(fn, delay=100) {
+  if (scheduled.has(fn)) return;
+  scheduled.add(fn);
+  setTimeout(() => {
+    scheduled.delete(fn);
+    Promise.resolve().then(fn).catch(e => toast(e.message, false));
+  }, delay);
+}
+
+// Apply one change to rows in place. Returns false for bulk changes
+// (imports), which only say that the table changed.
+function patchRows(rows, change) {
+  if (change.op === 'bulk') return false;
+  const key = PRIMARY_KEYS[change.entity];
+  const i = rows.findIndex(r => r[key] === change.id);
+  if (change.op === 'delete') {
+    if (i >= 0) rows.splice(i, 1);
+  } else if (i >= 0) {
+    Object.assign(rows[i], change.fields);
+  } else if (change.op === 'insert') {
+    rows.unshift({ ...change.fields });
+  }
+  return true;
+}
+
+// Keep getRows() patched from the feed and redraw with render(); bulk
+// changes refetch the table with reload()
+function liveTable(name, entity, getRows, render, reload) {
+  onLiveChange(name, entity, (change) => {
+    schedule(patchRows(getRows(), change) ? render : reload);
+  });
+}
+
 function renderTodoList(listEl, items, emptyText) {
   if (!listEl) return;
   listEl.innerHTML = '';
@@ -208,62 +320,63 @@ function renderTodoList(listEl, items, emptyText) {
 // ----------------------------------------
 // Dashboard
 // ----------------------------------------
-async function initDashboardTodo() {
+function todoParams() {
   const kindSel = document.getElementById('todo_kindling_window');
   const weanSel = document.getElementById('todo_wean_age');
   const harvSel = document.getElementById('todo_harvest_age');
-  const applyBtn = document.getElementById('todoApplyBtn');
-
-  const fetchAndRender = async () => {
-    const kind = kindSel ? Number(kindSel.value) : 7;
-    const wean = weanSel ? Number(weanSel.value) : 42;
-    const harv = harvSel ? Number(harvSel.value) : 84;
-
-    const todo = await api(`/dashboard/todo?kindling_window_days=${kind}&wean_age_days=${wean}&harvest_age_days=${harv}`);
-
-    const k = todo.kindlings_due || [];
-    const w = todo.weanings_due || [];
-    const h = todo.harvest_ready || [];
-
-    const kCount = document.getElementById('todo_kindlings_count');
-    const wCount = document.getElementById('todo_weanings_count');
-    const hCount = document.getElementById('todo_harvest_count');
-    if (kCount) kCount.textContent = String(k.length);
-    if (wCount) wCount.textContent = String(w.length);
-    if (hCount) hCount.textContent = String(h.length);
-
-    renderTodoList(document.getElementById('todo_kindlings'), k, 'No kindlings due.');
-    renderTodoList(document.getElementById('todo_weanings'), w, 'No weanings due.');
-    renderTodoList(document.getElementById('todo_harvest'), h, 'No harvest-ready growouts.');
-
-    const asof = document.getElementById('todo_asof');
-    if (asof) {
-      const p = todo.params || {};
-      asof.textContent = `As of ${todo.as_of} • kindling window ${p.kindling_window_days}d • wean ${p.wean_age_days}d • harvest ${p.harvest_age_days}d`;
-    }
-  };
+  const kind = kindSel ? Number(kindSel.value) : 7;
+  const wean = weanSel ? Number(weanSel.value) : 42;
+  const harv = harvSel ? Number(harvSel.value) : 84;
+  return `kindling_window_days=${kind}&wean_age_days=${wean}&harvest_age_days=${harv}`;
+}
 
-  if (applyBtn) applyBtn.onclick = () => fetchAndRender().catch(e => toast(e.message, false));
-  await fetchAndRender();
+function renderDashboardTodo(todo) {
+  const k = todo.kindlings_due || [];
+  const w = todo.weanings_due || [];
+  const h = todo.harvest_ready || [];
+
+  const kCount = document.getElementById('todo_kindlings_count');
+  const wCount = document.getElementById('todo_weanings_count');
+  const hCount = document.getElementById('todo_harvest_count');
+  if (kCount) kCount.textContent = String(k.length);
+  if (wCount) wCount.textContent = String(w.length);
+  if (hCount) hCount.textContent = String(h.length);
+
+  renderTodoList(document.getElementById('todo_kindlings'), k, 'No kindlings due.');
+  renderTodoList(document.getElementById('todo_weanings'), w, 'No weanings due.');
+  renderTodoList(document.getElementById('todo_harvest'), h, 'No harvest-ready growouts.');
+
+  const asof = document.getElementById('todo_asof');
+  if (asof) {
+    const p = todo.params || {};
+    asof.textContent = `As of ${todo.as_of} • kindling window ${p.kindling_window_days}d • wean ${p.wean_age_days}d • harvest ${p.harvest_age_days}d`;
+  }
 }
 
 async function initDashboard() {
-  const [m, animals, breedings, litters, harvests] = await Promise.all([
-    api('/metrics'),
-    api('/animals/'),
-    api('/breedings/'),
-    api('/litters/'),
-    api('/harvests/'),
-  ]);
+  // One round trip: KPIs, the newest rows of each table and the to-do lists
+  const DASHBOARD_ROWS = 10;
+  const boot = await api(`/dashboard/bootstrap?recent=${DASHBOARD_ROWS}&${todoParams()}`);
+
+  setMetrics(boot.metrics);
 
-  setMetrics(m);
+  renderSimpleTable('animalsTable',   boot.animals,   ['animal_id','tattoo','sex','status','birth_date','breed','litter_id']);
+  renderSimpleTable('breedingsTable', boot.breedings, ['breeding_id','doe_id','buck_id','bred_date','expected_kindling','result']);
+  renderSimpleTable('littersTable',   boot.litters,   ['litter_id','breeding_id','kindling_date','born_alive','born_dead','weaned_count']);
+  renderSimpleTable('harvestsTable',  boot.harvests,  ['harvest_id','animal_id','harvest_date','live_weight_grams','carcass_weight_grams']);
 
-  renderSimpleTable('animalsTable',   animals.slice().reverse(), ['animal_id','tattoo','sex','status','birth_date','breed','litter_id'], 10);
-  renderSimpleTable('breedingsTable', breedings, ['breeding_id','doe_id','buck_id','bred_date','expected_kindling','result'], 10);
-  renderSimpleTable('littersTable',   litters,   ['litter_id','breeding_id','kindling_date','born_alive','born_dead','weaned_count'], 10);
-  renderSimpleTable('harvestsTable',  harvests,  ['harvest_id','animal_id','harvest_date','live_weight_grams','carcass_weight_grams'], 10);
+  renderDashboardTodo(boot.todo);
 
-  await initDashboardTodo();
+  // KPIs and to-do lists are aggregates: refetch the snapshot after changes
+  onLiveChange('dashboard', Object.keys(PRIMARY_KEYS), () => schedule(initDashboard, 500));
+
+  // Changing the to-do windows only refetches the to-do lists
+  const applyBtn = document.getElementById('todoApplyBtn');
+  if (applyBtn) {
+    applyBtn.onclick = () => api(`/dashboard/todo?${todoParams()}`)
+      .then(renderDashboardTodo)
+      .catch(e => toast(e.message, false));
+  }
 }
 
 // Plain table render (no edit button) — used on dashboard previews
@@ -323,6 +436,7 @@ async function initAnimals() {
   }
   if (filterEl) filterEl.oninput = applyFilters;
   applyFilters();
+  liveTable('animals', 'animals', () => animals, applyFilters, initAnimals);
 
   const mortalitySelect = document.getElementById('mortalityAnimal');
   if (mortalitySelect) {
@@ -386,6 +500,7 @@ async function initBreedings() {
   };
   if (filterEl) filterEl.oninput = () => render(breedings);
   render(breedings);
+  liveTable('breedings', 'breedings', () => breedings, () => render(breedings), initBreedings);
 
   const breedingForm = document.getElementById('breedingForm');
   if (breedingForm) {
@@ -458,6 +573,10 @@ async function initKindlings() {
 
   if (filterEl) filterEl.oninput = () => renderLitters(litters);
   renderLitters(litters);
+  liveTable('kindlings', 'litters', () => litters, () => renderLitters(litters), async () => {
+    litters = await api('/litters/');
+    renderLitters(litters);
+  });
 
   // Create litter form
   const litterForm = document.getElementById('litterForm');
@@ -532,16 +651,17 @@ async function initWeanings() {
   populateSelect(document.getElementById('litterForWeaning'), litterOptions, 'Select litter…');
 
   const animals = await api('/animals/');
-  const growouts = animals.filter(a => a.status === 'growout');
   const cols = ['animal_id','tattoo','sex','status','birth_date','litter_id'];
   const filterEl = document.getElementById('growoutFilter');
 
   const render = () => {
+    const growouts = animals.filter(a => a.status === 'growout');
     const filtered = filterRows(growouts, filterEl ? filterEl.value : '', cols);
     renderSimpleTable('growoutsTable', filtered, cols);
   };
   if (filterEl) filterEl.oninput = render;
   render();
+  liveTable('weanings', 'animals', () => animals, render, initWeanings);
 
   const generateForm = document.getElementById('generateKitsForm');
   if (generateForm) {
@@ -570,8 +690,12 @@ async function initWeanings() {
 // Harvests — with edit modal
 // ----------------------------------------
 async function initHarvests() {
-  const animalOptions = await api('/options/animals?status=growout');
-  populateSelect(document.getElementById('animalForHarvest'), animalOptions, 'Select animal…');
+  await attachTypeahead(
+    document.getElementById('animalForHarvestSearch'),
+    document.getElementById('animalForHarvest'),
+    '/options/animals?status=growout',
+    'Select animal…',
+  );
 
   let harvests = await api('/harvests/');
 
@@ -605,6 +729,10 @@ async function initHarvests() {
 
   if (filterEl) filterEl.oninput = () => renderHarvests(harvests);
   renderHarvests(harvests);
+  liveTable('harvests', 'harvests', () => harvests, () => renderHarvests(harvests), async () => {
+    harvests = await api('/harvests/');
+    renderHarvests(harvests);
+  });
 
   // Create harvest form
   const harvestForm = document.getElementById('harvestForm');
@@ -721,6 +849,10 @@ async function initFeedCosts() {
 
   if (filterEl) filterEl.oninput = applyFeedFilters;
   applyFeedFilters();
+  liveTable('feed-costs', 'feed_costs', () => feedCosts, applyFeedFilters, async () => {
+    feedCosts = await api('/feed-costs/');
+    applyFeedFilters();
+  });
 
   const feedCostForm = document.getElementById('feedCostForm');
   if (feedCostForm) {
@@ -932,9 +1064,18 @@ async function initSales() {
     }
   };
 
-  renderKPIs(currentSales);
-  renderBuyerSummary(currentSales);
-  applyFilters();
+  const renderSales = () => {
+    renderKPIs(currentSales);
+    renderBuyerSummary(currentSales);
+    applyFilters();
+  };
+  renderSales();
+  liveTable('sales', 'sales', () => currentSales, renderSales, async () => {
+    currentSales = await api('/sales/');
+    renderSales();
+  });
+  // Sale subjects show tattoos, so follow animal edits too
+  liveTable('sale-animals', 'animals', () => animals, renderSales, initSales);
 
   // Sale form submit
   const saleForm = document.getElementById('saleForm');
@@ -1074,6 +1215,7 @@ async function initReports() {
   }
 
   await load();
+  onLiveChange('reports', Object.keys(PRIMARY_KEYS), () => schedule(load, 500));
 }
 
 // ----------------------------------------
@@ -1081,6 +1223,7 @@ async function initReports() {
 // ----------------------------------------
 async function initPage() {
   const page = document.body.getAttribute('data-page');
+  liveHandlers.clear();
   await loadCommon();
   if (page === 'dashboard')   return initDashboard();
   if (page === 'animals')     return initAnimals();
@@ -0,0 +1,288 @@
+"""
+app/telemetry.py
+----------------
+Service metrics in the Prometheus text format (GET /metrics/prometheus),
+from a small in-process registry: no client library, no push gateway.
+
+    rabbit_http_request_duration_seconds{method,route,status}   histogram
+    rabbit_http_requests_in_flight                                gauge
+    rabbit_threadpool_threads_busy / _limit / _tasks_waiting      gauges
+    rabbit_db_pool_checkouts_total{engine}                        counter
+    rabbit_db_pool_wait_seconds{engine}                           histogram
+    rabbit_db_pool_checked_out{engine} / _size / _overflow        gauges
+    rabbit_db_file_size_bytes{file="db|wal|shm"}                  gauge
+    rabbit_db_table_rows{table}                                   gauge
+
+Request metrics are recorded by `MetricsMiddleware` under the route
+template ("GET /animals/{animal_id}"), so ids never become labels. Pool
+waits are timed around the engine pool's `connect()`. Everything
+else is read when scraped; row counts are recounted only for tables whose
+`table_versions` counter moved since the last scrape.
+
+Each uvicorn worker has its own registry; Prometheus scrapes whichever
+worker answers, as with any multi-process server without shared state.
+"""
+from __future__ import annotations
+
+import functools
+import math
+import os
+import threading
+import time
+
+from anyio import to_thread
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from . import perf
+
+PREFIX = "rabbit_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+def _value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labels
+        self._lock = threading.Lock()
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        with self._lock:
+            samples = self._samples()
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *samples])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, k)} {_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (not cumulative)..., +Inf], sum
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[i] += 1
+            total[0] += value
+
+    def _samples(self):
+        out = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                le = 'le="%s"' % _value(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_value(total[0])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self.metrics) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template.", ("method", "route", "status"),
+))
+in_flight = registry.register(Gauge("http_requests_in_flight", "Requests being served."))
+threads_busy = registry.register(Gauge("threadpool_threads_busy", "Worker threads running sync endpoint code."))
+threads_limit = registry.register(Gauge("threadpool_threads_limit", "Size of the worker thread pool."))
+threads_waiting = registry.register(Gauge("threadpool_tasks_waiting", "Calls queued for a free worker thread."))
+pool_checkouts = registry.register(Counter("db_pool_checkouts_total", "Connections handed out by the pool.", ("engine",)))
+pool_wait = registry.register(Histogram(
+    "db_pool_wait_seconds", "Time to get a connection from the pool.", ("engine",), buckets=POOL_WAIT_BUCKETS,
+))
+pool_checked_out = registry.register(Gauge("db_pool_checked_out", "Connections in use.", ("engine",)))
+pool_size = registry.register(Gauge("db_pool_size", "Connections the pool keeps open.", ("engine",)))
+pool_overflow = registry.register(Gauge("db_pool_overflow", "Connections open beyond the pool size.", ("engine",)))
+file_size = registry.register(Gauge("db_file_size_bytes", "Size of the SQLite database files.", ("file",)))
+table_rows = registry.register(Gauge("db_table_rows", "Rows per table (recounted when the table changes).", ("table",)))
+
+
+# ---------------------------------------------------------------------------
+# Requests
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Request latency per route template, and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            in_flight.dec()
+            request_duration.observe(time.perf_counter() - started, scope["method"], perf.route_path(scope), str(status[0]))
+
+
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+def _time_checkouts(pool, label: str) -> None:
+    """Wrap `pool.connect()` to record how long each checkout waited for a connection."""
+    connect = pool.connect
+
+    @functools.wraps(connect)
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, label)
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(engine, label: str) -> None:
+    event.listen(engine, "checkout", lambda *args: pool_checkouts.inc(label))
+    _time_checkouts(engine.pool, label)
+    # dispose() swaps in a fresh pool, which needs its own wrapper
+    event.listen(engine, "engine_disposed", lambda engine: _time_checkouts(engine.pool, label))
+
+
+def _collect_pool(engine, label: str) -> None:
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        pool_checked_out.set(pool.checkedout(), label)
+        pool_size.set(pool.size(), label)
+        pool_overflow.set(max(0, pool.overflow()), label)
+
+
+# ---------------------------------------------------------------------------
+# Scrape-time readings
+# ---------------------------------------------------------------------------
+
+_row_counts: dict[str, tuple[int, int]] = {}  # table -> (version, rows)
+_row_counts_lock = threading.Lock()
+
+
+def count_rows(db: Session) -> dict[str, int]:
+    """Rows per versioned table; count(*) runs only for tables written since the last call."""
+    from . import versions  # app.versions imports app.database, which imports this module
+
+    current = versions.current(db, versions.VERSIONED_TABLES)
+    counts = {}
+    for table in versions.VERSIONED_TABLES:
+        version = current.get(table, 0)
+        with _row_counts_lock:
+            cached = _row_counts.get(table)
+        if cached is not None and cached[0] == version:
+            counts[table] = cached[1]
+            continue
+        rows = db.execute(text(f"SELECT count(*) FROM {table}")).scalar_one()
+        with _row_counts_lock:
+            _row_counts[table] = (version, rows)
+        counts[table] = rows
+    db.rollback()
+    return counts
+
+
+def collect(engines: dict[str, object], rows: dict[str, int]) -> None:
+    """Set the gauges that are read at scrape time (except the threadpool ones)."""
+    for label, engine in engines.items():
+        if engine is not None:
+            _collect_pool(engine, label)
+
+    database = engines["sync"].url.database
+    if database and database != ":memory:":
+        for name, suffix in (("db", ""), ("wal", "-wal"), ("shm", "-shm")):
+            try:
+                file_size.set(os.path.getsize(database + suffix), name)
+            except OSError:
+                file_size.set(0, name)
+
+    for table, n in rows.items():
+        table_rows.set(n, table)
+
+
+def collect_threadpool() -> None:
+    """Reads the event loop's thread limiter; call from async code, before using the pool."""
+    stats = to_thread.current_default_thread_limiter().statistics()
+    threads_busy.set(stats.borrowed_tokens)
+    threads_limit.set(stats.total_tokens)
+    threads_waiting.set(stats.tasks_waiting)
@@ -0,0 +1,149 @@
+"""
+app/versions.py
+---------------
+Per-table change counters and the conditional GETs built on them.
+
+`table_versions` holds one counter per table. SQLite triggers bump a table's
+counter on every INSERT, UPDATE and DELETE, so the routers, bulk imports,
+seed_db and manual SQL all count. Every worker process reads the same
+counters from the database file.
+
+Read endpoints declare which tables they depend on:
+
+    @router.get("/", dependencies=[Depends(versions.etag("animals"))])
+
+The dependency runs before the endpoint and reads the counters with one
+query. The ETag is derived from those counters. If the request's
+If-None-Match matches, it answers 304 and the endpoint never runs.
+
+That read happens outside any transaction. An endpoint that then reads in
+a snapshot (`database.begin_snapshot`) calls `retag` so the ETag names the
+versions the body was actually read at.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import date
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from .database import get_db, run_db
+
+VERSIONED_TABLES = ("animals", "breedings", "litters", "harvests", "feed_costs", "sales")
+
+# Random per database; a restored or recreated file never reuses old ETags
+EPOCH = "epoch"
+
+
+# ---------------------------------------------------------------------------
+# DDL (metadata after_create listener)
+# ---------------------------------------------------------------------------
+
+def create_version_triggers(target, connection, **kw) -> None:
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO table_versions(name, version) VALUES (?, abs(random()))", (EPOCH,)
+    )
+    for name in VERSIONED_TABLES:
+        connection.exec_driver_sql(
+            "INSERT OR IGNORE INTO table_versions(name, version) VALUES (?, 0)", (name,)
+        )
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS table_versions_{name}_{op.lower()} AFTER {op} ON {name} BEGIN "
+                f"UPDATE table_versions SET version = version + 1 WHERE name = '{name}'; END"
+            )
+
+
+def bump(db: Session, tables) -> None:
+    """
+    Advance the counters of `tables` in the caller's transaction, for writes
+    the triggers cannot see: derived data rebuilt from those tables.
+    """
+    from .models import TableVersion
+
+    unknown = set(tables) - set(VERSIONED_TABLES)
+    if unknown:
+        raise ValueError(f"Unversioned tables: {sorted(unknown)}")
+    db.query(TableVersion).filter(TableVersion.name.in_(tables)).update(
+        {TableVersion.version: TableVersion.version + 1}, synchronize_session=False,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def current(db: Session, tables) -> dict[str, int]:
+    """
+    {table: version} for `tables` plus the database epoch, in one query.
+
+    Versions are remembered on the session, so the ETag check and the
+    response cache of one read request share a single lookup.
+    """
+    from .models import TableVersion
+
+    names = [EPOCH, *tables]
+    seen = db.info.setdefault("table_versions", {})
+    missing = [n for n in names if n not in seen]
+    if missing:
+        rows = db.query(TableVersion.name, TableVersion.version).filter(TableVersion.name.in_(missing))
+        seen.update(rows.all())
+    return {n: seen[n] for n in names if n in seen}
+
+
+def make_etag(versions: dict[str, int]) -> str:
+    # Today's date is part of the tag: reports and to-do windows are relative to it
+    raw = ";".join(f"{k}={versions[k]}" for k in sorted(versions)) + f";{date.today().isoformat()}"
+    return 'W/"' + hashlib.blake2b(raw.encode(), digest_size=12).hexdigest() + '"'
+
+
+def _matches(if_none_match: str | None, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same version
+    opaque = tag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == opaque for t in if_none_match.split(","))
+
+
+def etag(*tables: str):
+    """
+    Dependency for GET endpoints whose response only changes when `tables` do.
+
+    Sets ETag and `Cache-Control: no-cache` (clients may keep the body but
+    must revalidate), or answers 304 Not Modified before the endpoint runs.
+    """
+    unknown = set(tables) - set(VERSIONED_TABLES)
+    if unknown:
+        raise ValueError(f"Unversioned tables: {sorted(unknown)}")
+
+    async def dependency(request: Request, response: Response, db: Session = Depends(get_db)):
+        response.headers.update(conditional(request, await run_db(db, current, tables)))
+        db.info["etag"] = (response, tables)  # for retag
+
+    return dependency
+
+
+def retag(db: Session) -> None:
+    """
+    Re-derive the ETag set by the `etag` dependency from the versions seen by
+    the current snapshot (call after `database.begin_snapshot`).
+    """
+    pending = db.info.get("etag")
+    if pending is not None:
+        response, tables = pending
+        response.headers["ETag"] = make_etag(current(db, tables))
+
+
+def conditional(request: Request, versions: dict[str, int]) -> dict[str, str]:
+    """
+    ETag and Cache-Control headers for a response built from `versions`, or
+    HTTPException(304) if the request's If-None-Match already names them.
+    """
+    tag = make_etag(versions)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(304, headers=headers)
+    return headers
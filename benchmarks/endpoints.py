@@ -0,0 +1,365 @@
+"""
+benchmarks/endpoints.py
+-----------------------
+Endpoint latency and peak memory as the herd grows.
+
+For each size a synthetic herd is seeded with `python -m app.seed_db
+--animals N` (cached between runs in --cache-dir), then every endpoint in
+ENDPOINTS is timed two ways, each on a fresh copy of that database:
+
+    inprocess   the app called over ASGI (httpx.ASGITransport) in a spawned
+                process with DATABASE_URL pointing at the copy. Peak memory
+                is the tracemalloc high-water mark of one extra request.
+    http        a `uvicorn app.main:app` server (one worker) called over a
+                socket. Peak memory is the server's RSS high-water mark
+                (VmHWM) after the endpoint's requests, where /proc exists.
+
+The response cache is disabled (RESPONSE_CACHE_SIZE=0) and no conditional
+headers are sent, so every request does the full work.
+
+Results go to --output as JSON. With --baseline, each (size, endpoint, mode)
+median is compared with the baseline's and any more than --threshold slower
+(and at least --noise-ms) is reported; the exit status is then 1.
+
+Run from the project root:
+    python -m benchmarks.endpoints
+    python -m benchmarks.endpoints --sizes 1000 10000 100000 1000000 --repeat 10
+    python -m benchmarks.endpoints --output new.json --baseline benchmarks/baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import httpx
+
+# Herds end on a fixed day so a cached database stays comparable
+HERD_UNTIL = date(2026, 1, 1)
+
+# name -> (method, path); "{litter_id}" is a fresh, unweaned litter per request
+ENDPOINTS = {
+    "metrics": ("GET", "/metrics"),
+    "dashboard_todo": ("GET", "/dashboard/todo"),
+    "report_summary": ("GET", "/reports/summary"),
+    "breedings_csv": ("GET", "/reports/breedings.csv"),
+    "litters_csv": ("GET", "/reports/litters.csv"),
+    "harvests_csv": ("GET", "/reports/harvests.csv"),
+    "feed_costs_csv": ("GET", "/reports/feed-costs.csv"),
+    "options_animals": ("GET", "/options/animals"),
+    "options_breedings": ("GET", "/options/breedings"),
+    "options_litters": ("GET", "/options/litters"),
+    "generate_kits": ("POST", "/litters/{litter_id}/generate-kits"),
+}
+
+KITS = {"weaned_count": 8}
+
+
+# ---------------------------------------------------------------------------
+# Herds
+# ---------------------------------------------------------------------------
+
+def seeded_herd(cache_dir: Path, animals: int, seed: int) -> Path:
+    path = cache_dir / f"herd-{animals}-{seed}-{HERD_UNTIL.isoformat()}.db"
+    if not path.exists():
+        print(f"Seeding {animals} animals into {path} ...", flush=True)
+        partial = path.with_suffix(".partial")
+        subprocess.run(
+            [sys.executable, "-m", "app.seed_db", "--reset", "--animals", str(animals),
+             "--seed", str(seed), "--until", HERD_UNTIL.isoformat()],
+            env={**os.environ, "DATABASE_URL": f"sqlite:///{partial}"},
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        _checkpoint(partial)
+        partial.rename(path)
+    return path
+
+
+def _checkpoint(path: Path) -> None:
+    # Fold the WAL into the main file so copying it copies everything
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def _animal_count(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    (count,) = conn.execute("SELECT count(*) FROM animals").fetchone()
+    conn.close()
+    return count
+
+
+def fresh_copy(herd: Path, work: Path) -> Path:
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{work}{suffix}").unlink(missing_ok=True)
+    shutil.copyfile(herd, work)
+    return work
+
+
+def app_env(db: Path, response_cache: bool = False, async_db: bool = False) -> dict[str, str]:
+    env = {"DATABASE_URL": f"sqlite:///{db}", "DATABASE_ASYNC": "1" if async_db else "0"}
+    if not response_cache:
+        env["RESPONSE_CACHE_SIZE"] = "0"
+    return env
+
+
+# ---------------------------------------------------------------------------
+# Requests
+# ---------------------------------------------------------------------------
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def _summary(samples: list[float]) -> dict:
+    return {"median_ms": statistics.median(samples), "p95_ms": percentile(samples, 0.95), "runs": len(samples)}
+
+
+def _new_litter(client) -> int:
+    """A litter on an existing breeding, with no kits yet (POST /litters/)."""
+    breeding_id = client.get("/breedings/?limit=1").json()[0]["breeding_id"]
+    r = client.post("/litters/", json={"breeding_id": breeding_id, "kindling_date": "2025-12-01", "born_alive": 8})
+    r.raise_for_status()
+    return r.json()["litter_id"]
+
+
+def _prepare(client, path: str) -> tuple[str, dict | None]:
+    if "{litter_id}" in path:
+        return path.format(litter_id=_new_litter(client)), KITS
+    return path, None
+
+
+def _request(client, method: str, path: str):
+    url, body = _prepare(client, path)
+    return client.request(method, url, json=body)
+
+
+def _timed(client, method: str, path: str) -> tuple[float, int]:
+    url, body = _prepare(client, path)  # setup is not timed
+    t0 = time.perf_counter()
+    r = client.request(method, url, json=body)
+    elapsed = (time.perf_counter() - t0) * 1000
+    r.raise_for_status()
+    return elapsed, len(r.content)
+
+
+# ---------------------------------------------------------------------------
+# In-process (spawned worker)
+# ---------------------------------------------------------------------------
+
+def _set_env(env: dict[str, str]) -> None:
+    os.environ.update(env)
+
+
+def _inprocess(repeat: int) -> list[dict]:
+    """Runs in a fresh process whose environment points the app at one herd."""
+    import asyncio
+    import tracemalloc
+
+    from app.main import app
+
+    class Client:
+        # _timed / _request drive a sync client; run each call on one loop
+        def __init__(self):
+            self.loop = asyncio.new_event_loop()
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+        def request(self, method, url, **kwargs):
+            return self.loop.run_until_complete(self.client.request(method, url, **kwargs))
+
+        def get(self, url, **kwargs):
+            return self.request("GET", url, **kwargs)
+
+        def post(self, url, **kwargs):
+            return self.request("POST", url, **kwargs)
+
+        def close(self):
+            self.loop.run_until_complete(self.client.aclose())
+            self.loop.close()
+
+    client = Client()
+    results = []
+    for name, (method, path) in ENDPOINTS.items():
+        _request(client, method, path).raise_for_status()  # warm-up
+        samples, size = [], 0
+        for _ in range(repeat):
+            elapsed, size = _timed(client, method, path)
+            samples.append(elapsed)
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        _request(client, method, path).raise_for_status()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({"endpoint": name, "bytes": size, "peak_kib": round(peak / 1024), **_summary(samples)})
+    client.close()
+    return results
+
+
+def _run_inprocess(db: Path, repeat: int) -> list[dict]:
+    with ProcessPoolExecutor(1, mp_context=get_context("spawn"), initializer=_set_env, initargs=(app_env(db),)) as pool:
+        return pool.submit(_inprocess, repeat).result()
+
+
+# ---------------------------------------------------------------------------
+# Over HTTP (uvicorn)
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_kib(pid: int) -> int | None:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1])
+    return None
+
+
+@contextmanager
+def serve(db: Path, workers: int = 1, response_cache: bool = False, async_db: bool = False):
+    """Run `uvicorn app.main:app` on `db`; yields (base URL, server process) once it answers."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env={**os.environ, **app_env(db, response_cache, async_db)},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                httpx.get(f"{base_url}/metrics/cache").raise_for_status()
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.2)
+        yield base_url, server
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _run_http(db: Path, repeat: int) -> list[dict]:
+    results = []
+    with serve(db) as (base_url, server), httpx.Client(base_url=base_url, timeout=600) as client:
+        for name, (method, path) in ENDPOINTS.items():
+            _request(client, method, path).raise_for_status()  # warm-up
+            samples, size = [], 0
+            for _ in range(repeat):
+                elapsed, size = _timed(client, method, path)
+                samples.append(elapsed)
+            results.append({"endpoint": name, "bytes": size, "peak_rss_kib": _peak_rss_kib(server.pid),
+                            **_summary(samples)})
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results: list[dict], baseline: list[dict], threshold: float, noise_ms: float) -> list[dict]:
+    """Results whose median is more than `threshold` (and `noise_ms`) above the baseline's."""
+    before = {(r["size"], r["endpoint"], r["mode"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = before.get((r["size"], r["endpoint"], r["mode"]))
+        if old is None:
+            continue
+        delta = r["median_ms"] - old["median_ms"]
+        if delta > noise_ms and r["median_ms"] > old["median_ms"] * (1 + threshold):
+            regressions.append({**r, "baseline_ms": old["median_ms"], "ratio": r["median_ms"] / old["median_ms"]})
+    return regressions
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="animals per herd")
+    parser.add_argument("--modes", nargs="+", choices=["inprocess", "http"], default=["inprocess", "http"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", type=Path, default=Path(tempfile.gettempdir()) / "rabbit-bench",
+                        help="where seeded herds are kept between runs")
+    parser.add_argument("--output", type=Path, default=Path("bench_endpoints.json"))
+    parser.add_argument("--baseline", type=Path, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--noise-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    args.cache_dir.mkdir(parents=True, exist_ok=True)
+    runners = {"inprocess": _run_inprocess, "http": _run_http}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            herd = seeded_herd(args.cache_dir, size, args.seed)
+            animals = _animal_count(herd)
+            for mode in args.modes:
+                print(f"{size} animals, {mode} ...", flush=True)
+                for r in runners[mode](fresh_copy(herd, Path(tmp) / "work.db"), args.repeat):
+                    results.append({"size": size, "animals": animals, "mode": mode, **r})
+
+    args.output.write_text(json.dumps({
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }, indent=2))
+
+    print(f"\n{'size':>9} {'endpoint':<18}{'mode':<11}{'median ms':>11}{'p95 ms':>10}{'KiB':>9}{'peak KiB':>10}")
+    for r in results:
+        peak = r.get("peak_kib", r.get("peak_rss_kib"))
+        print(f"{r['size']:>9} {r['endpoint']:<18}{r['mode']:<11}{r['median_ms']:>11.2f}{r['p95_ms']:>10.2f}"
+              f"{r['bytes'] / 1024:>9.1f}{peak if peak is not None else '-':>10}")
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.threshold, args.noise_ms)
+        for r in regressions:
+            print(f"REGRESSION {r['size']} {r['endpoint']} {r['mode']}: "
+                  f"{r['baseline_ms']:.2f} -> {r['median_ms']:.2f} ms ({r['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
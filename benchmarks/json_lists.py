@@ -0,0 +1,171 @@
+"""
+benchmarks/json_lists.py
+------------------------
+List endpoint latency: the response_model path against app/fastjson.py.
+
+Both paths run as routes of one scratch FastAPI app over the same seeded
+database and are called in-process over ASGI (httpx.ASGITransport), so the
+numbers include routing, the query, serialization and the response:
+
+    orm    db.query(Model) -> ORM objects -> response_model validation ->
+           jsonable output -> json.dumps       (how the lists used to work)
+    fast   db.query(*fastjson.columns(...)) -> Core rows -> one
+           orjson / pydantic-core call -> raw bytes  (what they do now)
+
+The "encode" columns time serialization alone on rows already loaded.
+
+Run from the project root:
+    python -m benchmarks.json_lists
+    python -m benchmarks.json_lists --rows 50000 --limits 100 1000 --repeat 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from fastapi import Depends, FastAPI, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import fastjson, models, schemas
+from app.database import Base, make_engine
+
+ENTITIES = {
+    "animals": (models.Animal, schemas.AnimalOut, models.Animal.animal_id),
+    "harvests": (models.Harvest, schemas.HarvestOut, models.Harvest.harvest_id),
+}
+
+
+def _seed(engine, rows: int) -> None:
+    start = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Animal), [
+            {"animal_id": i + 1, "tattoo": f"K{i:06d}", "sex": "MFU"[i % 3], "breed": "New Zealand",
+             "color": "white", "status": "harvested", "birth_date": start + timedelta(days=i // 8),
+             "source": "generated", "notes": f"Generated from litter {i // 8 + 1} at weaning"}
+            for i in range(rows)
+        ])
+        conn.execute(insert(models.Harvest), [
+            {"harvest_id": i + 1, "animal_id": i + 1, "harvest_date": start + timedelta(days=i // 8 + 84),
+             "live_weight_grams": 2400 + i % 300, "carcass_weight_grams": 1300 + i % 200}
+            for i in range(rows)
+        ])
+
+
+def _orm_json(rows, schema) -> bytes:
+    # What FastAPI does with a response_model: validate, dump, json.dumps
+    adapter = TypeAdapter(list[schema])
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def _bench_app(SessionLocal) -> FastAPI:
+    app = FastAPI()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def routes(model, schema, key):
+        def orm(limit: int = Query(), db: Session = Depends(get_db)):
+            return db.query(model).order_by(key).limit(limit).all()
+
+        def fast(response: Response, limit: int = Query(), db: Session = Depends(get_db)):
+            rows = db.query(*fastjson.columns(model, schema)).order_by(key).limit(limit).all()
+            return fastjson.respond(rows, response)
+
+        return orm, fast
+
+    for name, (model, schema, key) in ENTITIES.items():
+        orm, fast = routes(model, schema, key)
+        app.get(f"/orm/{name}", response_model=list[schema])(orm)
+        app.get(f"/fast/{name}", response_model=list[schema])(fast)
+    return app
+
+
+def _timed(fn, repeat: int) -> float:
+    """Median milliseconds of `repeat` calls."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+async def _timed_get(client: httpx.AsyncClient, url: str, params: dict, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        (await client.get(url, params=params)).raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'bench_json.db'}")
+        Base.metadata.create_all(bind=engine)
+        _seed(engine, args.rows)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        transport = httpx.ASGITransport(app=_bench_app(SessionLocal))
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+        for name, (model, schema, key) in ENTITIES.items():
+            for limit in args.limits:
+                params = {"limit": limit}
+                orm_body = (await client.get(f"/orm/{name}", params=params)).content
+                fast_body = (await client.get(f"/fast/{name}", params=params)).content
+                assert json.loads(orm_body) == json.loads(fast_body), f"{name}: bodies differ"
+
+                with SessionLocal() as db:
+                    objects = db.query(model).order_by(key).limit(limit).all()
+                    rows = db.query(*fastjson.columns(model, schema)).order_by(key).limit(limit).all()
+                    encode_orm = _timed(lambda: _orm_json(objects, schema), args.repeat)
+                    encode_fast = _timed(lambda: fastjson.dumps(rows), args.repeat)
+
+                results.append({
+                    "entity": name,
+                    "limit": limit,
+                    "bytes": len(fast_body),
+                    "orm_ms": await _timed_get(client, f"/orm/{name}", params, args.repeat),
+                    "fast_ms": await _timed_get(client, f"/fast/{name}", params, args.repeat),
+                    "encode_orm_ms": encode_orm,
+                    "encode_fast_ms": encode_fast,
+                })
+        await client.aclose()
+        engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000, help="animals (and harvests) seeded")
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{'entity':<10}{'limit':>7}{'KiB':>8}{'orm ms':>9}{'fast ms':>9}{'speedup':>9}{'enc orm':>9}{'enc fast':>9}")
+    for r in results:
+        print(
+            f"{r['entity']:<10}{r['limit']:>7}{r['bytes'] / 1024:>8.1f}{r['orm_ms']:>9.2f}{r['fast_ms']:>9.2f}"
+            f"{r['orm_ms'] / r['fast_ms']:>8.1f}x{r['encode_orm_ms']:>9.2f}{r['encode_fast_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
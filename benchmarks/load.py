@@ -0,0 +1,280 @@
+"""
+benchmarks/load.py
+------------------
+Processing-day load: concurrent barn workflows against a uvicorn server.
+
+Virtual users (--users) each loop over scenarios picked by weight (--mix),
+as fast as the server answers unless --think-ms is set:
+
+    harvest     a tablet records a harvest for a growout kit
+    sale        a tablet records a live sale of a growout kit
+    breeding    breed -> kindle -> generate-kits; the new kits join the pool
+                the tablets harvest and sell from
+    dashboard   someone watching the dashboard (bootstrap, to-do, metrics)
+    export      someone pulling a CSV export
+
+By default a synthetic herd of --animals is seeded (cached like
+benchmarks/endpoints.py) and served by `uvicorn --workers N` on a fresh
+copy, with the response cache on as in production. --url targets a server
+that is already running instead.
+
+The report lists, per route: requests, throughput, p50/p95/p99 latency and
+errors, with "locked" counting 503s from SQLite's busy timeout (the write
+lock was not free within busy_timeout) separately from other failures.
+
+Run from the project root:
+    python -m benchmarks.load
+    python -m benchmarks.load --workers 4 --users 32 --duration 60 --animals 100000
+    python -m benchmarks.load --mix harvest=6,sale=2,dashboard=2 --think-ms 500
+    python -m benchmarks.load --async-db      # DATABASE_ASYNC=1, to compare
+    python -m benchmarks.load --url http://127.0.0.1:8000 --output load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+from .endpoints import percentile, fresh_copy, seeded_herd, serve
+
+DEFAULT_MIX = {"harvest": 40, "sale": 15, "breeding": 15, "dashboard": 20, "export": 10}
+
+EXPORTS = ["/reports/breedings.csv", "/reports/litters.csv", "/reports/harvests.csv", "/reports/feed-costs.csv"]
+
+# Growout kits fetched up front for the tablets to work through (one page)
+KIT_POOL = 1000
+
+
+class Recorder:
+    """Latencies and error counts per route template."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, Counter] = defaultdict(Counter)
+        self.scenarios: Counter = Counter()
+
+    async def call(self, client: httpx.AsyncClient, method: str, route: str, url: str | None = None, **kwargs):
+        """Send one request; returns the response, or None when it failed."""
+        label = f"{method} {route}"
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, url or route, **kwargs)
+        except httpx.TimeoutException:
+            self.errors[label]["timeout"] += 1
+            return None
+        except httpx.TransportError:
+            self.errors[label]["transport"] += 1
+            return None
+        finally:
+            self.latencies[label].append((time.perf_counter() - t0) * 1000)
+        if r.status_code == 503:
+            self.errors[label]["locked"] += 1
+        elif r.status_code >= 500:
+            self.errors[label]["5xx"] += 1
+        elif r.status_code >= 400:
+            self.errors[label]["4xx"] += 1
+        else:
+            return r
+        return None
+
+
+class Herd:
+    """What the scenarios pick from: breeding stock and kits ready to go."""
+
+    def __init__(self, does: list[int], bucks: list[int], kits: list[int]):
+        self.does = does
+        self.bucks = bucks
+        self.kits = kits
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient) -> Herd:
+        async def animals(status: str, limit: int) -> list[dict]:
+            r = await client.get("/animals/", params={"status": status, "limit": limit})
+            r.raise_for_status()
+            return r.json()
+
+        breeders = await animals("breeder", 1000)
+        herd = cls(
+            does=[a["animal_id"] for a in breeders if a["sex"] == "F"],
+            bucks=[a["animal_id"] for a in breeders if a["sex"] == "M"],
+            kits=[a["animal_id"] for a in await animals("growout", KIT_POOL)],
+        )
+        if not herd.does or not herd.bucks:
+            raise SystemExit("The herd needs at least one breeder doe and buck")
+        return herd
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+async def harvest(client, rec: Recorder, herd: Herd, rng: random.Random) -> None:
+    if not herd.kits:
+        return await breeding(client, rec, herd, rng)
+    live = rng.randint(2200, 2900)
+    await rec.call(client, "POST", "/harvests/", json={
+        "animal_id": herd.kits.pop(), "harvest_date": date.today().isoformat(),
+        "live_weight_grams": live, "carcass_weight_grams": int(live * 0.56),
+    })
+
+
+async def sale(client, rec: Recorder, herd: Herd, rng: random.Random) -> None:
+    if not herd.kits:
+        return await breeding(client, rec, herd, rng)
+    await rec.call(client, "POST", "/sales/", json={
+        "animal_id": herd.kits.pop(), "sale_date": date.today().isoformat(),
+        "sale_price": round(rng.uniform(18, 35), 2), "buyer_name": "Load test",
+    })
+
+
+async def breeding(client, rec: Recorder, herd: Herd, rng: random.Random) -> None:
+    today = date.today().isoformat()
+    r = await rec.call(client, "POST", "/breedings/", json={
+        "doe_id": rng.choice(herd.does), "buck_id": rng.choice(herd.bucks), "bred_date": today,
+    })
+    if r is None:
+        return
+    r = await rec.call(client, "POST", "/litters/", json={
+        "breeding_id": r.json()["breeding_id"], "kindling_date": today, "born_alive": rng.randint(5, 11),
+    })
+    if r is None:
+        return
+    litter_id = r.json()["litter_id"]
+    r = await rec.call(client, "POST", "/litters/{id}/generate-kits", f"/litters/{litter_id}/generate-kits",
+                       json={"weaned_count": rng.randint(4, 9)})
+    if r is not None:
+        herd.kits.extend(r.json()["animal_ids"])
+
+
+async def dashboard(client, rec: Recorder, herd: Herd, rng: random.Random) -> None:
+    await rec.call(client, "GET", "/dashboard/bootstrap")
+    await rec.call(client, "GET", "/dashboard/todo")
+    await rec.call(client, "GET", "/metrics")
+
+
+async def export(client, rec: Recorder, herd: Herd, rng: random.Random) -> None:
+    await rec.call(client, "GET", rng.choice(EXPORTS))
+
+
+SCENARIOS = {fn.__name__: fn for fn in (harvest, sale, breeding, dashboard, export)}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name.strip()!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def _user(client, rec: Recorder, herd: Herd, mix: dict[str, float], rng: random.Random,
+                deadline: float, think: float) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        await SCENARIOS[name](client, rec, herd, rng)
+        rec.scenarios[name] += 1
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def run(base_url: str, args) -> tuple[Recorder, float]:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        herd = await Herd.load(client)
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            _user(client, rec, herd, args.mix, random.Random(f"{args.seed}:{i}"), deadline, args.think_ms / 1000)
+            for i in range(args.users)
+        ))
+        elapsed = time.monotonic() - start
+    return rec, elapsed
+
+
+def report(rec: Recorder, elapsed: float) -> list[dict]:
+    rows = []
+    for label in sorted(rec.latencies):
+        samples = rec.latencies[label]
+        errors = rec.errors[label]
+        rows.append({
+            "route": label,
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 0.50),
+            "p95_ms": percentile(samples, 0.95),
+            "p99_ms": percentile(samples, 0.99),
+            "locked": errors["locked"],
+            "errors": sum(errors.values()) - errors["locked"],
+            "error_kinds": dict(errors),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="an already running server (default: start uvicorn)")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--async-db", action="store_true", help="serve with DATABASE_ASYNC=1 (AsyncSession on aiosqlite)")
+    parser.add_argument("--animals", type=int, default=10_000, help="size of the seeded herd")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", type=Path, default=Path(tempfile.gettempdir()) / "rabbit-bench",
+                        help="where seeded herds are kept between runs")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between scenarios")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request, seconds")
+    parser.add_argument("--mix", type=_mix, default=DEFAULT_MIX,
+                        help="scenario weights, e.g. harvest=40,sale=15,breeding=15,dashboard=20,export=10")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        base_url = args.url
+        if base_url is None:
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            args.cache_dir.mkdir(parents=True, exist_ok=True)
+            db = fresh_copy(seeded_herd(args.cache_dir, args.animals, args.seed), Path(tmp) / "load.db")
+            base_url, _ = stack.enter_context(serve(db, workers=args.workers, response_cache=True, async_db=args.async_db))
+        print(f"{args.users} users for {args.duration:g}s against {base_url} ...", flush=True)
+        rec, elapsed = asyncio.run(run(base_url, args))
+
+    rows = report(rec, elapsed)
+    total = sum(r["requests"] for r in rows)
+    print(f"\n{'route':<36}{'reqs':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'locked':>8}{'errors':>8}")
+    for r in rows:
+        print(f"{r['route']:<36}{r['requests']:>7}{r['rps']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['locked']:>8}{r['errors']:>8}")
+    print(f"\n{total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s; "
+          f"scenarios: {', '.join(f'{k} {v}' for k, v in rec.scenarios.most_common())}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "config": {"url": args.url, "workers": None if args.url else args.workers,
+                       "async_db": None if args.url else args.async_db, "animals": args.animals,
+                       "users": args.users, "duration": args.duration, "think_ms": args.think_ms, "mix": args.mix},
+            "elapsed": elapsed,
+            "routes": rows,
+            "scenarios": dict(rec.scenarios),
+        }, indent=2))
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+benchmarks/sqlite_profile.py
+----------------------------
+Mixed read/write throughput under each SQLite connection profile.
+
+Reproduces "a report runs while someone records a harvest": writer threads
+record harvests in short transactions while reader threads aggregate the
+full history (the /reports/summary raw queries). Each profile gets its own
+scratch database file seeded with the same history.
+
+Run from the project root:
+    python -m benchmarks.sqlite_profile
+    python -m benchmarks.sqlite_profile --profiles off tuned --seconds 10 --writers 4 --readers 2
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models, rollups
+from app.database import Base, make_engine
+
+
+def _seed(engine, history: int) -> int:
+    """Insert `history` kits with harvests; returns the first free animal_id."""
+    start = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Animal), [
+            {"animal_id": 1, "tattoo": "DOE", "sex": "F", "status": "breeder"},
+            {"animal_id": 2, "tattoo": "BUCK", "sex": "M", "status": "breeder"},
+        ])
+        conn.execute(insert(models.Breeding), [
+            {"breeding_id": 1, "doe_id": 1, "buck_id": 2, "bred_date": start, "result": "successful"},
+        ])
+        conn.execute(insert(models.Litter), [
+            {"litter_id": i + 1, "breeding_id": 1, "kindling_date": start + timedelta(days=i),
+             "born_alive": 8, "weaned_count": 7}
+            for i in range(history // 8)
+        ])
+        conn.execute(insert(models.Animal), [
+            {"animal_id": 3 + i, "tattoo": f"K{i}", "sex": "U", "status": "harvested",
+             "litter_id": i // 8 + 1, "birth_date": start + timedelta(days=i // 8)}
+            for i in range(history)
+        ])
+        conn.execute(insert(models.Harvest), [
+            {"animal_id": 3 + i, "harvest_date": start + timedelta(days=i // 8 + 84),
+             "live_weight_grams": 2400, "carcass_weight_grams": 1300}
+            for i in range(history)
+        ])
+    return 3 + history
+
+
+def run_profile(profile: str, workdir: Path, args) -> dict:
+    engine = make_engine(f"sqlite:///{workdir / f'bench_{profile}.db'}", profile)
+    Base.metadata.create_all(bind=engine)
+    next_id = _seed(engine, args.history)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    stats = {"writes": 0, "reads": 0, "locked": 0, "write_ms": []}
+
+    def writer():
+        nonlocal next_id
+        while not stop.is_set():
+            with lock:
+                animal_id = next_id
+                next_id += 1
+            t0 = time.perf_counter()
+            db = Session()
+            try:
+                db.add(models.Animal(animal_id=animal_id, tattoo=f"W{animal_id}", sex="U",
+                                     status="harvested", birth_date=date(2024, 1, 1)))
+                db.add(models.Harvest(animal_id=animal_id, harvest_date=date(2024, 4, 1),
+                                      live_weight_grams=2500, carcass_weight_grams=1400))
+                db.commit()
+                with lock:
+                    stats["writes"] += 1
+                    stats["write_ms"].append((time.perf_counter() - t0) * 1000)
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    stats["locked"] += 1
+            finally:
+                db.close()
+
+    def reader():
+        while not stop.is_set():
+            db = Session()
+            try:
+                rollups.raw_months(db)
+                with lock:
+                    stats["reads"] += 1
+            except OperationalError:
+                with lock:
+                    stats["locked"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    ms = sorted(stats["write_ms"]) or [0.0]
+    return {
+        "profile": profile,
+        "writes_per_s": stats["writes"] / args.seconds,
+        "reads_per_s": stats["reads"] / args.seconds,
+        "write_p50_ms": statistics.median(ms),
+        "write_p95_ms": ms[int(len(ms) * 0.95) - 1] if len(ms) > 1 else ms[0],
+        "locked_errors": stats["locked"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["off", "tuned"])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--history", type=int, default=50_000, help="harvested kits seeded before the run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run_profile(p, Path(tmp), args) for p in args.profiles]
+
+    print(f"{'profile':<10}{'writes/s':>10}{'reads/s':>10}{'w p50 ms':>10}{'w p95 ms':>10}{'locked':>8}")
+    for r in results:
+        print(
+            f"{r['profile']:<10}{r['writes_per_s']:>10.1f}{r['reads_per_s']:>10.1f}"
+            f"{r['write_p50_ms']:>10.2f}{r['write_p95_ms']:>10.2f}{r['locked_errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
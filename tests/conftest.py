@@ -1,26 +1,49 @@
 import pytest
+from sqlalchemy import event
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 
+from app import perf
 from app.main import app
-from app.database import Base, get_db
+from app.cache import response_cache
+from app.database import Base, apply_sqlite_pragmas, get_db, make_async_engine, make_engine, sqlite_pragmas
 
 TEST_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
+# StaticPool keeps a single connection so the in-memory database is shared
+# between the test thread and the threadpool the endpoints run on.
+engine = create_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False, "factory": perf.CountingConnection},
+    poolclass=StaticPool,
+)
+# Same connection profile as the app (foreign keys on, etc.)
+apply_sqlite_pragmas(engine, sqlite_pragmas())
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# A route that runs more queries than its @perf.budget fails the test
+perf.PERF_STRICT = True
 
-@pytest.fixture(autouse=True)
-def fresh_db():
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
 
+class Backend:
+    """The engines one test runs against.
 
-@pytest.fixture
-def client(fresh_db):
+    `engine` is the sync engine tests use to inspect the database directly;
+    `app_engine` is the one the endpoints execute on (its sync core in async mode).
+    """
+
+    def __init__(self, name, engine, session_factory, app_engine, override_get_db):
+        self.name = name
+        self.engine = engine
+        self.session_factory = session_factory
+        self.app_engine = app_engine
+        self.override_get_db = override_get_db
+
+
+def _sync_backend():
     def override_get_db():
         db = TestingSessionLocal()
         try:
@@ -28,6 +51,107 @@ def client(fresh_db):
         finally:
             db.close()
 
-    app.dependency_overrides[get_db] = override_get_db
+    return Backend("sync", engine, TestingSessionLocal, engine, override_get_db)
+
+
+def _async_backend(tmp_path):
+    # aiosqlite connections live on the request's event loop, so the async
+    # backend needs a file both engines can open and a pool that never keeps
+    # a connection past the request.
+    path = tmp_path / "test.db"
+    sync_engine = make_engine(f"sqlite:///{path}", poolclass=NullPool)
+    async_engine = make_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    return Backend(
+        "async",
+        sync_engine,
+        sessionmaker(autocommit=False, autoflush=False, bind=sync_engine),
+        async_engine.sync_engine,
+        override_get_db,
+    )
+
+
+@pytest.fixture(autouse=True, params=["sync", "async"])
+def backend(request, tmp_path):
+    """Every test runs once against sync Sessions and once against AsyncSessions."""
+    b = _sync_backend() if request.param == "sync" else _async_backend(tmp_path)
+    response_cache.clear()
+    Base.metadata.create_all(bind=b.engine)
+    yield b
+    # animals <-> breedings <-> litters reference each other, so no DROP
+    # order satisfies the foreign keys; drop with enforcement paused.
+    with b.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        Base.metadata.drop_all(bind=conn)
+        conn.commit()
+        conn.exec_driver_sql(f"PRAGMA foreign_keys={sqlite_pragmas().get('foreign_keys', 'OFF')}")
+    if b.engine is not engine:
+        b.engine.dispose()
+
+
+@pytest.fixture
+def db_engine(backend):
+    return backend.engine
+
+
+@pytest.fixture
+def client(backend):
+    app.dependency_overrides[get_db] = backend.override_get_db
     yield TestClient(app)
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def file_db(backend, client, tmp_path):
+    """
+    (app engine, database path) with the endpoints on a database file, so a
+    test can commit from a second connection while a request is running.
+    The sync backend's in-memory database has only its one shared connection.
+    """
+    if backend.name == "async":
+        yield backend.app_engine, backend.app_engine.url.database
+        return
+
+    file_engine = make_engine(f"sqlite:///{tmp_path / 'file.db'}", poolclass=NullPool)
+    Base.metadata.create_all(bind=file_engine)
+    FileSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+
+    def override_get_db():
+        db = FileSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield file_engine, file_engine.url.database
+    app.dependency_overrides[get_db] = backend.override_get_db
+    file_engine.dispose()
+
+
+@pytest.fixture
+def db_session(backend):
+    db = backend.session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def sql_log(backend):
+    """Collects (statement, parameters) for every SQL statement executed while active."""
+    log: list[tuple[str, object]] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        log.append((statement, parameters))
+
+    event.listen(backend.app_engine, "before_cursor_execute", _record)
+    yield log
+    event.remove(backend.app_engine, "before_cursor_execute", _record)
+
@@ -1,3 +1,9 @@
+import contextlib
+import json
+import re
+import sqlite3
+
+
 def test_create_animal_and_list(client):
     r = client.post(
         "/animals/",
@@ -222,3 +228,993 @@ def test_feed_cost_appears_in_reports_summary(client):
     months = {p["month"]: p["value"] for p in series["feed_cost"]["points"]}
     assert months.get("2026-03") == 50.00
     assert months.get("2026-04") == 40.00
+
+
+def test_reports_summary_aggregates_match_records(client):
+    doe = client.post("/animals/", json={"tattoo": "DOE-AGG", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BUK-AGG", "sex": "M", "status": "breeder"}).json()
+    b1 = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    b2 = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-02-01"}).json()
+
+    l1 = client.post("/litters/", json={"breeding_id": b1["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 8, "weaned_count": 6}).json()
+    client.post("/litters/", json={"breeding_id": b2["breeding_id"], "kindling_date": "2026-03-03", "born_alive": 4})
+
+    kits = client.post(f"/litters/{l1['litter_id']}/generate-kits", json={"weaned_count": 3}).json()["animal_ids"]
+    client.post("/harvests/", json={"animal_id": kits[0], "harvest_date": "2026-04-27", "live_weight_grams": 2000, "carcass_weight_grams": 1000})
+    client.post("/harvests/", json={"animal_id": kits[1], "harvest_date": "2026-05-02", "live_weight_grams": 2500, "carcass_weight_grams": 1500})
+    client.post("/harvests/", json={"animal_id": kits[2], "harvest_date": "2026-05-03"})
+    client.patch(f"/animals/{doe['animal_id']}", json={"status": "deceased", "death_date": "2026-05-10"})
+
+    data = client.get("/reports/summary").json()
+    k = data["kpis"]
+    assert k["total_litters"] == 2
+    assert k["avg_litter_size"] == 6.0
+    assert k["survival_to_wean"] == 3 / 8  # generate-kits sets weaned_count
+    assert k["harvested_count"] == 3
+    assert k["avg_days_to_harvest"] == (85 + 90 + 91) / 3
+    assert k["avg_yield"] == (0.5 + 0.6) / 2
+    assert k["mortality_count"] == 1
+    assert k["total_feed_cost"] == 0
+
+    s = data["series"]
+    assert [p["month"] for p in s["litters"]["points"]] == ["2026-02", "2026-03", "2026-04", "2026-05"]
+    assert [p["value"] for p in s["born_alive"]["points"]] == [8, 4, 0, 0]
+    assert [p["value"] for p in s["harvests"]["points"]] == [0, 0, 1, 2]
+    assert [p["value"] for p in s["avg_yield"]["points"]] == [0.0, 0.0, 0.5, 0.6]
+    assert [p["value"] for p in s["mortality"]["points"]] == [0, 0, 0, 1]
+
+    ranged = client.get("/reports/summary?start_date=2026-05-01&end_date=2026-05-31").json()["kpis"]
+    assert ranged["total_litters"] == 0
+    assert ranged["harvested_count"] == 2
+    assert ranged["avg_days_to_harvest"] == (90 + 91) / 2
+    assert ranged["mortality_count"] == 1
+
+
+def test_metrics_query_count_is_constant(client, sql_log):
+    doe = client.post("/animals/", json={"tattoo": "DOE-QC", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BUK-QC", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 6}).json()
+    kits = client.post(f"/litters/{l['litter_id']}/generate-kits", json={"weaned_count": 5}).json()["animal_ids"]
+    for i, kit_id in enumerate(kits):
+        client.post("/harvests/", json={"animal_id": kit_id, "harvest_date": f"2026-04-{20 + i:02d}"})
+
+    sql_log.clear()
+    r = client.get("/metrics")
+    assert r.status_code == 200, r.text
+    selects = [s for s, _ in sql_log if s.lstrip().upper().startswith("SELECT")]
+    # ETag version lookup, the cache key's lookup in the snapshot + the two aggregates
+    assert len(selects) == 4, selects
+
+    m = r.json()
+    assert m["total_litters"] == 1
+    assert m["average_litter_size"] == 6.0
+    assert m["kit_survival_rate"] == 5 / 6
+    assert m["average_days_to_harvest"] == 80.0
+    assert m["harvested_rabbits"] == 5
+
+
+def test_monthly_rollups_track_writes_and_rebuild(client, db_session):
+    from app import models, rollups
+    from app.cache import response_cache
+
+    doe = client.post("/animals/", json={"tattoo": "DOE-RU", "sex": "F", "status": "breeder", "birth_date": "2025-01-01"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BUK-RU", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 7}).json()
+    client.patch(f"/litters/{l['litter_id']}", json={"kindling_date": "2026-02-20", "weaned_count": 6})
+    kits = client.post(f"/litters/{l['litter_id']}/generate-kits", json={"weaned_count": 5}).json()["animal_ids"]
+
+    h = client.post("/harvests/", json={"animal_id": kits[0], "harvest_date": "2026-05-01", "live_weight_grams": 2000, "carcass_weight_grams": 1100}).json()
+    client.patch(f"/harvests/{h['harvest_id']}", json={"harvest_date": "2026-06-02"})
+    client.patch(f"/animals/{kits[1]}", json={"status": "deceased", "death_date": "2026-04-03"})
+    client.patch(f"/animals/{kits[2]}", json={"status": "deceased", "death_date": "2026-04-04"})
+    client.patch(f"/animals/{kits[2]}", json={"status": "growout"})
+
+    keep = client.post("/feed-costs/", json={"date": "2026-03-15", "total_cost": 14.0}).json()
+    gone = client.post("/feed-costs/", json={"date": "2026-07-01", "total_cost": 9.5}).json()
+    client.delete(f"/feed-costs/{gone['feed_cost_id']}")
+
+    def stored():
+        rows = db_session.query(models.MonthlyRollup).all()
+        return {
+            r.month: {f: getattr(r, f) for f in rollups.FIELDS}
+            for r in rows
+            if any(getattr(r, f) for f in rollups.FIELDS)
+        }
+
+    db_session.expire_all()
+    assert stored() == rollups.raw_months(db_session)
+    assert stored()["2026-03"]["feed_cost_total"] == keep["total_cost"]
+
+    summary = client.get("/reports/summary").json()
+    assert summary["kpis"]["mortality_count"] == 1
+    assert [p["month"] for p in summary["series"]["litters"]["points"]] == ["2026-02", "2026-03", "2026-04", "2026-06"]
+
+    ranged = client.get("/reports/summary?start_date=2026-02-10&end_date=2026-06-01").json()
+    assert ranged["kpis"]["total_litters"] == 1
+    assert ranged["kpis"]["harvested_count"] == 0
+    assert ranged["kpis"]["mortality_count"] == 1
+
+    db_session.query(models.MonthlyRollup).delete()
+    db_session.commit()
+    rollups.rebuild(db_session)
+    assert client.get("/reports/summary").json() == summary
+
+    # Drifted rollups, as served by a worker whose cache entry expired ...
+    db_session.query(models.MonthlyRollup).filter(models.MonthlyRollup.month == "2026-02").update({"litters": 9})
+    db_session.commit()
+    response_cache.clear()
+    drifted = client.get("/reports/summary")
+    assert drifted.json() != summary
+    # ... are replaced by a rebuild, which also retires their ETag and cache entries
+    rollups.rebuild(db_session)
+    repaired = client.get("/reports/summary", headers={"If-None-Match": drifted.headers["etag"]})
+    assert repaired.status_code == 200
+    assert repaired.json() == summary
+
+
+def test_reports_csv_streams_joined_rows_in_batches(client, monkeypatch):
+    from app.routers import reports
+
+    monkeypatch.setattr(reports, "CSV_FETCH_SIZE", 2)
+    monkeypatch.setattr(reports, "CSV_FLUSH_ROWS", 3)
+
+    doe = client.post("/animals/", json={"tattoo": "DOE-CSV", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BUK-CSV", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 8}).json()
+    kits = client.post(f"/litters/{l['litter_id']}/generate-kits", json={"weaned_count": 7}).json()["animal_ids"]
+    for kit_id in kits:
+        client.post("/harvests/", json={"animal_id": kit_id, "harvest_date": "2026-04-27", "live_weight_grams": 2000, "carcass_weight_grams": 1100})
+
+    with client.stream("GET", "/reports/harvests.csv") as r:
+        assert r.status_code == 200
+        chunks = [c for c in r.iter_text() if c]
+    lines = "".join(chunks).splitlines()
+    assert len(lines) == 1 + len(kits)
+    assert lines[1].split(",")[2].startswith(f"L{l['litter_id']}-K")
+    assert lines[1].split(",")[5:] == ["85", "2000", "1100", "55.0"]
+
+    litters_csv = client.get("/reports/litters.csv").text.splitlines()
+    assert litters_csv[1].split(",")[2:4] == ["DOE-CSV", "BUK-CSV"]
+    assert litters_csv[1].split(",")[-1] == "87.5"
+
+
+def test_reports_csv_etag_and_rows_come_from_one_snapshot(client, file_db, monkeypatch):
+    from sqlalchemy import event
+    from app.routers import reports
+
+    app_engine, path = file_db
+    monkeypatch.setattr(reports, "CSV_FETCH_SIZE", 1)
+    client.post("/feed-costs/", json={"date": "2026-01-01", "total_cost": 1.0})
+    before = client.get("/reports/feed-costs.csv").headers["etag"]
+
+    # A feed cost is committed after the ETag is read, before the rows are
+    statements = []
+
+    def _write_before_rows(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        if "FROM feed_costs ORDER BY" in statement:
+            with contextlib.closing(sqlite3.connect(path)) as other, other:
+                other.execute("INSERT INTO feed_costs (date, total_cost) VALUES ('2026-01-02', 2.0)")
+
+    event.listen(app_engine, "before_cursor_execute", _write_before_rows)
+    try:
+        r = client.get("/reports/feed-costs.csv")
+    finally:
+        event.remove(app_engine, "before_cursor_execute", _write_before_rows)
+
+    assert r.headers["etag"] == before
+    assert len(r.text.splitlines()) == 2
+    assert statements[0] == "BEGIN"
+    assert client.get("/reports/feed-costs.csv").headers["etag"] != before
+
+
+def test_list_endpoints_keyset_pagination(client):
+    for i in range(5):
+        client.post("/feed-costs/", json={"date": f"2026-01-0{1 + i // 2}", "total_cost": float(i)})
+
+    legacy = client.get("/feed-costs/")
+    assert len(legacy.json()) == 5
+    assert "x-next-cursor" not in legacy.headers
+
+    seen, cursor = [], None
+    while True:
+        url = "/feed-costs/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        r = client.get(url)
+        assert r.status_code == 200, r.text
+        seen.extend(fc["feed_cost_id"] for fc in r.json())
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == [fc["feed_cost_id"] for fc in legacy.json()]
+
+    bad = client.get("/feed-costs/?cursor=not-a-cursor")
+    assert bad.status_code == 400
+
+
+def test_list_animals_cursor_matches_offset(client):
+    for i in range(5):
+        client.post("/animals/", json={"tattoo": f"PG-{i}", "sex": "U", "status": "growout"})
+
+    first = client.get("/animals/?limit=2")
+    assert [a["tattoo"] for a in first.json()] == ["PG-0", "PG-1"]
+    second = client.get(f"/animals/?limit=2&cursor={first.headers['x-next-cursor']}")
+    offset = client.get("/animals/?limit=2&skip=2")
+    assert second.json() == offset.json()
+
+
+def test_delete_animal_blocked_by_sale(client):
+    a = client.post("/animals/", json={"tattoo": "SOLD-1", "sex": "U", "status": "growout"}).json()
+    s = client.post("/sales/", json={"animal_id": a["animal_id"], "sale_date": "2026-03-01", "sale_price": 25}).json()
+
+    r = client.delete(f"/animals/{a['animal_id']}")
+    assert r.status_code == 409, r.text
+
+    assert client.delete(f"/sales/{s['sale_id']}").status_code == 204
+    assert client.delete(f"/animals/{a['animal_id']}").status_code == 204
+
+
+def test_create_animal_with_unknown_litter(client):
+    r = client.post("/animals/", json={"tattoo": "ORPHAN", "sex": "U", "status": "growout", "litter_id": 999})
+    assert r.status_code == 404
+
+
+def test_generate_kits_batch_weans_many_litters_in_one_insert(client, sql_log):
+    doe = client.post("/animals/", json={"tattoo": "BK-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BK-BUCK", "sex": "M", "status": "breeder"}).json()
+    litters = []
+    for bred, kindled in (("2026-01-01", "2026-02-01"), ("2026-03-01", "2026-04-01")):
+        b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": bred}).json()
+        litters.append(client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": kindled, "born_alive": 8}).json())
+    l1, l2 = (l["litter_id"] for l in litters)
+
+    first = client.post(f"/litters/{l1}/generate-kits", json={"weaned_count": 2, "female_count": 2})
+    assert first.json()["tattoos"] == [f"L{l1}-K01", f"L{l1}-K02"]
+
+    sql_log.clear()
+    r = client.post("/litters/generate-kits", json={"litters": [
+        {"litter_id": l1, "weaned_count": 3, "male_count": 1},
+        {"litter_id": l2, "weaned_count": 2, "tattoo_prefix": "SPRING-"},
+    ]})
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert [o["litter_id"] for o in out] == [l1, l2]
+    assert out[0]["tattoos"] == [f"L{l1}-K03", f"L{l1}-K04", f"L{l1}-K05"]
+    assert out[1]["tattoos"] == ["SPRING-K01", "SPRING-K02"]
+    assert [s.lstrip().upper().startswith("INSERT INTO ANIMALS") for s, _ in sql_log].count(True) == 1
+
+    kits = client.get(f"/litters/{l1}/kits").json()
+    assert [k["animal_id"] for k in kits] == first.json()["animal_ids"] + out[0]["animal_ids"]
+    assert [k["sex"] for k in kits] == ["F", "F", "M", "U", "U"]
+    assert client.get(f"/litters/{l2}/kits").json()[0]["birth_date"] == "2026-04-01"
+    assert client.get("/metrics").json()["kit_survival_rate"] == (3 + 2) / (8 + 8)
+
+    assert client.post("/litters/generate-kits", json={"litters": [
+        {"litter_id": l1, "weaned_count": 1}, {"litter_id": l1, "weaned_count": 1},
+    ]}).status_code == 400
+    assert client.post("/litters/generate-kits", json={"litters": [
+        {"litter_id": l2, "weaned_count": 1}, {"litter_id": 999, "weaned_count": 1},
+    ]}).status_code == 404
+    assert len(client.get(f"/litters/{l2}/kits").json()) == 2
+
+
+def test_generate_kits_rejects_clashing_tattoos(client):
+    doe = client.post("/animals/", json={"tattoo": "TC-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "TC-BUCK", "sex": "M", "status": "breeder"}).json()
+    litter_ids = []
+    for bred, kindled in (("2026-01-01", "2026-02-01"), ("2026-03-01", "2026-04-01")):
+        b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": bred}).json()
+        litter_ids.append(client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": kindled, "born_alive": 6}).json()["litter_id"])
+    l1, l2 = litter_ids
+
+    # The same prefix on two litters of one batch
+    r = client.post("/litters/generate-kits", json={"litters": [
+        {"litter_id": l1, "weaned_count": 2, "tattoo_prefix": "SPRING-"},
+        {"litter_id": l2, "weaned_count": 2, "tattoo_prefix": "SPRING-"},
+    ]})
+    assert r.status_code == 409
+    assert "SPRING-K01" in r.json()["detail"]
+
+    # A prefix that repeats tattoos already in the herd
+    client.post(f"/litters/{l1}/generate-kits", json={"weaned_count": 2, "tattoo_prefix": "SPRING-"})
+    r = client.post(f"/litters/{l2}/generate-kits", json={"weaned_count": 3, "tattoo_prefix": "SPRING-"})
+    assert r.status_code == 409
+    assert r.json()["detail"] == "Tattoo 'SPRING-K01' already exists"
+
+    # Nothing of a rejected request is kept
+    assert client.get(f"/litters/{l2}/kits").json() == []
+    assert next(l for l in client.get("/litters/").json() if l["litter_id"] == l2)["weaned_count"] is None
+
+
+def test_bulk_import_resolves_tattoos_and_reports_bad_rows(client):
+    animals_csv = (
+        "tattoo,sex,status,birth_date,notes\n"
+        "IM-DOE,F,breeder,2025-01-01,\"from the old\nspreadsheet\"\n"
+        "IM-BUCK,M,breeder,,\n"
+        "IM-DOE,F,breeder,,\n"               # duplicate tattoo
+        "IM-BAD,X,breeder,,\n"               # invalid sex
+        "IM-DEAD,F,deceased,,\n"             # deaths have their own workflow
+        "IM-KIT,U,growout,2025-02-01,\n"
+    )
+    r = client.post("/import/animals?batch_size=2", content=animals_csv, headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    report = r.json()
+    assert (report["received"], report["inserted"], report["failed"]) == (6, 3, 3)
+    assert [e["row"] for e in report["errors"]] == [3, 4, 5]
+    assert report["errors"][1]["errors"][0].startswith("sex:")
+    doe = next(a for a in client.get("/animals/").json() if a["tattoo"] == "IM-DOE")
+    assert doe["notes"] == "from the old\nspreadsheet"
+
+    breedings = "\n".join(json.dumps(row) for row in (
+        {"doe_tattoo": "IM-DOE", "buck_tattoo": "IM-BUCK", "bred_date": "2025-03-01"},
+        {"doe_tattoo": "IM-BUCK", "buck_tattoo": "IM-DOE", "bred_date": "2025-03-02"},
+        {"doe_tattoo": "NOPE", "buck_tattoo": "IM-BUCK", "bred_date": "2025-03-03"},
+    )) + "\nnot json\n"
+    report = client.post("/import/breedings", content=breedings).json()
+    assert (report["inserted"], report["failed"]) == (1, 3)
+    assert [e["errors"][0] for e in report["errors"]] == [
+        "Invalid doe", "doe_tattoo: unknown tattoo 'NOPE'", "Invalid JSON: Expecting value",
+    ]
+    (breeding,) = client.get("/breedings/").json()
+    assert breeding["expected_kindling"] == "2025-04-01"
+
+    litters = json.dumps({"doe_tattoo": "IM-DOE", "bred_date": "2025-03-01", "kindling_date": "2025-04-01", "born_alive": 7, "weaned_count": 6})
+    report = client.post("/import/litters", content=litters).json()
+    assert (report["inserted"], report["failed"]) == (1, 0)
+    assert client.get("/breedings/").json()[0]["result"] == "successful"
+
+    harvests = "animal_tattoo,harvest_date,live_weight_grams,carcass_weight_grams\nIM-KIT,2025-05-01,2000,1100\n"
+    report = client.post("/import/harvests?format=csv", content=harvests).json()
+    assert (report["inserted"], report["failed"]) == (1, 0)
+    kit = next(a for a in client.get("/animals/").json() if a["tattoo"] == "IM-KIT")
+    assert kit["status"] == "harvested"
+
+    summary = client.get("/reports/summary").json()
+    assert summary["kpis"]["harvested_count"] == 1
+    assert summary["kpis"]["total_litters"] == 1
+    assert summary["kpis"]["avg_days_to_harvest"] == 89
+
+    assert client.post("/import/sales", content="").status_code == 404
+
+
+def test_options_animals_typeahead(client):
+    for tattoo, status in (
+        ("NZ-101", "growout"), ("NZ-102", "growout"), ("nz-103", "breeder"),
+        ("CAL-NZ1", "growout"), ("REX-9", "growout"), ("NZ-104", "growout"),
+    ):
+        assert client.post("/animals/", json={"tattoo": tattoo, "sex": "U", "status": status}).status_code == 200
+    client.patch("/animals/6", json={"status": "deceased"})
+
+    def labels(qs):
+        r = client.get(f"/options/animals?{qs}")
+        assert r.status_code == 200, r.text
+        return [o["label"].split(" ")[0] for o in r.json()]
+
+    # Case-insensitive prefix matches first, then substring matches
+    assert labels("q=nz") == ["NZ-101", "NZ-102", "nz-103", "NZ-104"]
+    assert labels("q=NZ1") == ["CAL-NZ1"]
+    assert labels("q=nz-1&limit=2") == ["NZ-101", "NZ-102"]
+    assert labels("q=z-10&status=growout") == ["NZ-101", "NZ-102"]
+    assert labels("q=nz&status=growout,breeder") == ["NZ-101", "NZ-102", "nz-103"]
+    assert labels("q=x") == []
+    assert len(labels("")) == 6
+
+    # The trigram index follows deletes
+    client.delete("/animals/5")
+    assert labels("q=EX-") == []
+
+
+def test_options_breedings_and_litters_search_by_tattoo(client):
+    doe = client.post("/animals/", json={"tattoo": "TA-DOE", "sex": "F", "status": "breeder"}).json()
+    other = client.post("/animals/", json={"tattoo": "OT-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "TA-BUCK", "sex": "M", "status": "breeder"}).json()
+    b1 = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    b2 = client.post("/breedings/", json={"doe_id": other["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-02"}).json()
+    client.post("/litters/", json={"breeding_id": b1["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 5})
+
+    assert [o["id"] for o in client.get("/options/breedings?q=ta-d").json()] == [b1["breeding_id"]]
+    assert [o["id"] for o in client.get("/options/breedings?q=ta-b").json()] == [b2["breeding_id"], b1["breeding_id"]]
+    assert client.get("/options/breedings").json()[1]["label"] == f"#{b1['breeding_id']} TA-DOE x TA-BUCK (bred 2026-01-01)"
+    assert len(client.get("/options/litters?q=ta").json()) == 1
+    assert client.get("/options/litters?q=ot").json() == []
+
+
+def test_search_notes_across_entities(client):
+    doe = client.post("/animals/", json={"tattoo": "S-DOE", "sex": "F", "status": "breeder", "notes": "Fostered two kits from S-DOE2"}).json()
+    buck = client.post("/animals/", json={"tattoo": "S-BUCK", "sex": "M", "status": "breeder"}).json()
+    sick = client.post("/animals/", json={"tattoo": "S-SICK", "sex": "U", "status": "growout"}).json()
+    client.patch(f"/animals/{sick['animal_id']}", json={"status": "deceased", "death_date": "2026-03-01", "death_reason": "Jaw abscess"})
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    client.patch(f"/breedings/{b['breeding_id']}", json={"notes": "Doe fostering kits, watch for abscess"})
+    l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 6, "notes": "Big litter"}).json()
+
+    hits = client.get("/search/?q=abscess").json()
+    assert {(h["entity"], h["id"], h["field"]) for h in hits} == {
+        ("animal", sick["animal_id"], "death_reason"), ("breeding", b["breeding_id"], "notes"),
+    }
+    assert any("[abscess]" in h["snippet"] for h in hits)
+    assert hits == sorted(hits, key=lambda h: h["rank"])
+
+    # Stemming, filters and multi-word AND
+    assert {h["entity"] for h in client.get("/search/?q=foster").json()} == {"animal", "breeding"}
+    assert [h["entity"] for h in client.get("/search/?q=foster&entity=breeding").json()] == ["breeding"]
+    assert [h["id"] for h in client.get("/search/?q=big lit*").json()] == [l["litter_id"]]
+    assert client.get("/search/?q=abscess big").json() == []
+    assert client.get('/search/?q="').status_code == 200
+    assert client.get("/search/?q=x&entity=feed").status_code == 400
+
+    # Cursor pagination walks every hit exactly once
+    first = client.get("/search/?q=kits&limit=1")
+    assert len(first.json()) == 1
+    rest = client.get(f"/search/?q=kits&limit=1&cursor={first.headers['x-next-cursor']}")
+    assert len(rest.json()) == 1 and rest.json() != first.json()
+    assert "x-next-cursor" not in rest.headers
+
+    # Triggers keep the index in sync with edits and deletes
+    client.patch(f"/breedings/{b['breeding_id']}", json={"notes": "All good"})
+    client.delete(f"/animals/{sick['animal_id']}")
+    assert client.get("/search/?q=abscess").json() == []
+
+
+def test_conditional_get_answers_304_until_a_write(client, sql_log):
+    doe = client.post("/animals/", json={"tattoo": "ET-DOE", "sex": "F", "status": "breeder"}).json()
+
+    first = client.get("/animals/")
+    tag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    sql_log.clear()
+    again = client.get("/animals/", headers={"If-None-Match": tag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == tag
+    statements = [s for s, _ in sql_log]
+    assert len(statements) == 1 and "table_versions" in statements[0]
+
+    # Writes to other tables leave the animals tag alone ...
+    client.post("/feed-costs/", json={"date": "2026-01-05", "total_cost": 9.5})
+    assert client.get("/animals/", headers={"If-None-Match": tag}).status_code == 304
+    # ... writes to animals (from any path) change it
+    client.patch(f"/animals/{doe['animal_id']}", json={"status": "growout"})
+    changed = client.get("/animals/", headers={"If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != tag
+
+    csv = client.get("/reports/feed-costs.csv")
+    assert csv.headers["etag"]
+    assert client.get("/reports/feed-costs.csv", headers={"If-None-Match": csv.headers["etag"]}).status_code == 304
+    summary = client.get("/reports/summary")
+    assert client.get("/reports/summary", headers={"If-None-Match": f'"x", {summary.headers["etag"]}'}).status_code == 304
+
+
+def test_report_cache_hits_until_a_relevant_write(client, sql_log, monkeypatch):
+    from app.cache import response_cache
+
+    doe = client.post("/animals/", json={"tattoo": "RC-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "RC-BUCK", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2026-01-01"}).json()
+    client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2026-02-01", "born_alive": 6})
+
+    first = client.get("/metrics").json()
+    sql_log.clear()
+    assert client.get("/metrics").json() == first
+    # Only the version lookups: the ETag check's, then the cache key's in the snapshot
+    assert [s for s, _ in sql_log if s != "BEGIN"] == [s for s, _ in sql_log if "table_versions" in s]
+    assert len(sql_log) == 3
+    stats = client.get("/metrics/cache").json()["endpoints"]["metrics"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # Parameters are part of the key
+    client.get("/reports/summary?start_date=2026-01-01")
+    client.get("/reports/summary?start_date=2026-02-01")
+    client.get("/reports/summary?start_date=2026-01-01")
+    assert client.get("/metrics/cache").json()["endpoints"]["report_summary"]["hits"] == 1
+
+    # Feed costs do not feed /metrics; litters do
+    client.post("/feed-costs/", json={"date": "2026-02-03", "total_cost": 4})
+    client.get("/metrics")
+    assert client.get("/metrics/cache").json()["endpoints"]["metrics"]["hits"] == 2
+    client.patch("/litters/1", json={"born_alive": 8})
+    assert client.get("/metrics").json()["average_litter_size"] == 8.0
+    assert client.get("/metrics/cache").json()["endpoints"]["metrics"]["misses"] == 2
+
+    monkeypatch.setattr(response_cache, "maxsize", 1)
+    client.get("/dashboard/todo?limit=5")
+    client.get("/dashboard/todo?limit=6")
+    stats = client.get("/metrics/cache").json()
+    assert stats["size"] == 1
+    assert stats["evictions"] >= 1
+
+
+def test_cache_key_and_etag_come_from_the_snapshot(client, file_db):
+    from sqlalchemy import event
+
+    app_engine, path = file_db
+
+    doe = client.post("/animals/", json={"tattoo": "CS-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "CS-BUCK", "sex": "M", "status": "breeder"}).json()
+    breeding = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    client.post("/litters/", json={"breeding_id": breeding["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 6})
+    assert client.get("/metrics").json()["total_litters"] == 1  # primes the cache
+
+    # A litter committed after the ETag check, as the cached read begins
+    wrote = []
+
+    def _kindle_at_begin(conn, cursor, statement, parameters, context, executemany):
+        if not wrote and statement == "BEGIN":
+            wrote.append(True)
+            with contextlib.closing(sqlite3.connect(path)) as other, other:
+                other.execute(
+                    "INSERT INTO litters (breeding_id, kindling_date, born_alive) VALUES (?, '2025-03-01', 7)",
+                    (breeding["breeding_id"],),
+                )
+
+    event.listen(app_engine, "before_cursor_execute", _kindle_at_begin)
+    try:
+        r = client.get("/metrics")
+    finally:
+        event.remove(app_engine, "before_cursor_execute", _kindle_at_begin)
+
+    assert wrote
+    assert r.json()["total_litters"] == 2
+    assert client.get("/metrics", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+
+def test_dashboard_todo_weanings_not_starved_by_weaned_litters(client):
+    doe = client.post("/animals/", json={"tattoo": "WN-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "WN-BUCK", "sex": "M", "status": "breeder"}).json()
+    litter_ids = []
+    for month in range(1, 6):
+        b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": f"2025-{month:02d}-01"}).json()
+        l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": f"2025-{month + 1:02d}-02", "born_alive": 4}).json()
+        litter_ids.append(l["litter_id"])
+    # The three oldest litters are already weaned
+    for litter_id in litter_ids[:3]:
+        r = client.post(f"/litters/{litter_id}/generate-kits", json={"weaned_count": 2})
+        assert r.status_code == 200, r.text
+
+    r = client.get("/dashboard/todo?limit=2")
+    assert r.status_code == 200, r.text
+    due = r.json()["weanings_due"]
+    assert [w["litter_id"] for w in due] == litter_ids[3:]
+    assert all(w["kits_generated"] == 0 for w in due)
+
+
+def test_dashboard_bootstrap_returns_bounded_snapshot(client):
+    doe = client.post("/animals/", json={"tattoo": "BS-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "BS-BUCK", "sex": "M", "status": "breeder"}).json()
+    for month in range(1, 5):
+        b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": f"2025-{month:02d}-01"}).json()
+        client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": f"2025-{month + 1:02d}-02", "born_alive": 5})
+
+    r = client.get("/dashboard/bootstrap?recent=3")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [a["tattoo"] for a in body["animals"]] == ["BS-BUCK", "BS-DOE"]
+    assert [b["bred_date"] for b in body["breedings"]] == ["2025-04-01", "2025-03-01", "2025-02-01"]
+    assert len(body["litters"]) == 3 and body["harvests"] == []
+    assert body["metrics"] == client.get("/metrics").json()
+    assert body["todo"]["params"]["limit"] == 25
+    assert {w["litter_id"] for w in body["todo"]["weanings_due"]} <= {1, 2, 3, 4}
+
+    assert client.get("/dashboard/bootstrap?recent=3", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+
+def test_dashboard_bootstrap_is_one_snapshot_under_a_concurrent_write(client, file_db):
+    from sqlalchemy import event
+
+    app_engine, path = file_db
+
+    doe = client.post("/animals/", json={"tattoo": "SN-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "SN-BUCK", "sex": "M", "status": "breeder"}).json()
+    breeding = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    client.post("/litters/", json={"breeding_id": breeding["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 6})
+
+    # Another client kindles a litter after the KPIs are read, before the
+    # litter list is (a plain sqlite3 connection, outside the request's SQL count)
+    wrote = []
+
+    def _kindle_between_reads(conn, cursor, statement, parameters, context, executemany):
+        if not wrote and "FROM litters ORDER BY" in statement:
+            wrote.append(True)
+            with contextlib.closing(sqlite3.connect(path)) as other, other:
+                other.execute(
+                    "INSERT INTO litters (breeding_id, kindling_date, born_alive) VALUES (?, '2025-03-01', 7)",
+                    (breeding["breeding_id"],),
+                )
+
+    event.listen(app_engine, "before_cursor_execute", _kindle_between_reads)
+    try:
+        body = client.get("/dashboard/bootstrap").json()
+    finally:
+        event.remove(app_engine, "before_cursor_execute", _kindle_between_reads)
+
+    assert wrote
+    assert body["metrics"]["total_litters"] == len(body["litters"]) == 1
+    with contextlib.closing(sqlite3.connect(path)) as other:
+        assert other.execute("SELECT count(*) FROM litters").fetchone()[0] == 2
+
+
+def test_dashboard_bootstrap_cached_parts_follow_the_snapshot(client, file_db):
+    from sqlalchemy import event
+
+    app_engine, path = file_db
+
+    doe = client.post("/animals/", json={"tattoo": "SC-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "SC-BUCK", "sex": "M", "status": "breeder"}).json()
+    breeding = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    client.post("/litters/", json={"breeding_id": breeding["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 6})
+    assert client.get("/dashboard/bootstrap").json()["metrics"]["total_litters"] == 1  # primes the cache
+
+    # Another client kindles a litter after the ETag check, as the snapshot begins
+    wrote = []
+
+    def _kindle_at_begin(conn, cursor, statement, parameters, context, executemany):
+        if not wrote and statement == "BEGIN":
+            wrote.append(True)
+            with contextlib.closing(sqlite3.connect(path)) as other, other:
+                other.execute(
+                    "INSERT INTO litters (breeding_id, kindling_date, born_alive) VALUES (?, '2025-03-01', 7)",
+                    (breeding["breeding_id"],),
+                )
+
+    event.listen(app_engine, "before_cursor_execute", _kindle_at_begin)
+    try:
+        r = client.get("/dashboard/bootstrap")
+    finally:
+        event.remove(app_engine, "before_cursor_execute", _kindle_at_begin)
+
+    assert wrote
+    body = r.json()
+    assert body["metrics"]["total_litters"] == len(body["litters"]) == 2
+    assert r.headers["etag"] == client.get("/dashboard/bootstrap").headers["etag"]
+
+
+def _feed(client, **params):
+    """(event, id, data) triples from one pass over the change feed."""
+    headers = params.pop("headers", {})
+    r = client.get("/changes", params=params, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/event-stream")
+    out = []
+    for block in r.text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            out.append((fields["event"], int(fields["id"]), json.loads(fields["data"])))
+    return out
+
+
+def test_change_feed_reports_writes_and_resumes(client, monkeypatch):
+    from app.routers import changes as changes_router
+    monkeypatch.setattr(changes_router, "CHANGE_FEED_STREAM_SECONDS", 0)
+
+    doe = client.post("/animals/", json={"tattoo": "CF-DOE", "sex": "F", "status": "breeder"}).json()
+    client.patch(f"/animals/{doe['animal_id']}", json={"status": "sold"})
+    client.post("/feed-costs/", json={"date": "2025-02-10", "total_cost": 12.0})
+
+    events = _feed(client, last_event_id=0)
+    assert [(e, d["entity"], d["op"]) for e, _, d in events] == [
+        ("change", "animals", "insert"),
+        ("change", "animals", "update"),
+        ("change", "feed_costs", "insert"),
+    ]
+    assert events[0][2]["fields"]["tattoo"] == "CF-DOE"
+    assert events[1][2] == {"entity": "animals", "id": doe["animal_id"], "op": "update", "fields": {"status": "sold"}}
+
+    # Resuming from the first event's id skips it
+    resumed = _feed(client, headers={"Last-Event-ID": str(events[0][1])})
+    assert [i for _, i, _ in resumed] == [i for _, i, _ in events[1:]]
+
+    # Without a last id the feed starts from now; an id it never issued resets
+    assert _feed(client) == []
+    (reset,) = _feed(client, last_event_id=events[-1][1] + 100)
+    assert reset[0] == "reset"
+
+
+def test_change_feed_covers_bulk_writes(client, monkeypatch):
+    from app.routers import changes as changes_router
+    monkeypatch.setattr(changes_router, "CHANGE_FEED_STREAM_SECONDS", 0)
+
+    doe = client.post("/animals/", json={"tattoo": "CB-DOE", "sex": "F", "status": "breeder"}).json()
+    buck = client.post("/animals/", json={"tattoo": "CB-BUCK", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    l = client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 4}).json()
+    start = _feed(client, last_event_id=0)[-1][1]
+
+    kits = client.post(f"/litters/{l['litter_id']}/generate-kits", json={"weaned_count": 2}).json()
+    rows = "\n".join(json.dumps({"tattoo": f"CB-{i}", "sex": "F", "status": "growout"}) for i in range(3))
+    client.post("/import/animals", content=rows)
+
+    events = [d for _, _, d in _feed(client, last_event_id=start)]
+    inserted = [(d["id"], d["fields"]["tattoo"]) for d in events if d["entity"] == "animals" and d["op"] == "insert"]
+    assert inserted == list(zip(kits["animal_ids"], kits["tattoos"]))
+    assert {"entity": "litters", "id": l["litter_id"], "op": "update", "fields": {"weaned_count": 2}} in events
+    assert events[-1] == {"entity": "animals", "id": None, "op": "bulk", "fields": {"count": 3}}
+
+
+def test_change_feed_streams_share_one_poller(client, file_db, monkeypatch):
+    import asyncio
+    import httpx
+    from app import changes
+    from app.main import app
+    from app.routers import changes as changes_router
+
+    monkeypatch.setattr(changes_router, "CHANGE_FEED_POLL", 0.05)
+    monkeypatch.setattr(changes_router, "CHANGE_FEED_STREAM_SECONDS", 1.0)
+    reads = []
+    since = changes.since
+
+    def counting_since(db, after, limit):
+        reads.append(after)
+        return since(db, after, limit)
+
+    monkeypatch.setattr(changes, "since", counting_since)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            async def write():
+                await asyncio.sleep(0.3)
+                r = await ac.post("/animals/", json={"tattoo": "SHARED", "sex": "F", "status": "breeder"})
+                assert r.status_code == 200
+
+            streams = await asyncio.gather(ac.get("/changes"), ac.get("/changes"), write())
+        return [r.text for r in streams[:2]]
+
+    bodies = asyncio.run(scenario())
+    for body in bodies:
+        assert '"tattoo":"SHARED"' in body
+    # About one read per poll interval for the worker; two streams polling on
+    # their own would make twice as many
+    assert len(reads) <= 1.0 / 0.05 + 4
+    assert changes_router.feed.subscribers == 0
+
+
+def test_pages_reference_fingerprinted_precompressed_assets(client):
+    page = client.get("/ranch/animals", headers={"Accept-Encoding": "gzip"})
+    assert page.status_code == 200
+    assert page.headers["cache-control"] == "no-cache"
+    assert page.headers["content-encoding"] == "gzip"
+    (script,) = re.findall(r'src="(/static/app\.[0-9a-f]+\.js)"', page.text)
+    assert "/static/styles.css" not in page.text
+
+    assert client.get("/ranch/animals", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+
+    r = client.get(script, headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert "javascript" in r.headers["content-type"]
+    with open("app/static/app.js", encoding="utf-8") as f:
+        assert r.text == f.read()
+
+    br = client.get(script, headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert br.headers["content-encoding"] == "br"
+    assert br.headers["vary"] == "Accept-Encoding"
+    assert int(br.headers["content-length"]) < int(r.headers["content-length"])
+    assert br.text == r.text  # httpx decodes brotli with the brotli package installed
+
+    plain = client.get(script, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert int(plain.headers["content-length"]) > int(r.headers["content-length"])
+
+    # Unhashed names still work, but are revalidated
+    assert client.get("/static/app.js").headers["cache-control"] == "no-cache"
+    assert client.get("/static/app.000000000000.js").status_code == 404
+
+
+def test_list_fast_path_matches_response_models(client, db_session):
+    from pydantic import TypeAdapter
+    from app import models, schemas
+
+    doe = client.post("/animals/", json={"tattoo": "FJ-DOE", "sex": "F", "status": "breeder", "birth_date": "2024-05-01", "notes": "calm, ✓"}).json()
+    buck = client.post("/animals/", json={"tattoo": "FJ-BUCK", "sex": "M", "status": "breeder"}).json()
+    b = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    client.post("/litters/", json={"breeding_id": b["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 6})
+    client.post("/feed-costs/", json={"date": "2025-02-10", "total_cost": 12})
+    client.post("/sales/", json={"animal_id": buck["animal_id"], "sale_date": "2025-03-01", "sale_price": 40})
+
+    for path, model, schema in [
+        ("/animals/", models.Animal, schemas.AnimalOut),
+        ("/breedings/", models.Breeding, schemas.BreedingOut),
+        ("/litters/", models.Litter, schemas.LitterOut),
+        ("/feed-costs/", models.FeedCost, schemas.FeedCostOut),
+        ("/sales/", models.Sale, schemas.SaleOut),
+    ]:
+        r = client.get(path)
+        assert r.status_code == 200 and r.headers["content-type"] == "application/json"
+        expected = TypeAdapter(list[schema]).dump_python(
+            [schema.model_validate(o) for o in db_session.query(model)], mode="json"
+        )
+        body = r.json()
+        assert sorted(body, key=json.dumps) == sorted(expected, key=json.dumps)
+        assert all(list(row) == list(schema.model_fields) for row in body)
+
+    # Paging and ETag headers survive the raw response
+    page = client.get("/animals/?limit=1")
+    assert len(page.json()) == 1 and page.headers["x-next-cursor"] and page.headers["etag"]
+    assert client.get("/animals/?limit=1", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+
+
+def test_fast_path_keeps_openapi_response_models(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for path, schema in [("/animals/", "AnimalOut"), ("/harvests/", "HarvestOut"), ("/litters/{litter_id}/kits", "AnimalOut")]:
+        content = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert content == {"type": "array", "items": {"$ref": f"#/components/schemas/{schema}"}, "title": content["title"]}
+    assert paths["/dashboard/bootstrap"]["get"]["responses"]["200"]["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/DashboardBootstrap"}
+
+
+def test_synthetic_lineage_is_deterministic_and_consistent():
+    from datetime import date
+
+    from app.seed_db import _lineage
+
+    args = (7, 3, 4, date(2022, 1, 1), date(2025, 1, 1))
+    rows = _lineage(*args)
+    assert rows == _lineage(*args)
+    assert rows != _lineage(8, *args[1:])
+
+    animal_ids = {a["animal_id"] for a in rows["animals"]}
+    litter_ids = {l["litter_id"] for l in rows["litters"]}
+    assert len(rows["litters"]) > 5 and len(rows["animals"]) > 40
+    assert {a["litter_id"] for a in rows["animals"]} - {None} <= litter_ids
+    assert {l["breeding_id"] for l in rows["litters"]} <= {b["breeding_id"] for b in rows["breedings"]}
+    assert {b["doe_id"] for b in rows["breedings"]} <= animal_ids
+    assert all(1 <= b["buck_id"] <= 4 for b in rows["breedings"])
+    assert {h["animal_id"] for h in rows["harvests"]} <= animal_ids
+    assert all(d <= args[-1] for r in rows["harvests"] for d in [r["harvest_date"]])
+    # Daughters kept as breeders have litters of their own
+    herds = [_lineage(7, founder, *args[2:])["breedings"] for founder in range(1, 11)]
+    assert any(len({b["doe_id"] for b in breedings}) > 1 for breedings in herds)
+
+
+def test_database_lock_timeout_is_a_retryable_503(client, monkeypatch):
+    import sqlite3
+
+    from sqlalchemy.exc import OperationalError
+
+    from app import rollups
+
+    kit = client.post("/animals/", json={"tattoo": "LOCK1", "sex": "M", "status": "growout"}).json()
+
+    def locked(*args, **kwargs):
+        raise OperationalError("UPDATE monthly_rollups ...", {}, sqlite3.OperationalError("database is locked"))
+
+    monkeypatch.setattr(rollups, "add", locked)
+    r = client.post("/harvests/", json={"animal_id": kit["animal_id"], "harvest_date": "2026-02-01"})
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert r.json() == {"detail": "Database is busy, try again"}
+
+
+def test_requests_report_sql_counts_in_server_timing_and_debug_perf(client):
+    from app import perf
+
+    doe = client.post("/animals/", json={"tattoo": "PERF1", "sex": "F", "status": "breeder"}).json()
+    client.post("/animals/", json={"tattoo": "PERF2", "sex": "M", "status": "breeder"})
+    perf.registry.clear()
+
+    r = client.get("/animals/")
+    timing = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries, (\d+) rows", app;dur=[\d.]+', r.headers["server-timing"])
+    assert timing and int(timing[1]) >= 1 and int(timing[2]) >= 2
+
+    client.get(f"/animals/{doe['animal_id']}")
+    routes = client.get("/debug/perf").json()["routes"]
+    assert routes["GET /animals/"]["requests"] == 1 and routes["GET /animals/"]["budget"] == 2
+    assert routes["GET /animals/"]["max_queries"] == int(timing[1])
+    assert "GET /animals/{animal_id}" in routes
+    assert "<table>" in client.get("/debug/perf", headers={"Accept": "text/html"}).text
+
+
+def test_strict_mode_fails_a_route_over_its_query_budget(client, monkeypatch):
+    import pytest
+
+    from app import perf
+    from app.main import app
+
+    (route,) = [r for r in app.routes if getattr(r, "path", None) == "/metrics"]
+    monkeypatch.setattr(route.endpoint, "query_budget", 0)
+    with pytest.raises(perf.QueryBudgetExceeded, match="GET /metrics ran"):
+        client.get("/metrics")
+
+    monkeypatch.setattr(perf, "PERF_STRICT", False)
+    perf.registry.clear()
+    assert client.get("/metrics").status_code == 200
+    assert perf.registry.snapshot()["routes"]["GET /metrics"]["over_budget"] == 1
+
+
+def test_repeated_statements_are_flagged_as_n_plus_one():
+    from app import perf
+
+    stats = perf.RequestStats(queries=12)
+    stats.statements["SELECT * FROM animals WHERE animal_id = ?"] = 11
+    stats.statements["SELECT 1"] = 1
+    registry = perf.PerfRegistry()
+    registry.record("GET /x", stats, 0.01, None)
+    snapshot = registry.snapshot()
+    assert snapshot["routes"]["GET /x"]["n_plus_one_suspects"] == 1
+    assert snapshot["recent"][0]["repeated"] == [{"statement": "SELECT * FROM animals WHERE animal_id = ?", "count": 11}]
+
+
+def test_slow_queries_are_logged_with_route_parameters_and_plan(client, backend, monkeypatch, caplog):
+    from app.database import slow_query_log
+
+    client.post("/animals/", json={"tattoo": "SLOW1", "sex": "F", "status": "breeder"})
+    slow_query_log.clear()
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 1e-9)  # everything is slow
+    slow_query_log.attach(backend.app_engine)
+    try:
+        with caplog.at_level("WARNING", logger="app.slow_queries"):
+            assert client.get("/animals/?status=breeder").status_code == 200
+    finally:
+        slow_query_log.detach(backend.app_engine)
+
+    listing = [e for e in client.get("/debug/slow-queries").json()["statements"]
+               if e["route"] == "GET /animals/" and "FROM animals" in e["statement"]]
+    assert listing and listing[0]["parameters"][0] == "breeder"
+    assert listing[0]["plan"] and any(line.lstrip().startswith(("SCAN", "SEARCH")) for line in listing[0]["plan"])
+
+    logged = [json.loads(r.getMessage()) for r in caplog.records if r.name == "app.slow_queries"]
+    assert any(e["event"] == "slow_query" and e["route"] == "GET /animals/" and e["plan"] for e in logged)
+
+    assert client.get("/debug/slow-queries?reset=true").status_code == 200
+    assert client.get("/debug/slow-queries").json()["statements"] == []
+
+
+def test_prometheus_metrics_exposition(client):
+    client.post("/animals/", json={"tattoo": "PROM1", "sex": "F", "status": "breeder"})
+    assert client.get("/animals/1").status_code == 200
+    assert client.get("/animals/").status_code == 200
+
+    r = client.get("/metrics/prometheus")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = r.text.splitlines()
+
+    assert "# TYPE rabbit_http_request_duration_seconds histogram" in lines
+    # Route templates, not paths, so ids never become label values
+    assert any(l.startswith('rabbit_http_request_duration_seconds_bucket{method="GET",route="/animals/{animal_id}",'
+                            'status="200",le="+Inf"}') for l in lines)
+    assert not any('route="/animals/1"' in l for l in lines)
+    count = next(l for l in lines if l.startswith(
+        'rabbit_http_request_duration_seconds_count{method="GET",route="/animals/",status="200"}'))
+    assert int(count.rsplit(" ", 1)[1]) >= 1
+
+    assert "rabbit_http_requests_in_flight 1" in lines  # this scrape
+    assert any(l.startswith("rabbit_threadpool_threads_limit ") for l in lines)
+    assert any(l.startswith('rabbit_db_pool_checkouts_total{engine="sync"} ') for l in lines)
+    assert any(l.startswith('rabbit_db_pool_wait_seconds_count{engine="sync"} ') for l in lines)
+    assert any(l.startswith('rabbit_db_file_size_bytes{file="db"} ') for l in lines)
+
+    rows = next(l for l in lines if l.startswith('rabbit_db_table_rows{table="animals"} '))
+    assert int(rows.rsplit(" ", 1)[1]) >= 1
+    client.post("/animals/", json={"tattoo": "PROM2", "sex": "M", "status": "breeder"})
+    again = client.get("/metrics/prometheus").text.splitlines()
+    assert f'rabbit_db_table_rows{{table="animals"}} {int(rows.rsplit(" ", 1)[1]) + 1}' in again
+
+
+def test_pool_wait_is_timed_after_dispose(tmp_path):
+    from sqlalchemy import text
+    from app import telemetry
+    from app.database import make_engine
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    telemetry.instrument_engine(engine, "test")
+
+    def waits():
+        count = next((l for l in telemetry.pool_wait.render().splitlines()
+                      if l.startswith('rabbit_db_pool_wait_seconds_count{engine="test"} ')), "0")
+        return int(count.rsplit(" ", 1)[-1])
+
+    before = waits()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert waits() == before + 1
+
+    engine.dispose()  # swaps in a new pool
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert waits() == before + 2
+    engine.dispose()
@@ -0,0 +1,90 @@
+import re
+
+# "SCAN animals" is a full table scan; "SCAN animals USING INDEX ..." is an
+# ordered index walk and "SEARCH ..." an index lookup, both of which are fine.
+FULL_SCAN = re.compile(r"^SCAN (\S+)$")
+WHERE = re.compile(r"\bWHERE\b")
+
+
+def _full_scans(engine, sql_log):
+    """EXPLAIN every filtered SELECT in the log and return the ones that scan a whole table."""
+    offenders = []
+    with engine.connect() as conn:
+        for statement, params in list(sql_log):
+            if not statement.lstrip().upper().startswith("SELECT") or not WHERE.search(statement):
+                continue
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).fetchall()
+            scans = [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+            if scans:
+                offenders.append((statement, scans))
+    return offenders
+
+
+def _seed(client):
+    doe = client.post("/animals/", json={"tattoo": "QP-DOE", "sex": "F", "status": "breeder", "birth_date": "2025-01-01"}).json()
+    buck = client.post("/animals/", json={"tattoo": "QP-BUCK", "sex": "M", "status": "breeder"}).json()
+    b1 = client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-01-01"}).json()
+    client.post("/breedings/", json={"doe_id": doe["animal_id"], "buck_id": buck["animal_id"], "bred_date": "2025-03-01"})
+    l1 = client.post("/litters/", json={"breeding_id": b1["breeding_id"], "kindling_date": "2025-02-01", "born_alive": 6}).json()
+    client.post("/feed-costs/", json={"date": "2025-02-10", "total_cost": 12.0})
+    return doe, buck, l1
+
+
+def test_dashboard_todo_uses_indexes(client, db_engine, sql_log):
+    _seed(client)
+    sql_log.clear()
+    assert client.get("/dashboard/todo").status_code == 200
+    assert _full_scans(db_engine, sql_log) == []
+    # Tattoos come from joins and kit counts from an anti-join, never from
+    # loading the whole herd
+    unbounded = [s for s, _ in sql_log if re.search(r"\bFROM animals\b", s) and not WHERE.search(s)]
+    assert unbounded == []
+
+
+def test_write_paths_use_indexes(client, db_engine, sql_log):
+    doe, buck, litter = _seed(client)
+    spare = client.post("/animals/", json={"tattoo": "QP-SPARE", "sex": "U", "status": "growout"}).json()
+
+    sql_log.clear()
+    kits = client.post(f"/litters/{litter['litter_id']}/generate-kits", json={"weaned_count": 4})
+    assert kits.status_code == 200, kits.text
+    sale = client.post("/sales/", json={"litter_id": litter["litter_id"], "sale_date": "2025-04-01", "sale_price": 80})
+    assert sale.status_code == 200, sale.text
+    single = client.post("/sales/", json={"animal_id": spare["animal_id"], "sale_date": "2025-04-01", "sale_price": 20})
+    assert single.status_code == 200, single.text
+    assert client.delete(f"/animals/{doe['animal_id']}").status_code == 409
+    assert _full_scans(db_engine, sql_log) == []
+
+
+def test_reports_with_date_range_use_indexes(client, db_engine, sql_log):
+    _seed(client)
+    client.patch("/animals/2", json={"status": "deceased", "death_date": "2025-02-12"})
+
+    sql_log.clear()
+    qs = "start_date=2025-01-15&end_date=2025-03-20"
+    assert client.get(f"/reports/summary?{qs}").status_code == 200
+    for name in ("breedings", "litters", "harvests", "feed-costs"):
+        assert client.get(f"/reports/{name}.csv?{qs}").status_code == 200
+    assert _full_scans(db_engine, sql_log) == []
+
+
+def test_paginated_lists_use_indexes(client, db_engine, sql_log):
+    _seed(client)
+
+    sql_log.clear()
+    for path in ("/breedings/", "/litters/", "/harvests/", "/sales/", "/feed-costs/", "/animals/"):
+        first = client.get(f"{path}?limit=1")
+        cursor = first.headers.get("x-next-cursor")
+        if cursor:
+            assert client.get(f"{path}?limit=1&cursor={cursor}").status_code == 200
+    assert _full_scans(db_engine, sql_log) == []
+
+
+def test_typeahead_uses_indexes(client, db_engine, sql_log):
+    _seed(client)
+
+    sql_log.clear()
+    for path in ("/options/animals?q=qp-d", "/options/animals?q=DOE&status=breeder",
+                 "/options/breedings?q=qp", "/options/litters?q=qp"):
+        assert client.get(path).status_code == 200
+    assert _full_scans(db_engine, sql_log) == []